@@ -1,7 +1,12 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from config import Config
-from cache import init_cache, close_cache
+from metrics import render_metrics
+from middleware.timing import init_request_metrics
+from middleware.token_cache import token_cache
+from cache import init_cache, close_cache, local_cache
+from events import start_invalidation_listener, stop_invalidation_listener
+from http_client import close_http_client
 from routes.analytics import analytics_bp
 import atexit
 
@@ -12,16 +17,32 @@ app.config.from_object(Config)
 # Enable CORS
 CORS(app, origins=[Config.FRONTEND_URL], supports_credentials=True)
 
+# Per-route latency histograms and slow-request log
+init_request_metrics(app)
+
 # Initialize cache
 init_cache()
 
+# Evict cached results when transactions change
+start_invalidation_listener()
+
 # Register blueprints
 app.register_blueprint(analytics_bp, url_prefix='/analytics')
 
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok', 'service': 'analytics-service'}), 200
+    return jsonify({
+        'status': 'ok',
+        'service': 'analytics-service',
+        'token_cache': token_cache.stats(),
+        'result_cache': local_cache.stats()
+    }), 200
+
+# Prometheus metrics (request latency and sizes per route)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 # Error handlers
 @app.errorhandler(404)
@@ -35,6 +56,8 @@ def internal_error(error):
 # Cleanup on exit
 @atexit.register
 def cleanup():
+    stop_invalidation_listener()
+    close_http_client()
     close_cache()
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+"""Micro-benchmark of the monthly calculations: columnar engine vs row-by-row.
+
+For each batch size, times what GET /analytics/month/<y>/<m> computes from a
+batch of transactions (income, expenses, budget vs actual and the count):
+  - rows:     the former per-row implementations, which filter and regroup
+              the list of dicts once per calculation
+  - columnar: TransactionColumns, converting the batch once (timed alone
+              in the `convert` column) and answering every calculation
+              with np.bincount
+
+and checks that both give the same results.
+
+Run from the analytics-service directory:
+    python -m benchmarks.calculator --sizes 10000 100000 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from services.calculator import AnalyticsCalculator
+from services.columnar import TransactionColumns
+
+CATEGORIES = ['Groceries', 'Rent', 'Utilities', 'Transport', 'Dining', 'Shopping', 'Health', 'Travel', 'Salary']
+CURRENCIES = ['USD', 'EUR', 'CAD', 'HUF']
+
+def generate(size):
+    """`size` random transactions shaped like the transaction service returns them"""
+    rng = random.Random(42)
+    return [
+        {
+            'type': 'income' if rng.random() < 0.1 else 'expense',
+            'amount': round(rng.uniform(1, 500), 2),
+            'currency': rng.choice(CURRENCIES),
+            'category': rng.choice(CATEGORIES)
+        }
+        for _ in range(size)
+    ]
+
+def row_totals(transactions, transaction_type):
+    rows = [t for t in transactions if t['type'] == transaction_type]
+    by_currency = {}
+    for row in rows:
+        by_currency[row['currency']] = by_currency.get(row['currency'], 0) + row['amount']
+    return {'total': sum(by_currency.values()), 'by_currency': by_currency, 'count': len(rows)}
+
+def row_category_totals(transactions):
+    actual = {}
+    for expense in (t for t in transactions if t['type'] == 'expense'):
+        totals = actual.setdefault(expense['category'], {'total': 0, 'count': 0})
+        totals['total'] += expense['amount']
+        totals['count'] += 1
+    return actual
+
+def by_rows(transactions):
+    return (
+        row_totals(transactions, 'income'),
+        row_totals(transactions, 'expense'),
+        row_category_totals(transactions),
+        len(transactions)
+    )
+
+def by_columns(columns):
+    return (
+        AnalyticsCalculator.calculate_monthly_income(columns),
+        AnalyticsCalculator.calculate_monthly_expenses(columns),
+        columns.category_totals('expense'),
+        AnalyticsCalculator.count_transactions(columns)
+    )
+
+def time_runs(fn, repeats):
+    """Median wall time of fn in milliseconds, and its last result"""
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the analytics calculations on synthetic batches')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'rows ms':>9} {'columnar ms':>12} {'(convert)':>10} {'speedup':>8}  same")
+    for size in args.sizes:
+        transactions = generate(size)
+        rows_ms, expected = time_runs(lambda: by_rows(transactions), args.repeats)
+        # Columns are built inside each run, since they keep their grouped totals
+        columnar_ms, result = time_runs(lambda: by_columns(TransactionColumns(transactions)), args.repeats)
+        convert_ms, _ = time_runs(lambda: TransactionColumns(transactions), args.repeats)
+        print(
+            f"{size:>9} {rows_ms:>9.1f} {columnar_ms:>12.1f} {convert_ms:>10.1f} "
+            f"{rows_ms / columnar_ms if columnar_ms else 0:>7.1f}x  {result == expected}"
+        )
@@ -1,9 +1,132 @@
+"""Redis cache of analytics results.
+
+Keys are readable and grouped per user:
+    analytics:{<user_id>}:<endpoint>:<param>=<value>&...   cached result
+    analytics:{<user_id>}:idx:<YYYY-MM|all>                set of the user's keys covering a period
+    analytics:{<user_id>}:idx                              set of the user's period index keys
+    analytics:{<user_id>}:gen                              counter bumped by every invalidation
+The braces make every key of a user hash to the same Redis Cluster slot, so
+they can be deleted together. Invalidating a period or a user reads these sets
+instead of scanning the keyspace.
+
+A result computed while an invalidation happened may be stale. Callers read
+`cache_generation` before fetching data and pass it to `set_cache`, which only
+writes (WATCH/MULTI) if the counter has not moved since.
+
+Each worker process also keeps recently used results decoded in memory
+(`local_cache`, L1) in front of Redis (L2). L1 entries live at most
+CACHE_L1_TTL seconds; every worker reads the change events, so each drops its
+own L1 copies along with the Redis ones. `cached()` also makes sure only one
+caller computes a missing result at a time: other threads of the process wait
+for it, and other workers wait on a Redis lock (analytics:{<user_id>}:...:lock)
+and then read it from Redis.
+"""
+from collections import OrderedDict
+import fnmatch
 import redis
 import json
+import threading
+import time
+import uuid
 from config import Config
+from metrics import Metric
+
+KEY_PREFIX = 'analytics'
+UNLINK_BATCH = 500  # Keys per UNLINK / SCAN page when deleting by pattern
+
+# Delete a lock only if it still holds our token
+RELEASE_LOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+CACHE_LOOKUPS = Metric(
+    'analytics_cache_lookups_total',
+    'Result cache lookups by tier (l1 = in-process, l2 = Redis) and result (hit, miss, coalesced)',
+    ('tier', 'result'))
 
 redis_client = None
 
+class LocalCache:
+    """Thread-safe LRU of decoded results with a TTL, invalidated per user and period like the Redis entries.
+
+    A value read from Redis (or computed) just before an invalidation must not
+    be stored after it: callers take `generation(key)` before reading and pass
+    it to put(), which drops the value if the key's user was invalidated since.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value, periods); periods None = any period
+        self.generations = {}  # user prefix -> invalidations seen
+        self.epoch = 0  # Bumped by delete() and when generations is reset
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def _owner(key):
+        """User prefix of a key, e.g. analytics:{<user_id>}"""
+        return key.partition('}:')[0] + '}'
+
+    def generation(self, key):
+        """Snapshot that changes whenever the key's user is invalidated"""
+        with self.lock:
+            return self.epoch, self.generations.get(self._owner(key), 0)
+
+    def get(self, key):
+        if self.max_size <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, ttl, periods=None, generation=None):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + min(ttl, self.ttl)
+        with self.lock:
+            if generation is not None and generation != (self.epoch, self.generations.get(self._owner(key), 0)):
+                return
+            self.entries[key] = (expires_at, value, frozenset(periods) if periods else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id, periods=None):
+        """Drop a user's entries covering any of the periods (or any period unknown to L1), or all of them"""
+        owner = user_prefix(user_id)
+        prefix = f"{owner}:"
+        with self.lock:
+            if len(self.generations) >= max(self.max_size, 1000):
+                self.generations.clear()
+                self.epoch += 1
+            self.generations[owner] = self.generations.get(owner, 0) + 1
+            for key, (_, _, covered) in list(self.entries.items()):
+                if key.startswith(prefix) and (periods is None or covered is None or not covered.isdisjoint(periods)):
+                    del self.entries[key]
+
+    def delete(self, pattern):
+        with self.lock:
+            self.epoch += 1
+            for key in [key for key in self.entries if fnmatch.fnmatchcase(key, pattern)]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'evictions': self.evictions
+            }
+
+local_cache = LocalCache(Config.CACHE_L1_SIZE, Config.CACHE_L1_TTL)
+
 def init_cache():
     """Initialize Redis connection"""
     global redis_client
@@ -23,42 +146,329 @@ def init_cache():
         return None
 
 def get_cache(key):
-    """Get value from cache"""
+    """Get value from cache (in-process first, then Redis)"""
     if not redis_client:
         return None
+    value = local_cache.get(key)
+    if value is not None:
+        CACHE_LOOKUPS.add(('l1', 'hit'))
+        return value
+    CACHE_LOOKUPS.add(('l1', 'miss'))
+    generation = local_cache.generation(key)
     try:
-        value = redis_client.get(key)
-        if value:
-            return json.loads(value)
+        value, ttl = _redis_get(key)
+    except Exception as e:
+        print(f"Cache get error: {e}")
         return None
+    CACHE_LOOKUPS.add(('l2', 'hit' if value is not None else 'miss'))
+    if value is not None:
+        local_cache.put(key, value, ttl, generation=generation)
+    return value
+
+def _redis_get(key):
+    """(decoded value, remaining TTL) of a key in Redis, or (None, None)"""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.get(key)
+    pipe.ttl(key)
+    value, ttl = pipe.execute()
+    if not value:
+        return None, None
+    return json.loads(value), max(ttl, 1)
+
+def user_prefix(user_id):
+    """Prefix shared by all of a user's keys"""
+    return f"{KEY_PREFIX}:{{{user_id}}}"
+
+def result_key(user_id, endpoint, params):
+    """Key of a cached result, e.g. analytics:{<user_id>}:monthly_summary:month=2&year=2026"""
+    param_str = '&'.join(f"{name}={'' if value is None else value}" for name, value in sorted(params.items()))
+    return f"{user_prefix(user_id)}:{endpoint}:{param_str}"
+
+def index_key(user_id, period):
+    """Key of the set tracking a user's cache entries for one period ('all' = unbounded ranges)"""
+    return f"{user_prefix(user_id)}:idx:{period}"
+
+def registry_key(user_id):
+    """Key of the set of a user's index keys"""
+    return f"{user_prefix(user_id)}:idx"
+
+def generation_key(user_id):
+    """Key of the counter bumped whenever a user's entries are invalidated"""
+    return f"{user_prefix(user_id)}:gen"
+
+def cache_generation(user_id):
+    """Current invalidation generation of a user, to read before computing a result (None without Redis)"""
+    if not redis_client:
+        return None
+    try:
+        return int(redis_client.get(generation_key(user_id)) or 0)
     except Exception as e:
         print(f"Cache get error: {e}")
         return None
 
-def set_cache(key, value, ttl=None):
-    """Set value in cache"""
+def get_many_cache(keys):
+    """Get several values, those not held in-process in one Redis round trip (MGET); missing keys are None"""
+    if not redis_client or not keys:
+        return [None] * len(keys)
+    values = [local_cache.get(key) for key in keys]
+    missing = [i for i, value in enumerate(values) if value is None]
+    CACHE_LOOKUPS.add(('l1', 'hit'), len(keys) - len(missing))
+    CACHE_LOOKUPS.add(('l1', 'miss'), len(missing))
+    if not missing:
+        return values
+    generations = {i: local_cache.generation(keys[i]) for i in missing}
+    try:
+        found = redis_client.mget([keys[i] for i in missing])
+    except Exception as e:
+        print(f"Cache get error: {e}")
+        return values
+    hits = 0
+    for i, value in zip(missing, found):
+        if value:
+            values[i] = json.loads(value)
+            # The remaining Redis TTL is unknown here; L1 keeps it for at most CACHE_L1_TTL anyway
+            local_cache.put(keys[i], values[i], Config.CACHE_L1_TTL, generation=generations[i])
+            hits += 1
+    CACHE_LOOKUPS.add(('l2', 'hit'), hits)
+    CACHE_LOOKUPS.add(('l2', 'miss'), len(missing) - hits)
+    return values
+
+def _queue_set(pipe, key, value, ttl, user_id, periods):
+    pipe.setex(key, ttl, json.dumps(value))
+    if user_id:
+        registry = registry_key(user_id)
+        for period in periods or ['all']:
+            idx = index_key(user_id, period)
+            pipe.sadd(idx, key)
+            pipe.sadd(registry, idx)
+            # The indexes only need to outlive the entries they track
+            for tracking in (idx, registry):
+                pipe.expire(tracking, ttl, gt=True)
+                pipe.expire(tracking, ttl, nx=True)
+
+def _write(user_id, generation, queue):
+    """Run the writes queue() adds to a pipeline; with a generation, only if the user's is still the same"""
+    if generation is None:
+        pipe = redis_client.pipeline(transaction=False)
+        queue(pipe)
+        pipe.execute()
+        return True
+    gen_key = generation_key(user_id)
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(gen_key)
+            if int(pipe.get(gen_key) or 0) != generation:
+                return False
+            pipe.multi()
+            queue(pipe)
+            pipe.execute()
+            return True
+        except redis.WatchError:
+            # Invalidated between the check and the write
+            return False
+
+def set_cache(key, value, ttl=None, user_id=None, periods=None, generation=None):
+    """Set value in cache, tracking it under the user's periods for invalidation.
+
+    With a generation (from cache_generation, read before the value was
+    computed), nothing is written if the user's entries were invalidated since.
+    """
     if not redis_client:
         return False
+    local_generation = local_cache.generation(key)
     try:
         ttl = ttl or Config.CACHE_TTL
-        redis_client.setex(key, ttl, json.dumps(value))
+        if not _write(user_id, generation, lambda pipe: _queue_set(pipe, key, value, ttl, user_id, periods)):
+            return False
+        local_cache.put(key, value, ttl, periods, local_generation)
         return True
     except Exception as e:
         print(f"Cache set error: {e}")
         return False
 
+def set_many_cache(entries, user_id=None, generation=None):
+    """Set several (key, value, ttl, periods) entries in one round trip, tracked and guarded like set_cache"""
+    if not redis_client or not entries:
+        return False
+    local_generations = [local_cache.generation(key) for key, _, _, _ in entries]
+    try:
+        def queue(pipe):
+            for key, value, ttl, periods in entries:
+                _queue_set(pipe, key, value, ttl or Config.CACHE_TTL, user_id, periods)
+        if not _write(user_id, generation, queue):
+            return False
+        for (key, value, ttl, periods), local_generation in zip(entries, local_generations):
+            local_cache.put(key, value, ttl or Config.CACHE_TTL, periods, local_generation)
+        return True
+    except Exception as e:
+        print(f"Cache set error: {e}")
+        return False
+
+def invalidate_periods(user_id, periods):
+    """Delete a user's cache entries covering any of the given periods"""
+    if not redis_client:
+        return 0
+    try:
+        # Bumped first, so a result computed before this can no longer be written
+        redis_client.incr(generation_key(user_id))
+        indexes = [index_key(user_id, period) for period in periods] + [index_key(user_id, 'all')]
+        keys = redis_client.sunion(indexes)
+        pipe = redis_client.pipeline(transaction=False)
+        if keys:
+            pipe.unlink(*keys)
+        pipe.unlink(*indexes)
+        pipe.srem(registry_key(user_id), *indexes)
+        pipe.execute()
+        return len(keys)
+    except Exception as e:
+        print(f"Cache invalidate error: {e}")
+        return 0
+    finally:
+        # After Redis, so a copy read from Redis meanwhile is refused by put()
+        local_cache.invalidate(user_id, periods)
+
+def invalidate_user(user_id):
+    """Delete all of a user's cache entries (O(keys of the user), no keyspace scan)"""
+    if not redis_client:
+        return 0
+    try:
+        redis_client.incr(generation_key(user_id))
+        registry = registry_key(user_id)
+        indexes = list(redis_client.smembers(registry))
+        keys = redis_client.sunion(indexes) if indexes else set()
+        pipe = redis_client.pipeline(transaction=False)
+        if keys:
+            pipe.unlink(*keys)
+        pipe.unlink(registry, *indexes)
+        pipe.execute()
+        return len(keys)
+    except Exception as e:
+        print(f"Cache invalidate error: {e}")
+        return 0
+    finally:
+        local_cache.invalidate(user_id)
+
 def delete_cache(pattern):
-    """Delete cache keys matching pattern"""
+    """Delete cache keys matching pattern, e.g. 'analytics:*' (SCAN + UNLINK, does not block Redis)"""
     if not redis_client:
         return False
     try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
+        batch = []
+        for key in redis_client.scan_iter(match=pattern, count=UNLINK_BATCH):
+            batch.append(key)
+            if len(batch) >= UNLINK_BATCH:
+                redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            redis_client.unlink(*batch)
         return True
     except Exception as e:
         print(f"Cache delete error: {e}")
         return False
+    finally:
+        local_cache.delete(pattern)
+
+# Single-flight computation of missing results
+
+class _Flight:
+    """A computation in progress that other threads of the process wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+def _acquire_lock(key):
+    """Token of the Redis lock on computing a key, False if another worker holds it, None without Redis"""
+    token = uuid.uuid4().hex
+    try:
+        if redis_client.set(f"{key}:lock", token, nx=True, px=Config.CACHE_LOCK_TIMEOUT_MS):
+            return token
+        return False
+    except Exception as e:
+        print(f"Cache lock error: {e}")
+        return None
+
+def _release_lock(key, token):
+    try:
+        redis_client.eval(RELEASE_LOCK, 1, f"{key}:lock", token)
+    except Exception as e:
+        print(f"Cache lock error: {e}")
+
+def _wait_for_worker(key):
+    """Result another worker is computing, or None if it gave up or took too long"""
+    deadline = time.monotonic() + Config.CACHE_LOCK_TIMEOUT_MS / 1000
+    while time.monotonic() < deadline:
+        time.sleep(Config.CACHE_LOCK_POLL_MS / 1000)
+        generation = local_cache.generation(key)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            pipe.exists(f"{key}:lock")
+            value, ttl, locked = pipe.execute()
+        except Exception as e:
+            print(f"Cache get error: {e}")
+            return None
+        if value:
+            value = json.loads(value)
+            local_cache.put(key, value, max(ttl, 1), generation=generation)
+            return value
+        if not locked:
+            return None
+    return None
+
+def _compute(key, compute, ttl, user_id, periods):
+    """Compute and cache a result, unless another worker is already doing it"""
+    token = _acquire_lock(key)
+    if token is False:
+        value = _wait_for_worker(key)
+        if value is not None:
+            CACHE_LOOKUPS.add(('l2', 'coalesced'))
+            return value
+    try:
+        generation = cache_generation(user_id) if user_id else None
+        value = compute()
+        if value is not None:
+            set_cache(key, value, ttl, user_id, periods, generation)
+        return value
+    finally:
+        if token:
+            _release_lock(key, token)
+
+def cached(key, compute, ttl=None, user_id=None, periods=None):
+    """Cached result for a key, computed with compute() on a miss by one caller at a time.
+
+    compute() returning None means "nothing to cache" (e.g. no budget); callers
+    waiting on it then compute for themselves.
+    """
+    value = get_cache(key)
+    if value is not None:
+        return value
+    if not redis_client:
+        return compute()
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait(Config.CACHE_LOCK_TIMEOUT_MS / 1000)
+        if flight.value is not None:
+            CACHE_LOOKUPS.add(('l1', 'coalesced'))
+            return flight.value
+        return compute()
+
+    try:
+        flight.value = _compute(key, compute, ttl, user_id, periods)
+        return flight.value
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
 
 def close_cache():
     """Close Redis connection"""
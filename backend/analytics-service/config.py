@@ -13,13 +13,40 @@ class Config:
     REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
     REDIS_DB = int(os.getenv('REDIS_DB', 0))
     CACHE_TTL = int(os.getenv('CACHE_TTL', 300))  # 5 minutes default
+    CACHE_TTL_CLOSED = int(os.getenv('CACHE_TTL_CLOSED', 604800))  # Past months (change events still evict them)
+    TREND_MAX_MONTHS = int(os.getenv('TREND_MAX_MONTHS', 60))
+    # In-process results in front of Redis (CACHE_L1_SIZE=0 disables it)
+    CACHE_L1_SIZE = int(os.getenv('CACHE_L1_SIZE', 1000))
+    CACHE_L1_TTL = int(os.getenv('CACHE_L1_TTL', 30))  # seconds; bounds staleness if a change event is missed
+    # Lock held while one worker computes a missing result; the others poll Redis for it
+    CACHE_LOCK_TIMEOUT_MS = int(os.getenv('CACHE_LOCK_TIMEOUT_MS', 10000))
+    CACHE_LOCK_POLL_MS = int(os.getenv('CACHE_LOCK_POLL_MS', 50))
+    
+    # Change events published by the transaction service
+    EVENTS_STREAM = os.getenv('EVENTS_STREAM', 'transactions:changes')
+    EVENTS_BLOCK_MS = int(os.getenv('EVENTS_BLOCK_MS', 5000))
+    
+    # Request metrics (GET /metrics) and slow-request log
+    REQUEST_METRICS = os.getenv('REQUEST_METRICS', '1') == '1'
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
     
     # JWT
     JWT_SECRET = os.getenv('JWT_SECRET', 'ExpTrk_Jwt_S3cr3t_2024_64ch_H5h_D3v_M1n1mum!!')
     
+    # Verified JWT claims cache (TOKEN_CACHE_SIZE=0 disables it)
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))  # seconds; entries never outlive the token's exp
+    
     # CORS
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
     
     # Microservices URLs
     TRANSACTION_SERVICE_URL = os.getenv('TRANSACTION_SERVICE_URL', 'http://localhost:3003')
     BUDGET_SERVICE_URL = os.getenv('BUDGET_SERVICE_URL', 'http://localhost:3002')
+    
+    # Pooled HTTP client for the services above
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))  # seconds
+    HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 4))  # Downstream hosts with their own connection pool
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 32))  # Keep-alive connections per host; match the request threads
+    FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', 16))  # Threads running fetches in parallel with the request thread
+    FETCH_PAGE_SIZE = int(os.getenv('FETCH_PAGE_SIZE', 1000))  # Transactions per page; pages are followed until the range ends
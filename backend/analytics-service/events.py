@@ -0,0 +1,58 @@
+"""Consume transaction change events and evict the affected cache entries.
+
+The transaction service publishes `{user_id, periods}` events to a Redis
+stream whenever transactions are created, updated or deleted. A daemon thread
+per worker reads the stream and deletes exactly the cache entries tracked
+under those periods, so cached analytics never outlive the data they were
+computed from.
+"""
+import json
+import threading
+import cache
+from config import Config
+
+_stop = threading.Event()
+_listener_thread = None
+
+def handle_event(fields):
+    """Evict the cache entries affected by one change event"""
+    try:
+        event = json.loads(fields['event'])
+        if 'periods' in event:
+            cache.invalidate_periods(event['user_id'], event['periods'])
+        else:
+            # Events without periods affect all of the user's data
+            cache.invalidate_user(event['user_id'])
+    except (KeyError, ValueError) as e:
+        print(f"Malformed change event: {e}")
+
+def start_invalidation_listener():
+    """Start reading the change stream from its current end"""
+    global _listener_thread
+    if not cache.redis_client or _listener_thread:
+        return
+    
+    def run():
+        last_id = '$'
+        while not _stop.is_set():
+            try:
+                response = cache.redis_client.xread(
+                    {Config.EVENTS_STREAM: last_id},
+                    count=100,
+                    block=Config.EVENTS_BLOCK_MS
+                )
+                for _stream, messages in response or []:
+                    for message_id, fields in messages:
+                        handle_event(fields)
+                        last_id = message_id
+            except Exception as e:
+                print(f"Change event listener error: {e}")
+                _stop.wait(1)
+    
+    _listener_thread = threading.Thread(target=run, name='cache-invalidation', daemon=True)
+    _listener_thread.start()
+    print(f"Listening for transaction changes on {Config.EVENTS_STREAM}")
+
+def stop_invalidation_listener():
+    """Ask the listener thread to stop after its current read"""
+    _stop.set()
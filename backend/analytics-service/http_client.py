@@ -0,0 +1,31 @@
+"""Pooled HTTP client for the transaction and budget services.
+
+One `requests.Session` is shared by all request threads, so connections to
+the downstream services are kept alive and reused instead of being opened
+for every call. `fetch_pool` runs independent fetches of one request
+concurrently (e.g. a month's transactions and its budget).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+
+def _create_session():
+    session = requests.Session()
+    # One pool per downstream host; pool_maxsize bounds the idle keep-alive
+    # connections kept per host (pool_block=False opens extra ones under bursts)
+    adapter = HTTPAdapter(
+        pool_connections=Config.HTTP_POOL_HOSTS,
+        pool_maxsize=Config.HTTP_POOL_SIZE
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+http_session = _create_session()
+fetch_pool = ThreadPoolExecutor(max_workers=Config.FETCH_WORKERS, thread_name_prefix='fetch')
+
+def close_http_client():
+    """Stop the fetch threads and close pooled connections"""
+    fetch_pool.shutdown(wait=False, cancel_futures=True)
+    http_session.close()
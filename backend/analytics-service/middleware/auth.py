@@ -2,6 +2,15 @@ from functools import wraps
 from flask import request, jsonify
 import jwt
 from config import Config
+from middleware.token_cache import token_cache
+
+def verify_token(token):
+    """Decode and verify a JWT, reusing claims verified by an earlier request"""
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, Config.JWT_SECRET, algorithms=['HS256'])
+        token_cache.put(token, claims)
+    return claims
 
 def authenticate_jwt(f):
     """Decorator to validate JWT tokens"""
@@ -19,7 +28,7 @@ def authenticate_jwt(f):
         token = parts[1]
         
         try:
-            decoded = jwt.decode(token, Config.JWT_SECRET, algorithms=['HS256'])
+            decoded = verify_token(token)
             request.user = decoded
             return f(*args, **kwargs)
         except jwt.ExpiredSignatureError:
@@ -0,0 +1,70 @@
+"""Per-route request latency and size metrics, and a slow-request log.
+
+`init_request_metrics(app)` times every request of a Flask app. Routes are
+labelled by their URL rule (e.g. /transactions/<transaction_id>), not the
+raw path, so the number of series stays bounded. Requests slower than
+SLOW_REQUEST_MS are also printed as one JSON line with their parameters.
+
+For streamed responses the time is measured until the response starts.
+"""
+import json
+import time
+from flask import request
+from config import Config
+from metrics import Histogram, Metric
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Request latency by route and status',
+    ('method', 'route', 'status'))
+REQUEST_BYTES = Metric(
+    'http_request_bytes_total', 'Request body bytes received (declared Content-Length)',
+    ('method', 'route'))
+RESPONSE_BYTES = Metric(
+    'http_response_bytes_total', 'Response body bytes sent (non-streamed responses)',
+    ('method', 'route'))
+
+SLOW_REQUEST_SECONDS = Config.SLOW_REQUEST_MS / 1000
+
+def record_request(req, response):
+    """Record a request timed from req.started_at; works for Flask and Quart requests"""
+    started = getattr(req, 'started_at', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = req.url_rule.rule if req.url_rule is not None else 'unmatched'
+    labels = (req.method, route)
+
+    REQUEST_SECONDS.observe(labels + (response.status_code,), elapsed)
+    if req.content_length:
+        REQUEST_BYTES.add(labels, req.content_length)
+    if response.content_length:
+        RESPONSE_BYTES.add(labels, response.content_length)
+
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        user = getattr(req, 'user', None) or {}
+        print(json.dumps({
+            'event': 'slow_request',
+            'method': req.method,
+            'route': route,
+            'path': req.path,
+            'params': req.args.to_dict(),
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 1),
+            'request_bytes': req.content_length,
+            'response_bytes': response.content_length,
+            'user_id': user.get('id')
+        }), flush=True)
+    return response
+
+def init_request_metrics(app):
+    """Register the timing hooks on a Flask app"""
+    if not Config.REQUEST_METRICS:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        request.started_at = time.perf_counter()
+
+    @app.after_request
+    def record_request_timing(response):
+        return record_request(request, response)
@@ -0,0 +1,75 @@
+"""Bounded cache of verified JWT claims.
+
+Entries are keyed by a SHA-256 digest of the token (the raw token is never
+stored) and expire at the token's `exp` claim, or after TOKEN_CACHE_TTL,
+whichever comes first. Least recently used entries are dropped once
+TOKEN_CACHE_SIZE is reached.
+"""
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from config import Config
+
+class TokenCache:
+    """Thread-safe LRU cache of verified token claims"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # digest -> (expires_at, claims)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        """Return a copy of the cached claims for a token, or None"""
+        if self.max_size <= 0:
+            return None
+        key = self.digest(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return dict(entry[1])
+
+    def put(self, token, claims):
+        """Cache verified claims until the token expires"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if isinstance(claims.get('exp'), (int, float)):
+            expires_at = min(expires_at, claims['exp'])
+        key = self.digest(token)
+        with self.lock:
+            self.entries[key] = (expires_at, dict(claims))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Hit-rate counters for the health endpoint"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+token_cache = TokenCache(Config.TOKEN_CACHE_SIZE, Config.TOKEN_CACHE_TTL)
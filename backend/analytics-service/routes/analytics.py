@@ -1,16 +1,50 @@
 from flask import Blueprint, request, jsonify
 from middleware.auth import authenticate_jwt
 from services.calculator import AnalyticsCalculator
-from cache import get_cache, set_cache
-import hashlib
+from cache import result_key, cached, cache_generation, get_many_cache, set_many_cache
+from config import Config
+from datetime import datetime
+import calendar
 
 analytics_bp = Blueprint('analytics', __name__)
 
-def generate_cache_key(user_id, endpoint, params):
-    """Generate a cache key based on endpoint and parameters"""
-    param_str = str(sorted(params.items()))
-    key_str = f"{user_id}:{endpoint}:{param_str}"
-    return f"analytics:{hashlib.md5(key_str.encode()).hexdigest()}"
+def month_date_range(year, month):
+    """First and last day of a month; the transaction service treats a date-only end_date as inclusive"""
+    last_day = calendar.monthrange(year, month)[1]
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}"
+
+def periods_between(start_date, end_date, max_periods=36):
+    """YYYY-MM periods covered by a date range, or None when it is open-ended or too long"""
+    if not start_date or not end_date:
+        return None
+    try:
+        year, month = int(start_date[:4]), int(start_date[5:7])
+        end_year, end_month = int(end_date[:4]), int(end_date[5:7])
+    except ValueError:
+        return None
+    periods = []
+    while (year, month) <= (end_year, end_month):
+        if len(periods) >= max_periods:
+            return None
+        periods.append(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+def month_cache_ttl(year, month):
+    """Cache TTL of a month's results: long once the month is over"""
+    now = datetime.utcnow()
+    return Config.CACHE_TTL_CLOSED if (year, month) < (now.year, now.month) else Config.CACHE_TTL
+
+def periods_cache_ttl(periods):
+    """Cache TTL of results covering YYYY-MM periods: long once all of them are over"""
+    if not periods:
+        return Config.CACHE_TTL
+    return month_cache_ttl(int(periods[-1][:4]), int(periods[-1][5:]))
+
+def parse_month(value):
+    """(year, month) of a YYYY-MM parameter (raises ValueError)"""
+    parsed = datetime.strptime(value or '', '%Y-%m')
+    return parsed.year, parsed.month
 
 # Get monthly summary
 @analytics_bp.route('/month/<int:year>/<int:month>', methods=['GET'])
@@ -20,46 +54,37 @@ def get_monthly_summary(year, month):
         user_id = request.user['id']
         token = request.headers.get('Authorization').split()[1]
         
-        # Build date range (needs proper implementation with calendar)
-        start_date = f"{year}-{month:02d}-01"
-        if month == 12:
-            end_date = f"{year + 1}-01-01"
-        else:
-            end_date = f"{year}-{month + 1:02d}-01"
-        
-        # Check cache
-        cache_key = generate_cache_key(user_id, 'monthly_summary', {'year': year, 'month': month})
-        cached = get_cache(cache_key)
-        if cached:
-            return jsonify(cached), 200
-        
-        # Fetch data
-        transactions = AnalyticsCalculator.fetch_transactions(token, user_id, start_date, end_date)
-        budget = AnalyticsCalculator.fetch_budget(token, year, month)
-        
-        # Calculate
-        income = AnalyticsCalculator.calculate_monthly_income(transactions)
-        expenses = AnalyticsCalculator.calculate_monthly_expenses(transactions)
-        
-        opening_balance = budget['opening_balance'] if budget else 0
-        closing_balance = AnalyticsCalculator.calculate_closing_balance(opening_balance, income, expenses)
-        
-        # Budget vs actual
-        budget_comparison = AnalyticsCalculator.calculate_budget_vs_actual(budget, transactions)
-        
-        result = {
-            'year': year,
-            'month': month,
-            'opening_balance': opening_balance,
-            'income': income,
-            'expenses': expenses,
-            'closing_balance': closing_balance,
-            'budget_comparison': budget_comparison,
-            'transaction_count': len(transactions)
-        }
-        
-        # Cache result
-        set_cache(cache_key, result)
+        # Build date range
+        start_date, end_date = month_date_range(year, month)
+        
+        def compute():
+            # Fetch data
+            totals, budget = AnalyticsCalculator.fetch_month_data(token, year, month, start_date, end_date)
+            
+            # Calculate
+            income = AnalyticsCalculator.calculate_monthly_income(totals)
+            expenses = AnalyticsCalculator.calculate_monthly_expenses(totals)
+            
+            opening_balance = budget['opening_balance'] if budget else 0
+            closing_balance = AnalyticsCalculator.calculate_closing_balance(opening_balance, income, expenses)
+            
+            # Budget vs actual
+            budget_comparison = AnalyticsCalculator.calculate_budget_vs_actual(budget, totals)
+            
+            return {
+                'year': year,
+                'month': month,
+                'opening_balance': opening_balance,
+                'income': income,
+                'expenses': expenses,
+                'closing_balance': closing_balance,
+                'budget_comparison': budget_comparison,
+                'transaction_count': AnalyticsCalculator.count_transactions(totals)
+            }
+        
+        # Cached result, or computed once for all concurrent requests
+        cache_key = result_key(user_id, 'monthly_summary', {'year': year, 'month': month})
+        result = cached(cache_key, compute, month_cache_ttl(year, month), user_id=user_id, periods=[f"{year}-{month:02d}"])
         
         return jsonify(result), 200
     
@@ -78,25 +103,20 @@ def get_category_summary():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # Check cache
-        cache_key = generate_cache_key(user_id, 'category_summary', {
+        def compute():
+            # Stream transactions page by page into the summary
+            transactions = AnalyticsCalculator.iter_transactions(token, user_id, start_date, end_date)
+            
+            # Calculate
+            return {'categories': AnalyticsCalculator.calculate_category_summary(transactions)}
+        
+        # Cached result, or computed once for all concurrent requests
+        cache_key = result_key(user_id, 'category_summary', {
             'start_date': start_date,
             'end_date': end_date
         })
-        cached = get_cache(cache_key)
-        if cached:
-            return jsonify(cached), 200
-        
-        # Fetch transactions
-        transactions = AnalyticsCalculator.fetch_transactions(token, user_id, start_date, end_date)
-        
-        # Calculate
-        summary = AnalyticsCalculator.calculate_category_summary(transactions)
-        
-        result = {'categories': summary}
-        
-        # Cache result
-        set_cache(cache_key, result)
+        periods = periods_between(start_date, end_date)
+        result = cached(cache_key, compute, periods_cache_ttl(periods), user_id=user_id, periods=periods)
         
         return jsonify(result), 200
     
@@ -112,38 +132,31 @@ def get_budget_vs_actual(year, month):
         user_id = request.user['id']
         token = request.headers.get('Authorization').split()[1]
         
-        # Check cache
-        cache_key = generate_cache_key(user_id, 'budget_vs_actual', {'year': year, 'month': month})
-        cached = get_cache(cache_key)
-        if cached:
-            return jsonify(cached), 200
-        
         # Build date range
-        start_date = f"{year}-{month:02d}-01"
-        if month == 12:
-            end_date = f"{year + 1}-01-01"
-        else:
-            end_date = f"{year}-{month + 1:02d}-01"
-        
-        # Fetch data
-        transactions = AnalyticsCalculator.fetch_transactions(token, user_id, start_date, end_date)
-        budget = AnalyticsCalculator.fetch_budget(token, year, month)
-        
-        if not budget:
+        start_date, end_date = month_date_range(year, month)
+        
+        def compute():
+            # Fetch data
+            totals, budget = AnalyticsCalculator.fetch_month_data(token, year, month, start_date, end_date)
+            
+            # Nothing to cache without a budget
+            if not budget:
+                return None
+            
+            # Calculate comparison
+            return {
+                'year': year,
+                'month': month,
+                'categories': AnalyticsCalculator.calculate_budget_vs_actual(budget, totals)
+            }
+        
+        # Cached result, or computed once for all concurrent requests
+        cache_key = result_key(user_id, 'budget_vs_actual', {'year': year, 'month': month})
+        result = cached(cache_key, compute, month_cache_ttl(year, month), user_id=user_id, periods=[f"{year}-{month:02d}"])
+        
+        if not result:
             return jsonify({'error': 'No budget found for this month'}), 404
         
-        # Calculate comparison
-        comparison = AnalyticsCalculator.calculate_budget_vs_actual(budget, transactions)
-        
-        result = {
-            'year': year,
-            'month': month,
-            'categories': comparison
-        }
-        
-        # Cache result
-        set_cache(cache_key, result)
-        
         return jsonify(result), 200
     
     except Exception as e:
@@ -160,19 +173,14 @@ def get_real_available(year, month):
         saves = float(request.args.get('saves', 0))
         
         # Build date range
-        start_date = f"{year}-{month:02d}-01"
-        if month == 12:
-            end_date = f"{year + 1}-01-01"
-        else:
-            end_date = f"{year}-{month + 1:02d}-01"
+        start_date, end_date = month_date_range(year, month)
         
         # Fetch data
-        transactions = AnalyticsCalculator.fetch_transactions(token, user_id, start_date, end_date)
-        budget = AnalyticsCalculator.fetch_budget(token, year, month)
+        totals, budget = AnalyticsCalculator.fetch_month_data(token, year, month, start_date, end_date)
         
         # Calculate
-        income = AnalyticsCalculator.calculate_monthly_income(transactions)
-        expenses = AnalyticsCalculator.calculate_monthly_expenses(transactions)
+        income = AnalyticsCalculator.calculate_monthly_income(totals)
+        expenses = AnalyticsCalculator.calculate_monthly_expenses(totals)
         opening_balance = budget['opening_balance'] if budget else 0
         closing_balance = AnalyticsCalculator.calculate_closing_balance(opening_balance, income, expenses)
         real_available = AnalyticsCalculator.calculate_real_available(closing_balance, saves)
@@ -186,3 +194,57 @@ def get_real_available(year, month):
     except Exception as e:
         print(f"Real available error: {e}")
         return jsonify({'error': 'Failed to calculate real available'}), 500
+
+# Get income/expense trend over a range of months
+@analytics_bp.route('/trend', methods=['GET'])
+@authenticate_jwt
+def get_trend():
+    try:
+        user_id = request.user['id']
+        token = request.headers.get('Authorization').split()[1]
+        
+        try:
+            first = parse_month(request.args.get('from'))
+            last = parse_month(request.args.get('to'))
+        except ValueError:
+            return jsonify({'error': 'from and to must be months in YYYY-MM format'}), 400
+        periods = periods_between(f"{first[0]}-{first[1]:02d}", f"{last[0]}-{last[1]:02d}", Config.TREND_MAX_MONTHS)
+        if not periods:
+            return jsonify({'error': f'from must not be after to, and at most {Config.TREND_MAX_MONTHS} months apart'}), 400
+        months = [(int(period[:4]), int(period[5:7])) for period in periods]
+        
+        # Every month's cached result in one round trip
+        cache_keys = [
+            result_key(user_id, 'monthly_trend', {'year': year, 'month': month})
+            for year, month in months
+        ]
+        trend = get_many_cache(cache_keys)
+        missing = [i for i, point in enumerate(trend) if point is None]
+        
+        if missing:
+            # Read before fetching, so months invalidated meanwhile are not cached
+            generation = cache_generation(user_id)
+            
+            # One aggregate request spanning the months that are not cached
+            start_date = month_date_range(*months[missing[0]])[0]
+            end_date = month_date_range(*months[missing[-1]])[1]
+            totals_by_month = AnalyticsCalculator.fetch_totals_by_month(token, start_date, end_date)
+            computed = AnalyticsCalculator.calculate_monthly_trend([
+                {'year': months[i][0], 'month': months[i][1], 'transactions': totals_by_month.get(months[i], [])}
+                for i in missing
+            ])
+            entries = []
+            for i, point in zip(missing, computed):
+                trend[i] = point
+                entries.append((cache_keys[i], point, month_cache_ttl(*months[i]), [periods[i]]))
+            set_many_cache(entries, user_id=user_id, generation=generation)
+        
+        return jsonify({
+            'from': periods[0],
+            'to': periods[-1],
+            'trend': trend
+        }), 200
+    
+    except Exception as e:
+        print(f"Trend error: {e}")
+        return jsonify({'error': 'Failed to calculate trend'}), 500
@@ -1,49 +1,134 @@
-import requests
 from config import Config
 from datetime import datetime
+from http_client import http_session, fetch_pool
+from services.columnar import TransactionColumns
+
+# Only the fields the calculations read are fetched from the Transaction Service
+TRANSACTION_FIELDS = 'type,amount,currency,category,date,notes'
+
+# Dimensions of the totals that replace individual transactions where rows are not needed
+TOTALS_GROUP_BY = ['type', 'category', 'currency']
+
+class FetchError(Exception):
+    """A downstream service failed; partial data must not be used for results"""
 
 class AnalyticsCalculator:
     """Business logic for analytics calculations"""
     
+    @staticmethod
+    def _get_transaction_page(headers, params):
+        response = http_session.get(
+            f"{Config.TRANSACTION_SERVICE_URL}/transactions/",
+            headers=headers,
+            params=params,
+            timeout=Config.HTTP_TIMEOUT
+        )
+        if response.status_code != 200:
+            raise FetchError(f"Transaction service returned {response.status_code}")
+        return response.json()
+    
+    @staticmethod
+    def iter_transaction_pages(token, user_id, start_date=None, end_date=None, transaction_type=None):
+        """Yield pages of transactions from Transaction Service until the range is exhausted"""
+        headers = {'Authorization': f'Bearer {token}'}
+        params = {}
+        
+        if start_date:
+            params['start_date'] = start_date
+        if end_date:
+            params['end_date'] = end_date
+        if transaction_type:
+            params['type'] = transaction_type
+        
+        params['limit'] = Config.FETCH_PAGE_SIZE
+        params['fields'] = TRANSACTION_FIELDS
+        params['include_total'] = 'false'
+        
+        page = AnalyticsCalculator._get_transaction_page(headers, params)
+        while True:
+            cursor = page.get('next_cursor') if page.get('has_more') else None
+            # Request the next page while the caller processes this one
+            next_page = None
+            if cursor:
+                next_page = fetch_pool.submit(
+                    AnalyticsCalculator._get_transaction_page, headers, {**params, 'cursor': cursor}
+                )
+            try:
+                yield page.get('transactions', [])
+            except GeneratorExit:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+            if next_page is None:
+                return
+            page = next_page.result()
+    
+    @staticmethod
+    def iter_transactions(token, user_id, start_date=None, end_date=None, transaction_type=None):
+        """Stream transactions one by one; at most two pages are held in memory"""
+        for page in AnalyticsCalculator.iter_transaction_pages(token, user_id, start_date, end_date, transaction_type):
+            yield from page
+    
     @staticmethod
     def fetch_transactions(token, user_id, start_date=None, end_date=None, transaction_type=None):
-        """Fetch transactions from Transaction Service"""
-        try:
-            headers = {'Authorization': f'Bearer {token}'}
-            params = {}
-            
-            if start_date:
-                params['start_date'] = start_date
-            if end_date:
-                params['end_date'] = end_date
-            if transaction_type:
-                params['type'] = transaction_type
-            
-            params['limit'] = 1000  # Get all for calculations
-            
-            response = requests.get(
-                f"{Config.TRANSACTION_SERVICE_URL}/transactions/",
-                headers=headers,
-                params=params,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('transactions', [])
-            return []
-        except Exception as e:
-            print(f"Error fetching transactions: {e}")
-            return []
+        """Fetch all transactions in a range from Transaction Service"""
+        return list(AnalyticsCalculator.iter_transactions(token, user_id, start_date, end_date, transaction_type))
+    
+    @staticmethod
+    def fetch_aggregate(token, group_by, metrics, **filters):
+        """Group totals computed by Transaction Service (POST /transactions/aggregate)"""
+        body = {'group_by': group_by, 'metrics': metrics}
+        body.update({name: value for name, value in filters.items() if value})
+        response = http_session.post(
+            f"{Config.TRANSACTION_SERVICE_URL}/transactions/aggregate",
+            headers={'Authorization': f'Bearer {token}'},
+            json=body,
+            timeout=Config.HTTP_TIMEOUT
+        )
+        if response.status_code != 200:
+            raise FetchError(f"Transaction service returned {response.status_code}")
+        return response.json().get('buckets', [])
+    
+    @staticmethod
+    def fetch_totals(token, start_date=None, end_date=None, transaction_type=None):
+        """Totals per type, category and currency, shaped like transactions that stand for `count` rows"""
+        buckets = AnalyticsCalculator.fetch_aggregate(
+            token, TOTALS_GROUP_BY, ['sum', 'count'],
+            start_date=start_date, end_date=end_date, type=transaction_type
+        )
+        return [AnalyticsCalculator._totals_row(bucket) for bucket in buckets]
+    
+    @staticmethod
+    def fetch_totals_by_month(token, start_date, end_date):
+        """Totals (see fetch_totals) of every month in a range from one request, keyed by (year, month)"""
+        buckets = AnalyticsCalculator.fetch_aggregate(
+            token, ['year', 'month'] + TOTALS_GROUP_BY, ['sum', 'count'],
+            start_date=start_date, end_date=end_date
+        )
+        by_month = {}
+        for bucket in buckets:
+            by_month.setdefault((bucket['year'], bucket['month']), []).append(AnalyticsCalculator._totals_row(bucket))
+        return by_month
+    
+    @staticmethod
+    def _totals_row(bucket):
+        return {
+            'type': bucket['type'],
+            'category': bucket['category'],
+            'currency': bucket['currency'],
+            'amount': bucket['sum'],
+            'count': bucket['count']
+        }
     
     @staticmethod
     def fetch_budget(token, year, month):
         """Fetch budget from Budget Service"""
         try:
             headers = {'Authorization': f'Bearer {token}'}
-            response = requests.get(
+            response = http_session.get(
                 f"{Config.BUDGET_SERVICE_URL}/budgets/month/{year}/{month}",
                 headers=headers,
-                timeout=10
+                timeout=Config.HTTP_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -53,47 +138,31 @@ class AnalyticsCalculator:
             print(f"Error fetching budget: {e}")
             return None
     
+    @staticmethod
+    def fetch_month_data(token, year, month, start_date, end_date):
+        """Fetch a month's totals (see fetch_totals) and budget concurrently; returns (totals, budget)
+
+        The totals are converted to columns once and shared by the calculations.
+        """
+        # The budget is fetched on a pool thread while this thread fetches the totals
+        budget = fetch_pool.submit(AnalyticsCalculator.fetch_budget, token, year, month)
+        totals = TransactionColumns(AnalyticsCalculator.fetch_totals(token, start_date, end_date))
+        return totals, budget.result()
+    
+    @staticmethod
+    def count_transactions(transactions):
+        """Number of transactions, where a totals row counts for `count` of them"""
+        return TransactionColumns.of(transactions).count()
+    
     @staticmethod
     def calculate_monthly_expenses(transactions):
         """Calculate total expenses for a month"""
-        expenses = [t for t in transactions if t['type'] == 'expense']
-        
-        # Group by currency
-        by_currency = {}
-        for expense in expenses:
-            currency = expense['currency']
-            if currency not in by_currency:
-                by_currency[currency] = 0
-            by_currency[currency] += expense['amount']
-        
-        total = sum(expenses for expenses in by_currency.values())
-        
-        return {
-            'total': total,
-            'by_currency': by_currency,
-            'count': len(expenses)
-        }
+        return TransactionColumns.of(transactions).type_summary('expense')
     
     @staticmethod
     def calculate_monthly_income(transactions):
         """Calculate total income for a month"""
-        income = [t for t in transactions if t['type'] == 'income']
-        
-        # Group by currency
-        by_currency = {}
-        for inc in income:
-            currency = inc['currency']
-            if currency not in by_currency:
-                by_currency[currency] = 0
-            by_currency[currency] += inc['amount']
-        
-        total = sum(income for income in by_currency.values())
-        
-        return {
-            'total': total,
-            'by_currency': by_currency,
-            'count': len(income)
-        }
+        return TransactionColumns.of(transactions).type_summary('income')
     
     @staticmethod
     def calculate_closing_balance(opening_balance, income, expenses):
@@ -113,15 +182,7 @@ class AnalyticsCalculator:
             return []
         
         # Calculate actual spending by category
-        expenses = [t for t in transactions if t['type'] == 'expense']
-        actual_by_category = {}
-        
-        for expense in expenses:
-            category = expense['category']
-            if category not in actual_by_category:
-                actual_by_category[category] = {'total': 0, 'count': 0}
-            actual_by_category[category]['total'] += expense['amount']
-            actual_by_category[category]['count'] += 1
+        actual_by_category = TransactionColumns.of(transactions).category_totals('expense')
         
         # Compare with budget
         comparison = []
@@ -146,8 +207,8 @@ class AnalyticsCalculator:
     
     @staticmethod
     def calculate_category_summary(transactions):
-        """Calculate spending summary by category"""
-        expenses = [t for t in transactions if t['type'] == 'expense']
+        """Calculate spending summary by category (transactions may be a one-pass iterator)"""
+        expenses = (t for t in transactions if t['type'] == 'expense')
         
         by_category = {}
         for expense in expenses:
@@ -0,0 +1,97 @@
+"""Columnar form of a fetched batch of transactions for the analytics calculations.
+
+`TransactionColumns` converts the rows once into NumPy arrays: amounts, the
+number of transactions each row stands for (1, or `count` for totals rows from
+POST /transactions/aggregate) and dictionary-encoded codes for type, category
+and currency. Every total the routes need is then a `np.bincount` over a
+combined code, instead of filtering and regrouping the list of dicts for each
+calculation.
+
+`np.bincount` adds the weights in row order, so the float totals are the same
+as the ones the row-by-row calculations produced. Groups are listed in order of
+first appearance, as the dicts built by those calculations were.
+"""
+import itertools
+import operator
+import numpy as np
+
+COLUMNS = ('type', 'category', 'currency')
+_row_amount = operator.itemgetter('amount')
+_row_count = operator.itemgetter('count')
+_row_key = operator.itemgetter(*COLUMNS)
+
+def _encode(values):
+    """(codes, labels) of a small list of values; labels in order of first appearance"""
+    index = {}
+    codes = np.array([index.setdefault(value, len(index)) for value in values], dtype=np.int64)
+    return codes, list(index)
+
+class TransactionColumns:
+    """A batch of transactions (or totals rows) as NumPy columns"""
+
+    def __init__(self, transactions):
+        rows = transactions if isinstance(transactions, list) else list(transactions)
+        self.size = len(rows)
+        self.amounts = np.fromiter(map(_row_amount, rows), dtype=np.float64, count=self.size)
+        if rows and 'count' in rows[0]:
+            self.counts = np.fromiter(map(_row_count, rows), dtype=np.int64, count=self.size)
+        else:
+            self.counts = np.ones(self.size, dtype=np.int64)
+
+        # One pass over the rows encodes all three columns: each distinct (type,
+        # category, currency) key is mapped to the first row holding it, and
+        # np.unique turns those rows into dense key codes in order of first
+        # appearance. Column values are then encoded per key, not per row
+        first_rows = {}
+        firsts = np.fromiter(
+            map(first_rows.setdefault, map(_row_key, rows), itertools.count()), dtype=np.int64, count=self.size
+        )
+        self.key_codes = np.unique(firsts, return_inverse=True)[1].reshape(-1)
+        keys = list(first_rows)
+        self.codes = {}   # column -> code of each distinct key's value
+        self.labels = {}  # column -> value of each code
+        for position, column in enumerate(COLUMNS):
+            self.codes[column], self.labels[column] = _encode([key[position] for key in keys])
+        self._grouped = {}
+
+    @classmethod
+    def of(cls, transactions):
+        """Columns of a batch, reusing them if the batch was already converted"""
+        return transactions if isinstance(transactions, cls) else cls(transactions)
+
+    def _group(self, column):
+        """Totals per (type, column value): {type: [(value, total, count), ...]} in first-seen order"""
+        if column not in self._grouped:
+            labels = self.labels[column]
+            width = max(len(labels), 1)
+            length = len(self.labels['type']) * width
+            # Pair code of each distinct key, then of each row
+            key_pairs = self.codes['type'] * width + self.codes[column]
+            combined = key_pairs[self.key_codes]
+            totals = np.bincount(combined, weights=self.amounts, minlength=length)
+            counts = np.bincount(combined, weights=self.counts, minlength=length)
+            grouped = {label: [] for label in self.labels['type']}
+            for pair in dict.fromkeys(key_pairs.tolist()):
+                type_code, code = divmod(pair, width)
+                grouped[self.labels['type'][type_code]].append((labels[code], totals[pair].item(), int(counts[pair])))
+            self._grouped[column] = grouped
+        return self._grouped[column]
+
+    def count(self):
+        """Number of transactions in the batch"""
+        return int(self.counts.sum())
+
+    def type_summary(self, transaction_type):
+        """{'total', 'by_currency', 'count'} of one transaction type"""
+        groups = self._group('currency').get(transaction_type, [])
+        by_currency = {currency: total for currency, total, _ in groups}
+        return {
+            'total': sum(by_currency.values()),
+            'by_currency': by_currency,
+            'count': sum(count for _, _, count in groups)
+        }
+
+    def category_totals(self, transaction_type):
+        """{category: {'total', 'count'}} of one transaction type"""
+        groups = self._group('category').get(transaction_type, [])
+        return {category: {'total': total, 'count': count} for category, total, count in groups}
@@ -0,0 +1,32 @@
+"""Test fixtures: the analytics cache on an in-memory Redis (fakeredis).
+
+Run from the analytics-service directory:
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis
+import pytest
+import cache
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, 'redis_client', client)
+    cache.local_cache.entries.clear()
+    return client
+
+@pytest.fixture
+def client(redis_client):
+    from app import app
+    return app.test_client()
+
+def auth_headers(user_id):
+    import jwt
+    from config import Config
+    token = jwt.encode({'id': user_id}, Config.JWT_SECRET, algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+import cache
+import events
+from config import Config
+from conftest import auth_headers
+from services.calculator import AnalyticsCalculator
+
+def invalidate(user_id, periods):
+    events.handle_event({'event': json.dumps({'user_id': user_id, 'periods': periods})})
+
+def test_set_cache_skips_results_computed_before_an_invalidation(redis_client):
+    key = cache.result_key('u1', 'monthly_summary', {'year': 2025, 'month': 1})
+    generation = cache.cache_generation('u1')
+    invalidate('u1', ['2025-01'])
+    assert not cache.set_cache(key, {'stale': True}, user_id='u1', periods=['2025-01'], generation=generation)
+    assert not redis_client.exists(key)
+    
+    assert cache.set_cache(key, {'fresh': True}, user_id='u1', periods=['2025-01'], generation=cache.cache_generation('u1'))
+    assert cache.get_cache(key) == {'fresh': True}
+    # Other users are not affected
+    assert cache.cache_generation('u2') == 0
+
+def test_cached_does_not_store_a_result_that_raced_an_event(redis_client):
+    key = cache.result_key('u1', 'monthly_summary', {'year': 2025, 'month': 1})
+    
+    def compute():
+        # The change event arrives while the totals are being fetched
+        invalidate('u1', ['2025-01'])
+        return {'total': 1}
+    
+    assert cache.cached(key, compute, user_id='u1', periods=['2025-01']) == {'total': 1}
+    assert not redis_client.exists(key)
+    assert cache.cached(key, lambda: {'total': 2}, user_id='u1', periods=['2025-01']) == {'total': 2}
+    assert json.loads(redis_client.get(key)) == {'total': 2}
+
+def test_trend_does_not_cache_months_invalidated_during_the_fetch(client, redis_client, monkeypatch):
+    def fetch_totals_by_month(*args):
+        invalidate('u1', ['2025-02'])
+        return {(2025, month): [{'type': 'income', 'category': 'Salary', 'currency': 'USD', 'amount': 100.0, 'count': 1}]
+                for month in (1, 2, 3)}
+    monkeypatch.setattr(AnalyticsCalculator, 'fetch_totals_by_month', staticmethod(fetch_totals_by_month))
+    
+    response = client.get('/analytics/trend?from=2025-01&to=2025-03', headers=auth_headers('u1'))
+    assert response.status_code == 200
+    assert [point['income'] for point in response.get_json()['trend']] == [100.0] * 3
+    assert not redis_client.keys('*monthly_trend*')
+
+def test_l1_does_not_keep_a_copy_read_before_an_invalidation(redis_client, monkeypatch):
+    key = cache.result_key('u1', 'monthly_summary', {'year': 2025, 'month': 1})
+    assert cache.set_cache(key, {'total': 1}, user_id='u1', periods=['2025-01'], generation=cache.cache_generation('u1'))
+    cache.local_cache.entries.clear()
+    redis_get = cache._redis_get
+    
+    def racing_get(key):
+        # The value is read, then the change event is handled before L1 stores it
+        value = redis_get(key)
+        invalidate('u1', ['2025-01'])
+        return value
+    monkeypatch.setattr(cache, '_redis_get', racing_get)
+    
+    assert cache.get_cache(key) == {'total': 1}
+    assert key not in cache.local_cache.entries
+    monkeypatch.setattr(cache, '_redis_get', redis_get)
+    assert cache.get_cache(key) is None
+
+def test_closed_months_are_cached_for_the_long_ttl(client, redis_client, monkeypatch):
+    totals = [{'type': 'expense', 'category': 'Food', 'currency': 'USD', 'amount': 40.0, 'count': 2}]
+    budget = {'opening_balance': 100, 'categories': [{'name': 'Food', 'planned_amount': 50.0, 'currency': 'USD'}]}
+    monkeypatch.setattr(AnalyticsCalculator, 'fetch_month_data', staticmethod(lambda *args: (totals, budget)))
+    monkeypatch.setattr(AnalyticsCalculator, 'iter_transactions', staticmethod(lambda *args: iter([])))
+    headers = auth_headers('u1')
+    now = datetime.utcnow()
+    
+    for url in ('/analytics/month/2025/1', '/analytics/budget-vs-actual/2025/1',
+                '/analytics/categories?start_date=2025-01-01&end_date=2025-03-31',
+                f'/analytics/month/{now.year}/{now.month}',
+                f'/analytics/categories?start_date=2025-01-01&end_date={now.date().isoformat()}'):
+        assert client.get(url, headers=headers).status_code == 200
+    
+    def ttl(endpoint, params):
+        return redis_client.ttl(cache.result_key('u1', endpoint, params))
+    
+    assert ttl('monthly_summary', {'year': 2025, 'month': 1}) > Config.CACHE_TTL
+    assert ttl('budget_vs_actual', {'year': 2025, 'month': 1}) > Config.CACHE_TTL
+    assert ttl('category_summary', {'start_date': '2025-01-01', 'end_date': '2025-03-31'}) > Config.CACHE_TTL
+    # Results covering the current month keep the short TTL
+    assert 0 < ttl('monthly_summary', {'year': now.year, 'month': now.month}) <= Config.CACHE_TTL
+    assert 0 < ttl('category_summary', {'start_date': '2025-01-01', 'end_date': now.date().isoformat()}) <= Config.CACHE_TTL
@@ -0,0 +1,64 @@
+import json
+import threading
+import time
+import cache
+import events
+from config import Config
+
+def event(user_id, periods=None):
+    payload = {'user_id': user_id}
+    if periods is not None:
+        payload['periods'] = periods
+    return {'event': json.dumps(payload)}
+
+def fill(user_id):
+    keys = {}
+    for period in ('2026-01', '2026-02'):
+        year, month = period.split('-')
+        keys[period] = cache.result_key(user_id, 'monthly_summary', {'year': int(year), 'month': int(month)})
+        cache.set_cache(keys[period], {'period': period}, user_id=user_id, periods=[period])
+    keys['all'] = cache.result_key(user_id, 'category_summary', {'start_date': None, 'end_date': None})
+    cache.set_cache(keys['all'], {'period': 'all'}, user_id=user_id)
+    return keys
+
+def cached_in_redis(redis_client, keys):
+    return {name for name, key in keys.items() if redis_client.exists(key)}
+
+def test_event_evicts_only_the_affected_periods(redis_client):
+    keys, other = fill('u1'), fill('u2')
+    events.handle_event(event('u1', ['2026-01']))
+    assert cached_in_redis(redis_client, keys) == {'2026-02'}
+    assert cached_in_redis(redis_client, other) == {'2026-01', '2026-02', 'all'}
+    assert cache.get_cache(keys['2026-01']) is None
+    assert cache.get_cache(keys['2026-02']) == {'period': '2026-02'}
+
+def test_event_without_periods_evicts_the_user(redis_client):
+    keys, other = fill('u1'), fill('u2')
+    events.handle_event(event('u1'))
+    assert cached_in_redis(redis_client, keys) == set()
+    assert not redis_client.exists(cache.registry_key('u1'))
+    assert cached_in_redis(redis_client, other) == {'2026-01', '2026-02', 'all'}
+
+def test_malformed_event_is_ignored(redis_client):
+    keys = fill('u1')
+    events.handle_event({'event': 'not json'})
+    events.handle_event({'other': '{}'})
+    assert cached_in_redis(redis_client, keys) == {'2026-01', '2026-02', 'all'}
+
+def test_listener_reads_the_stream(redis_client, monkeypatch):
+    monkeypatch.setattr(Config, 'EVENTS_BLOCK_MS', 50)
+    monkeypatch.setattr(events, '_stop', threading.Event())
+    monkeypatch.setattr(events, '_listener_thread', None)
+    keys = fill('u1')
+    events.start_invalidation_listener()
+    try:
+        time.sleep(0.2)  # The listener starts reading from the end of the stream
+        redis_client.xadd(Config.EVENTS_STREAM, event('u1', ['2026-02']))
+        deadline = time.monotonic() + 2
+        while redis_client.exists(keys['2026-02']) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert cached_in_redis(redis_client, keys) == {'2026-01'}
+    finally:
+        thread = events._listener_thread
+        events.stop_invalidation_listener()
+        thread.join(1)
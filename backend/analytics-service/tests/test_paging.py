@@ -0,0 +1,69 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pytest
+from config import Config
+from services.calculator import AnalyticsCalculator, FetchError
+
+TOTAL_ROWS = 50000
+
+class TransactionPages(BaseHTTPRequestHandler):
+    """Stand-in for GET /transactions/ paging TOTAL_ROWS rows with next_cursor"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        params = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+        self.server.requests.append(params)
+        if self.server.fail_at is not None and len(self.server.requests) > self.server.fail_at:
+            return self._send(503, {'error': 'unavailable'})
+        start = int(params.get('cursor', 0))
+        end = min(start + int(params['limit']), TOTAL_ROWS)
+        rows = [{'type': 'expense', 'amount': 1.0, 'currency': 'USD', 'category': 'Food', 'notes': str(i)}
+                for i in range(start, end)]
+        self._send(200, {
+            'transactions': rows,
+            'has_more': end < TOTAL_ROWS,
+            'next_cursor': str(end) if end < TOTAL_ROWS else None
+        })
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def transaction_service(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TransactionPages)
+    server.requests = []
+    server.fail_at = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(Config, 'TRANSACTION_SERVICE_URL', f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(Config, 'FETCH_PAGE_SIZE', 1000)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_fetch_transactions_follows_every_page(transaction_service):
+    transactions = AnalyticsCalculator.fetch_transactions('token', 'u1', '2025-01-01', '2025-12-31')
+
+    assert len(transactions) == TOTAL_ROWS
+    assert [t['notes'] for t in transactions] == [str(i) for i in range(TOTAL_ROWS)]
+    requests = transaction_service.requests
+    assert len(requests) == TOTAL_ROWS // 1000
+    assert 'cursor' not in requests[0]
+    assert [r['cursor'] for r in requests[1:]] == [str(i * 1000) for i in range(1, TOTAL_ROWS // 1000)]
+    assert all(r['limit'] == '1000' and r['include_total'] == 'false' for r in requests)
+    assert all(r['start_date'] == '2025-01-01' and r['end_date'] == '2025-12-31' for r in requests)
+
+def test_a_failed_page_raises_instead_of_returning_partial_data(transaction_service):
+    transaction_service.fail_at = 20
+    with pytest.raises(FetchError):
+        AnalyticsCalculator.fetch_transactions('token', 'u1')
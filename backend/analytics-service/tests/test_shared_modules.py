@@ -0,0 +1,18 @@
+"""metrics.py, middleware/timing.py and middleware/token_cache.py are copies of
+the transaction service's modules. Each service is built into its own image from
+its own directory, so there is no shared package to import them from; this
+keeps the copies from drifting apart. Skipped outside the full repository."""
+import os
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGIN_DIR = os.path.join(os.path.dirname(SERVICE_DIR), 'transaction-service')
+SHARED_MODULES = ['metrics.py', os.path.join('middleware', 'timing.py'), os.path.join('middleware', 'token_cache.py')]
+
+@pytest.mark.parametrize('path', SHARED_MODULES)
+def test_copy_matches_the_transaction_service(path):
+    origin = os.path.join(ORIGIN_DIR, path)
+    if not os.path.exists(origin):
+        pytest.skip('transaction-service is not checked out next to this service')
+    with open(os.path.join(SERVICE_DIR, path), encoding='utf-8') as copy, open(origin, encoding='utf-8') as source:
+        assert copy.read() == source.read(), f"{path} differs from transaction-service/{path}; change both"
@@ -1,27 +1,64 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from config import Config
-from database import init_db, close_db
+from middleware.token_cache import token_cache
+from database import init_db, close_db, get_db
+from indexes import sync_in_background
+from migrate import require_migrated
+from json_provider import BSONJSONProvider
+from metrics import render_metrics
+from middleware.timing import init_request_metrics
+from services.events import init_events, start_relay, close_events
+from services.ingest import ingest_queue, start_ingest, close_ingest
 from routes.transactions import transactions_bp
 import atexit
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json = BSONJSONProvider(app)
 
 # Enable CORS
 CORS(app, origins=[Config.FRONTEND_URL], supports_credentials=True)
 
+# Per-route latency histograms and slow-request log
+init_request_metrics(app)
+
 # Initialize database
 init_db()
 
+# Optionally refuse to serve a database migrate.py has not finished
+if Config.REQUIRE_MIGRATION:
+    require_migrated(get_db())
+
+# Bring indexes up to date without blocking startup
+if Config.AUTO_SYNC_INDEXES:
+    sync_in_background(get_db())
+
+# Initialize change event publishing
+init_events()
+start_relay(get_db)
+
+# Start the write-behind worker of async ingestion
+start_ingest(get_db)
+
 # Register blueprints
 app.register_blueprint(transactions_bp, url_prefix='/transactions')
 
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok', 'service': 'transaction-service'}), 200
+    return jsonify({
+        'status': 'ok',
+        'service': 'transaction-service',
+        'token_cache': token_cache.stats(),
+        'ingest': ingest_queue.stats()
+    }), 200
+
+# Prometheus metrics (requests, MongoDB commands, connection pool, servers)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 # Error handlers
 @app.errorhandler(404)
@@ -35,6 +72,9 @@ def internal_error(error):
 # Cleanup on exit
 @atexit.register
 def cleanup():
+    # Drain queued transactions while Mongo and Redis are still open
+    close_ingest()
+    close_events()
     close_db()
 
 if __name__ == '__main__':
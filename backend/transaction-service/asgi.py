@@ -0,0 +1,81 @@
+"""ASGI entry point for the transaction service.
+
+Run with an ASGI server, e.g.:
+    uvicorn asgi:app --host 0.0.0.0 --port 3003 --workers 2
+
+Routing is decided by the Flask app's URL map. Requests whose endpoint has an
+async implementation in routes/transactions_async.py are served by a Quart app
+on a shared Motor connection pool, so waiting on Mongo does not hold a worker
+thread. Everything else (bulk import, export, ...) is passed to the regular
+Flask app through a WSGI adapter, so both entry points expose the same API.
+"""
+import time
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, jsonify, request
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException
+from app import app as flask_app
+from config import Config
+from database_async import init_async_db, close_async_db
+from json_provider import BSONJSONProvider
+from middleware.timing import record_request
+from routes.transactions_async import transactions_async_bp
+
+# Initialize Quart app for the async routes
+async_app = Quart(__name__)
+async_app.config.from_object(Config)
+async_app.json = BSONJSONProvider(async_app)
+async_app = cors(async_app, allow_origin=[Config.FRONTEND_URL], allow_credentials=True)
+async_app.register_blueprint(transactions_async_bp, url_prefix='/transactions')
+
+@async_app.before_serving
+async def startup():
+    init_async_db()
+
+@async_app.after_serving
+async def shutdown():
+    close_async_db()
+
+# Same request metrics as the Flask app (init_request_metrics); the hooks are
+# async so Quart does not run them in a thread
+if Config.REQUEST_METRICS:
+    @async_app.before_request
+    async def start_request_timer():
+        request.started_at = time.perf_counter()
+
+    @async_app.after_request
+    async def record_request_timing(response):
+        return record_request(request, response)
+
+@async_app.errorhandler(500)
+async def internal_error(error):
+    return jsonify({'error': 'Internal server error'}), 500
+
+class TransactionServiceASGI:
+    """Dispatch each request to the async app or the wrapped Flask app"""
+    
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+        self.url_map = wsgi_app.url_map
+        self.async_endpoints = set(async_app.view_functions)
+    
+    def endpoint_for(self, scope):
+        """Flask endpoint name for a request, or None if it does not match a route"""
+        try:
+            adapter = self.url_map.bind('localhost')
+            endpoint, _ = adapter.match(scope['path'], method=scope['method'])
+            return endpoint
+        except HTTPException:
+            return None
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            # Preflight requests stay with Flask-CORS
+            if scope['method'] != 'OPTIONS' and self.endpoint_for(scope) in self.async_endpoints:
+                return await self.async_app(scope, receive, send)
+            return await self.wsgi_app(scope, receive, send)
+        # Lifespan events start and stop the async Mongo client
+        return await self.async_app(scope, receive, send)
+
+app = TransactionServiceASGI(async_app, flask_app)
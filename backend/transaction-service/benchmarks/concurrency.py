@@ -0,0 +1,89 @@
+"""Side-by-side load test of the WSGI and ASGI entry points.
+
+Start both servers against the same MongoDB, for example:
+    gunicorn -w 4 --threads 8 -b :3003 app:app
+    uvicorn asgi:app --workers 4 --port 3013
+
+then run:
+    python benchmarks/concurrency.py --wsgi-url http://localhost:3003 \
+        --asgi-url http://localhost:3013 --concurrency 16 64 256
+
+Each worker thread keeps one HTTP connection open and sends requests back to
+back, so the numbers reflect server-side concurrency rather than connection
+setup. Only the standard library is used.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+def run_load(base_url, path, token, concurrency, total_requests):
+    """Send total_requests GETs from `concurrency` threads; return (throughput, latencies, errors)"""
+    parsed = urlparse(base_url)
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [total_requests]
+    
+    def worker():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        local = []
+        local_errors = 0
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+    
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return total_requests / elapsed, latencies, errors[0]
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare WSGI and ASGI transaction service throughput')
+    parser.add_argument('--wsgi-url', default='http://localhost:3003')
+    parser.add_argument('--asgi-url', default='http://localhost:3013')
+    parser.add_argument('--path', default='/transactions/?limit=50&include_total=false')
+    parser.add_argument('--token', default='', help='JWT (omit when auth is disabled in development)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--requests', type=int, default=5000, help='Requests per run')
+    args = parser.parse_args()
+    
+    print(f"{'server':<6} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        for name, url in (('wsgi', args.wsgi_url), ('asgi', args.asgi_url)):
+            throughput, latencies, errors = run_load(url, args.path, args.token, concurrency, args.requests)
+            print(
+                f"{name:<6} {concurrency:>5} {throughput:>9.1f} "
+                f"{statistics.median(latencies) * 1000:>8.1f} "
+                f"{percentile(latencies, 95) * 1000:>8.1f} "
+                f"{percentile(latencies, 99) * 1000:>8.1f} {errors:>7}"
+            )
@@ -0,0 +1,120 @@
+"""Benchmark of `q=` search against client-side filtering on a synthetic dataset.
+
+Loads synthetic transactions into a separate database, syncs the declared
+indexes, then compares for each query:
+  - search: the filter and sort issued by GET /transactions/?q=... (first page)
+  - scan:   reading the user's whole history and filtering it in Python, which
+            is what clients had to do before `q=` existed
+
+Run from the transaction-service directory against a disposable MongoDB:
+    python -m benchmarks.search --transactions 1000000 --users 10
+    python -m benchmarks.search --reuse   # skip loading, reuse the last dataset
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+from config import Config
+from indexes import sync_indexes
+from models.transaction import Transaction
+from services.search import query_words, search_filter
+
+CATEGORIES = ['Groceries', 'Rent', 'Utilities', 'Transport', 'Dining', 'Shopping', 'Health', 'Travel', 'Salary']
+MERCHANTS = ['Amazon', 'Carrefour', 'Uber', 'Netflix', 'Spotify', 'Shell', 'Ikea', 'Zara', 'Airbnb', 'Lidl']
+WORDS = ['order', 'weekly', 'monthly', 'refund', 'gift', 'subscription', 'trip', 'fuel', 'dinner', 'payment',
+         'invoice', 'coffee', 'school', 'insurance', 'repair', 'deposit', 'transfer', 'bonus', 'ticket', 'pharmacy']
+QUERIES = ['amazon', 'ama', 'rent 2024', 'netflix subscription', 'fuel shell', 'zzz nothing']
+
+def generate(db, total, users, batch_size=5000):
+    """Insert `total` random transactions spread over `users` users"""
+    rng = random.Random(42)
+    start = datetime(2021, 1, 1)
+    batch = []
+    for i in range(total):
+        words = [rng.choice(MERCHANTS)] + rng.sample(WORDS, rng.randint(0, 3))
+        batch.append(Transaction.create_transaction(
+            user_id=f"bench-user-{i % users}",
+            transaction_type='income' if rng.random() < 0.1 else 'expense',
+            amount=round(rng.uniform(1, 500), 2),
+            currency='USD',
+            category=rng.choice(CATEGORIES),
+            date=start + timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60)),
+            notes=' '.join(words)
+        ))
+        if len(batch) >= batch_size:
+            db.transactions.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.transactions.insert_many(batch, ordered=False)
+
+def time_runs(fn, repeats):
+    """Median wall time of fn in milliseconds, and its last result"""
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+def search(db, user_id, q, limit):
+    """First page of GET /transactions/?q=..."""
+    query = {'user_id': user_id, **search_filter(query_words(q))}
+    cursor = db.transactions.find(query, Transaction.HIDDEN_FIELDS).sort([('date', -1), ('_id', -1)]).limit(limit)
+    return list(cursor)
+
+def client_side_scan(db, user_id, q):
+    """Whole history filtered in Python, as clients did before q="""
+    words = Transaction.search_words(q)
+    matches = []
+    for trans in db.transactions.find({'user_id': user_id}, Transaction.HIDDEN_FIELDS).sort([('date', -1), ('_id', -1)]):
+        text = f"{trans.get('category', '')} {trans.get('notes') or ''} {trans['date'].year}".lower()
+        if all(word in text for word in words):
+            matches.append(trans)
+    return matches
+
+def winning_stage(db, user_id, q, limit):
+    """Index (or COLLSCAN) chosen for the search query"""
+    query = {'user_id': user_id, **search_filter(query_words(q))}
+    plan = db.transactions.find(query).sort([('date', -1), ('_id', -1)]).limit(limit).explain()['queryPlanner']['winningPlan']
+    while plan:
+        if plan.get('stage') in ('IXSCAN', 'COLLSCAN'):
+            return plan.get('indexName', plan['stage'])
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+    return '?'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark transaction search on synthetic data')
+    parser.add_argument('--db', default='expense_tracker_search_bench', help='Database to (re)create')
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=50, help='Page size of the search query')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--reuse', action='store_true', help='Reuse the existing dataset')
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGO_URI)
+    db = client[args.db]
+    try:
+        if not args.reuse:
+            client.drop_database(args.db)
+            started = time.perf_counter()
+            generate(db, args.transactions, args.users)
+            print(f"Loaded {args.transactions} transactions in {time.perf_counter() - started:.1f}s")
+            sync_indexes(db)
+
+        user_id = 'bench-user-0'
+        history = db.transactions.count_documents({'user_id': user_id})
+        print(f"Searching the history of {user_id} ({history} transactions)\n")
+        print(f"{'query':<22} {'matches':>8} {'search ms':>10} {'scan ms':>10} {'speedup':>8}  index")
+        for q in QUERIES:
+            search_ms, _ = time_runs(lambda: search(db, user_id, q, args.limit), args.repeats)
+            scan_ms, matches = time_runs(lambda: client_side_scan(db, user_id, q), max(args.repeats // 2, 1))
+            print(
+                f"{q:<22} {len(matches):>8} {search_ms:>10.2f} {scan_ms:>10.1f} "
+                f"{scan_ms / search_ms if search_ms else 0:>7.0f}x  {winning_stage(db, user_id, q, args.limit)}"
+            )
+    finally:
+        client.close()
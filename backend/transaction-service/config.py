@@ -11,9 +11,68 @@ class Config:
     # MongoDB
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
     MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'expense_tracker_transactions')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 0)) or None  # 0 keeps idle connections
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0)) or None  # 0 waits for a connection indefinitely
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 20000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 0)) or None  # 0 means no timeout
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000))
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')  # e.g. 'zstd,snappy,zlib' (zstd/snappy need extra packages)
+    ASYNC_MONGO_MAX_POOL_SIZE = int(os.getenv('ASYNC_MONGO_MAX_POOL_SIZE', 100))  # Shared pool of the ASGI app
+    AUTO_SYNC_INDEXES = os.getenv('AUTO_SYNC_INDEXES', '1') == '1'  # Sync outdated indexes in the background at startup
+    REQUIRE_MIGRATION = os.getenv('REQUIRE_MIGRATION', '0') == '1'  # Refuse to start while legacy documents remain (migrate.py)
+    
+    # Change events (Redis stream consumed by the analytics service)
+    REDIS_URL = os.getenv('REDIS_URL', '')
+    EVENTS_STREAM = os.getenv('EVENTS_STREAM', 'transactions:changes')
+    EVENTS_STREAM_MAXLEN = int(os.getenv('EVENTS_STREAM_MAXLEN', 100000))
+    OUTBOX_RELAY_INTERVAL = int(os.getenv('OUTBOX_RELAY_INTERVAL', 5))  # seconds
+    OUTBOX_RETENTION = int(os.getenv('OUTBOX_RETENTION', 7 * 24 * 3600))  # seconds
+    
+    # Bulk import
+    BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 1000))
+    BULK_MAX_ERRORS = int(os.getenv('BULK_MAX_ERRORS', 1000))  # Per-row errors returned in the response
+    BULK_MUTATION_MAX_ITEMS = int(os.getenv('BULK_MUTATION_MAX_ITEMS', 1000))  # Ids per bulk update/delete request
+    
+    # Async ingestion (POST /transactions/?async=1), flushed by a background worker
+    INGEST_ENABLED = os.getenv('INGEST_ENABLED', '1') == '1'
+    INGEST_JOURNAL_DIR = os.getenv('INGEST_JOURNAL_DIR', 'data/ingest')  # Must survive restarts (e.g. a volume)
+    INGEST_FSYNC = os.getenv('INGEST_FSYNC', '0') == '1'  # fsync each accepted transaction (survives power loss, slower)
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 500))  # Flush once this many are queued...
+    INGEST_FLUSH_INTERVAL_MS = int(os.getenv('INGEST_FLUSH_INTERVAL_MS', 200))  # ...or the oldest has waited this long
+    INGEST_MAX_PENDING = int(os.getenv('INGEST_MAX_PENDING', 100000))  # Beyond this requests get 503
+    INGEST_STATUS_RETENTION = int(os.getenv('INGEST_STATUS_RETENTION', 100000))  # Tracking ids kept in memory
+    INGEST_DRAIN_TIMEOUT = int(os.getenv('INGEST_DRAIN_TIMEOUT', 30))  # seconds
+    
+    # Idempotency-Key on create and bulk endpoints
+    IDEMPOTENCY_STORE = os.getenv('IDEMPOTENCY_STORE', 'mongo')  # 'mongo' or 'redis' (uses REDIS_URL; falls back to mongo)
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))  # seconds a response is replayed
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 300))  # seconds before an unfinished request's key can be retried
+    IDEMPOTENCY_KEY_PREFIX = os.getenv('IDEMPOTENCY_KEY_PREFIX', 'idempotency:')  # Redis key prefix
+    
+    # Cold-storage archive of closed months (python -m services.archive run)
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'data/archive')  # Shared by every instance
+    ARCHIVE_AFTER_MONTHS = int(os.getenv('ARCHIVE_AFTER_MONTHS', 12))  # Months besides the current one kept in MongoDB
+    ARCHIVE_COMPRESSION = os.getenv('ARCHIVE_COMPRESSION', 'none')  # 'none' (memory-mapped, read in place), 'zstd' or 'lz4' (decoded on read)
+    ARCHIVE_CACHE_MB = int(os.getenv('ARCHIVE_CACHE_MB', 256))  # Month tables kept open per process
+    
+    # Responses
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')  # 'orjson' (used when installed) or 'json'
+    
+    # Export
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))  # Documents per Mongo cursor batch
+    
+    # Request metrics (GET /metrics) and slow-request log
+    REQUEST_METRICS = os.getenv('REQUEST_METRICS', '1') == '1'
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
     
     # JWT
     JWT_SECRET = os.getenv('JWT_SECRET', 'ExpTrk_Jwt_S3cr3t_2024_64ch_H5h_D3v_M1n1mum!!')
     
+    # Verified JWT claims cache (TOKEN_CACHE_SIZE=0 disables it)
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))  # seconds; entries never outlive the token's exp
+    
     # CORS
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
@@ -1,26 +1,36 @@
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient
 from config import Config
+from monitoring import listeners
 
 client = None
 db = None
 
+def client_options(max_pool_size=None):
+    """MongoClient pool, timeout and compression settings from Config"""
+    options = {
+        'maxPoolSize': max_pool_size or Config.MONGO_MAX_POOL_SIZE,
+        'minPoolSize': Config.MONGO_MIN_POOL_SIZE,
+        'maxIdleTimeMS': Config.MONGO_MAX_IDLE_TIME_MS,
+        'waitQueueTimeoutMS': Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        'connectTimeoutMS': Config.MONGO_CONNECT_TIMEOUT_MS,
+        'socketTimeoutMS': Config.MONGO_SOCKET_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': Config.MONGO_SERVER_SELECTION_TIMEOUT_MS
+    }
+    if Config.MONGO_COMPRESSORS:
+        options['compressors'] = Config.MONGO_COMPRESSORS
+    return options
+
 def init_db():
     """Initialize MongoDB connection"""
     global client, db
     try:
-        client = MongoClient(Config.MONGO_URI)
+        client = MongoClient(
+            Config.MONGO_URI,
+            event_listeners=listeners('sync'),
+            **client_options()
+        )
         db = client[Config.MONGO_DB_NAME]
         
-        # Create indexes for better query performance
-        db.transactions.create_index([('user_id', ASCENDING)])
-        db.transactions.create_index([('date', DESCENDING)])
-        db.transactions.create_index([('category', ASCENDING)])
-        db.transactions.create_index([('type', ASCENDING)])
-        db.transactions.create_index([
-            ('user_id', ASCENDING),
-            ('date', DESCENDING)
-        ])
-        
         print(f"Connected to MongoDB: {Config.MONGO_DB_NAME}")
         return db
     except Exception as e:
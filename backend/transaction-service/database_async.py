@@ -0,0 +1,29 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import Config
+from database import client_options
+from monitoring import listeners
+
+client = None
+db = None
+
+def init_async_db():
+    """Initialize the async MongoDB client (call from inside the running event loop)"""
+    global client, db
+    client = AsyncIOMotorClient(
+        Config.MONGO_URI,
+        event_listeners=listeners('async'),
+        **client_options(max_pool_size=Config.ASYNC_MONGO_MAX_POOL_SIZE)
+    )
+    db = client[Config.MONGO_DB_NAME]
+    print(f"Connected to MongoDB (async): {Config.MONGO_DB_NAME}")
+    return db
+
+def get_async_db():
+    """Get async database instance"""
+    return db
+
+def close_async_db():
+    """Close async MongoDB connection"""
+    if client:
+        client.close()
+        print("Async MongoDB connection closed")
@@ -0,0 +1,267 @@
+"""Index management for the transaction service.
+
+Indexes are declared here, next to the query shapes they serve, instead of
+being created on every process start. `sync` creates missing indexes, updates
+ones whose options changed (e.g. a TTL) and drops ones that are no longer
+declared; `report` runs explain() for each query shape and flags collection
+scans and in-memory sorts.
+
+Usage:
+    python indexes.py sync [--keep-unused]
+    python indexes.py report [--user USER_ID]
+    python indexes.py list
+"""
+import argparse
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from config import Config
+
+# Bump when INDEXES changes so running services sync in the background
+INDEX_VERSION = 3
+
+# Every transaction query is scoped by user and ordered by (date, _id) desc,
+# so each filter combination gets its own prefix in front of that sort.
+INDEXES = {
+    'transactions': [
+        {
+            'name': 'user_date',
+            'keys': [('user_id', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)]
+        },
+        {
+            'name': 'user_type_date',
+            'keys': [('user_id', ASCENDING), ('type', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)]
+        },
+        {
+            'name': 'user_category_date',
+            'keys': [('user_id', ASCENDING), ('category', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)]
+        },
+        {
+            # Multikey over the prefix terms of services/search.py
+            'name': 'user_search_date',
+            'keys': [('user_id', ASCENDING), ('search_terms', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)]
+        }
+    ],
+    'transaction_rollups': [
+        {
+            'name': 'user_period_bucket',
+            'keys': [
+                ('user_id', ASCENDING),
+                ('period', ASCENDING),
+                ('type', ASCENDING),
+                ('category', ASCENDING),
+                ('currency', ASCENDING)
+            ],
+            'unique': True
+        }
+    ],
+    'idempotency_keys': [
+        {
+            # Reservations and stored responses are looked up by _id; this only expires them
+            'name': 'expires_at_ttl',
+            'keys': [('expires_at', ASCENDING)],
+            'expireAfterSeconds': 0
+        }
+    ],
+    'transaction_outbox': [
+        {
+            'name': 'created_at_ttl',
+            'keys': [('created_at', ASCENDING)],
+            'expireAfterSeconds': Config.OUTBOX_RETENTION
+        },
+        {
+            'name': 'published_created_at',
+            'keys': [('published', ASCENDING), ('created_at', ASCENDING)]
+        }
+    ]
+}
+
+def query_shapes(user_id):
+    """Representative (name, collection, filter, sort) shapes issued by routes/transactions.py"""
+    now = datetime.utcnow()
+    month_ago = now - timedelta(days=30)
+    newest_first = [('date', DESCENDING), ('_id', DESCENDING)]
+    return [
+        ('list', 'transactions', {'user_id': user_id}, newest_first),
+        ('list by type', 'transactions', {'user_id': user_id, 'type': 'expense'}, newest_first),
+        ('list by category', 'transactions', {'user_id': user_id, 'category': 'Groceries'}, newest_first),
+        ('list by date range', 'transactions',
+         {'user_id': user_id, 'date': {'$gte': month_ago, '$lt': now}}, newest_first),
+        ('list by type and date range', 'transactions',
+         {'user_id': user_id, 'type': 'expense', 'date': {'$gte': month_ago, '$lt': now}}, newest_first),
+        ('list next page', 'transactions',
+         {'user_id': user_id, '$and': [
+             {'date': {'$lte': month_ago}},
+             {'$or': [{'date': {'$lt': month_ago}}, {'_id': {'$lt': ObjectId()}}]}
+         ]}, newest_first),
+        ('search', 'transactions',
+         {'user_id': user_id, 'search_terms': {'$all': ['groc']}}, newest_first),
+        ('summary by category', 'transactions',
+         {'user_id': user_id, 'date': {'$gte': month_ago, '$lt': now}}, None),
+        ('summary by category (rollups)', 'transaction_rollups',
+         {'user_id': user_id, 'count': {'$gt': 0}, 'period': {'$gte': 202601, '$lte': 202612}}, None)
+    ]
+
+# Options sync_indexes compares, with the value an index has when they are not set
+OPTION_DEFAULTS = {'unique': False, 'sparse': False, 'expireAfterSeconds': None, 'partialFilterExpression': None}
+
+def _index_options(spec):
+    return {key: value for key, value in spec.items() if key != 'keys'}
+
+def _changed_options(spec, current):
+    """Names of the options whose value differs between a declared and an existing index"""
+    return {
+        option for option, default in OPTION_DEFAULTS.items()
+        if spec.get(option, default) != current.get(option, default)
+    }
+
+def declared_fingerprint():
+    """Hash of INDEXES; options can come from configuration (e.g. OUTBOX_RETENTION) without a version bump"""
+    return hashlib.sha256(json.dumps(INDEXES, sort_keys=True).encode('utf-8')).hexdigest()
+
+def sync_indexes(db, drop_unused=True):
+    """Create declared indexes, update changed ones and drop undeclared ones; return (created, modified, dropped) names"""
+    created = []
+    modified = []
+    dropped = []
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        declared = {spec['name'] for spec in specs}
+        
+        for spec in specs:
+            current = existing.get(spec['name'])
+            if current and current['key'] == spec['keys']:
+                changed = _changed_options(spec, current)
+                if not changed:
+                    continue
+                ttls = (spec.get('expireAfterSeconds'), current.get('expireAfterSeconds'))
+                if changed == {'expireAfterSeconds'} and None not in ttls:
+                    # A TTL change is applied in place, without rebuilding the index
+                    db.command('collMod', collection_name, index={
+                        'name': spec['name'], 'expireAfterSeconds': spec['expireAfterSeconds']
+                    })
+                    modified.append(f"{collection_name}.{spec['name']}")
+                    continue
+            if current:
+                # Same name, different definition: replace it
+                collection.drop_index(spec['name'])
+            collection.create_index(spec['keys'], **_index_options(spec))
+            created.append(f"{collection_name}.{spec['name']}")
+        
+        if drop_unused:
+            for name in existing:
+                if name != '_id_' and name not in declared:
+                    collection.drop_index(name)
+                    dropped.append(f"{collection_name}.{name}")
+    
+    db.schema_meta.update_one(
+        {'_id': 'indexes'},
+        {'$set': {'version': INDEX_VERSION, 'fingerprint': declared_fingerprint(), 'applied_at': datetime.utcnow()}},
+        upsert=True
+    )
+    return created, modified, dropped
+
+def sync_in_background(db):
+    """Sync indexes in a daemon thread if the stored version is older than INDEX_VERSION or the declarations changed"""
+    meta = db.schema_meta.find_one({'_id': 'indexes'}) or {}
+    if meta.get('version', 0) >= INDEX_VERSION and meta.get('fingerprint') == declared_fingerprint():
+        return None
+    
+    def run():
+        try:
+            created, modified, dropped = sync_indexes(db)
+            print(f"Indexes synced to version {INDEX_VERSION}: created {created}, modified {modified}, dropped {dropped}")
+        except Exception as e:
+            print(f"Index sync error: {e}")
+    
+    thread = threading.Thread(target=run, name='index-sync', daemon=True)
+    thread.start()
+    return thread
+
+def _plan_stages(plan):
+    """Yield every stage in an explain plan tree"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+def _winning_plans(explain):
+    """Find the winning plan(s) anywhere in find or aggregate explain output"""
+    if isinstance(explain, dict):
+        if 'winningPlan' in explain:
+            yield explain['winningPlan']
+        for value in explain.values():
+            yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from _winning_plans(item)
+
+def explain_report(db, user_id):
+    """Explain every query shape; return one entry per shape with its problems"""
+    report = []
+    for name, collection_name, query, sort in query_shapes(user_id):
+        collection = db[collection_name]
+        if sort:
+            explain = collection.find(query).sort(sort).limit(100).explain()
+        else:
+            explain = db.command('explain', {
+                'aggregate': collection_name,
+                'pipeline': [{'$match': query}, {'$group': {'_id': '$category', 'count': {'$sum': 1}}}],
+                'cursor': {}
+            }, verbosity='queryPlanner')
+        
+        stages = [stage for plan in _winning_plans(explain) for stage in _plan_stages(plan)]
+        problems = []
+        if any(stage['stage'] == 'COLLSCAN' for stage in stages):
+            problems.append('COLLSCAN')
+        if any(stage['stage'] == 'SORT' for stage in stages):
+            problems.append('in-memory SORT')
+        report.append({
+            'shape': name,
+            'indexes': sorted({stage['indexName'] for stage in stages if 'indexName' in stage}),
+            'problems': problems
+        })
+    return report
+
+if __name__ == '__main__':
+    from database import init_db, close_db
+    
+    parser = argparse.ArgumentParser(description='Manage transaction service indexes')
+    parser.add_argument('command', choices=['sync', 'report', 'list'])
+    parser.add_argument('--keep-unused', action='store_true', help='Do not drop undeclared indexes')
+    parser.add_argument('--user', help='User id to explain query shapes with (default: any user)')
+    args = parser.parse_args()
+    
+    db = init_db()
+    try:
+        if args.command == 'sync':
+            created, modified, dropped = sync_indexes(db, drop_unused=not args.keep_unused)
+            print(f"Index version {INDEX_VERSION}: created {len(created)}, modified {len(modified)}, dropped {len(dropped)}")
+            for name in created:
+                print(f"  + {name}")
+            for name in modified:
+                print(f"  ~ {name}")
+            for name in dropped:
+                print(f"  - {name}")
+        elif args.command == 'report':
+            user_id = args.user or (db.transactions.find_one({}, {'user_id': 1}) or {}).get('user_id', '')
+            report = explain_report(db, user_id)
+            for entry in report:
+                status = ', '.join(entry['problems']) or 'ok'
+                print(f"{entry['shape']:<32} {status:<24} {', '.join(entry['indexes']) or '-'}")
+            if any(entry['problems'] for entry in report):
+                raise SystemExit(1)
+        else:
+            for collection_name in INDEXES:
+                for name, info in db[collection_name].index_information().items():
+                    print(f"{collection_name}.{name}: {info['key']}")
+    finally:
+        close_db()
@@ -0,0 +1,70 @@
+"""BSON-aware JSON encoding for API responses.
+
+Documents read from Mongo can be returned as-is: ObjectId, datetime and
+Decimal128 values are encoded directly, so routes no longer need to convert
+each document before calling jsonify. orjson is used when it is installed
+(set JSON_ENCODER=json to force the standard library encoder).
+"""
+import json
+from datetime import datetime
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from flask.json.provider import JSONProvider
+from config import Config
+from models.transaction import Transaction
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+def encode_default(value):
+    """Encode the BSON types the JSON encoders do not know about"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return Transaction.format_date(value)
+    if isinstance(value, Decimal128):
+        return Transaction.format_amount(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+USE_ORJSON = orjson is not None and Config.JSON_ENCODER != 'json'
+
+if USE_ORJSON:
+    # Datetimes go through encode_default so both encoders produce the same format
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        """Serialize a value to a JSON string"""
+        return orjson.dumps(value, default=encode_default, option=ORJSON_OPTIONS).decode('utf-8')
+
+    def dumps_bytes(value):
+        """Serialize a value to UTF-8 encoded JSON"""
+        return orjson.dumps(value, default=encode_default, option=ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(value):
+        """Serialize a value to a JSON string"""
+        return json.dumps(value, default=encode_default, separators=(',', ':'))
+
+    def dumps_bytes(value):
+        """Serialize a value to UTF-8 encoded JSON"""
+        return dumps(value).encode('utf-8')
+
+    loads = json.loads
+
+class BSONJSONProvider(JSONProvider):
+    """JSON provider for Flask and Quart apps (app.json = BSONJSONProvider(app))"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
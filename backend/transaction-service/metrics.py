@@ -0,0 +1,95 @@
+"""In-process metrics exported in Prometheus text format.
+
+Histograms, counters and gauges register themselves when created and are all
+rendered by `render_metrics()` for the /metrics endpoint. Recording is a
+lock-protected dict update, so it is cheap enough for every request.
+"""
+from bisect import bisect_left
+import threading
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Histogram:
+    """Latency histogram with one series per label tuple"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}  # labels -> [count per bucket..., +Inf count, sum, count]
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, labels, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = [(labels, list(series)) for labels, series in sorted(self.series.items())]
+        for labels, series in items:
+            # Buckets are stored per range and made cumulative here
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+class Metric:
+    """Counter or gauge with one value per label tuple"""
+
+    def __init__(self, name, help_text, label_names, kind='counter'):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.kind = kind
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def add(self, labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, labels, value):
+        with self.lock:
+            self.values[labels] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+def render_metrics():
+    """All registered metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,16 @@
+from functools import wraps
+from quart import request, jsonify
+from middleware.auth import resolve_user
+
+def authenticate_jwt_async(f):
+    """Async counterpart of authenticate_jwt for the ASGI app"""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        user, error = resolve_user(request.headers.get('Authorization'))
+        if error:
+            body, status = error
+            return jsonify(body), status
+        request.user = user
+        return await f(*args, **kwargs)
+
+    return decorated_function
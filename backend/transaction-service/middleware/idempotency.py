@@ -0,0 +1,51 @@
+from functools import wraps
+from flask import Response, request, jsonify, make_response
+from database import get_db
+from services.idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, record_id, request_fingerprint,
+    stored_response, reserve, complete, release
+)
+
+def idempotent(f):
+    """Decorator honoring the Idempotency-Key header; use after authenticate_jwt."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        # Streamed imports are not read up front; the key alone identifies them
+        body = request.get_data(cache=True) if request.is_json else b''
+        fingerprint = request_fingerprint(request.method, request.path, request.query_string, body)
+        record_key = record_id(request.user['id'], key)
+        db = get_db()
+
+        existing = reserve(db, record_key, fingerprint)
+        if existing is not None:
+            body, status, mimetype, headers = stored_response(existing, fingerprint)
+            return Response(body, status=status, mimetype=mimetype, headers=headers)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            release(db, record_key)
+            raise
+        if response.status_code >= 500:
+            release(db, record_key)
+        else:
+            # Stored once the response has been sent, so the client only waits for the reservation
+            stored = (response.status_code, response.get_data(as_text=True), response.mimetype)
+            response.call_on_close(lambda: store_response(db, record_key, fingerprint, *stored))
+        return response
+
+    return decorated_function
+
+def store_response(db, record_key, fingerprint, status, body, mimetype):
+    """complete() for a request that has already answered; a failure is only logged"""
+    try:
+        complete(db, record_key, fingerprint, status, body, mimetype)
+    except Exception as e:
+        # The reservation stays pending, so retries get 409 until it expires
+        print(f"Idempotency store error: {e}")
@@ -0,0 +1,51 @@
+from functools import wraps
+from quart import Response, current_app, request, jsonify, make_response
+from database_async import get_async_db
+from services.idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, record_id, request_fingerprint,
+    stored_response, reserve_async, complete_async, release_async
+)
+
+def idempotent_async(f):
+    """Async counterpart of idempotent for the ASGI app"""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return await f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        body = await request.get_data() if request.is_json else b''
+        fingerprint = request_fingerprint(request.method, request.path, request.query_string, body)
+        record_key = record_id(request.user['id'], key)
+        db = get_async_db()
+
+        existing = await reserve_async(db, record_key, fingerprint)
+        if existing is not None:
+            body, status, mimetype, headers = stored_response(existing, fingerprint)
+            return Response(body, status=status, mimetype=mimetype, headers=headers)
+
+        try:
+            response = await make_response(await f(*args, **kwargs))
+        except Exception:
+            await release_async(db, record_key)
+            raise
+        if response.status_code >= 500:
+            await release_async(db, record_key)
+        else:
+            # Stored in the background once the response is on its way
+            current_app.add_background_task(
+                store_response_async, db, record_key, fingerprint,
+                response.status_code, await response.get_data(as_text=True), response.mimetype
+            )
+        return response
+
+    return decorated_function
+
+async def store_response_async(db, record_key, fingerprint, status, body, mimetype):
+    """Async counterpart of middleware.idempotency.store_response"""
+    try:
+        await complete_async(db, record_key, fingerprint, status, body, mimetype)
+    except Exception as e:
+        print(f"Idempotency store error: {e}")
@@ -0,0 +1,102 @@
+"""Migrate legacy transaction documents to native BSON types.
+
+Older documents store `date`, `created_at` and `updated_at` as ISO strings and
+`amount` as a float, and have no `search_terms`. This converts them to BSON
+dates and Decimal128 and backfills the search terms, in batches. Only
+unconverted documents match the filter, so the command can be stopped and
+re-run at any time and picks up where it left off.
+
+The service keeps serving legacy documents while this runs (see
+services/legacy.py). A run that leaves none records a `legacy_migration`
+marker in `schema_meta`, after which reads only use the native types.
+
+Usage:
+    python migrate.py [--batch-size 1000] [--dry-run]
+"""
+import argparse
+from pymongo import UpdateOne
+from database import init_db, close_db
+from models.transaction import Transaction
+from services.legacy import LEGACY_FILTER, mark_if_migrated
+
+DATE_FIELDS = ('date', 'created_at', 'updated_at')
+
+def require_migrated(db):
+    """Raise unless the legacy migration has run (checked once at startup with REQUIRE_MIGRATION=1)"""
+    if not mark_if_migrated(db):
+        raise RuntimeError(
+            'Transactions with legacy string dates or float amounts were found. '
+            'Run `python migrate.py`, or unset REQUIRE_MIGRATION to serve them while it runs.'
+        )
+
+def convert_document(doc):
+    """Return the $set payload converting a legacy document's fields"""
+    update = {}
+    for field in DATE_FIELDS:
+        if isinstance(doc.get(field), str):
+            update[field] = Transaction.parse_date(doc[field])
+    if isinstance(doc.get('amount'), (int, float)):
+        update['amount'] = Transaction.to_amount(doc['amount'])
+    if 'search_terms' not in doc:
+        update['search_terms'] = Transaction.search_terms(doc)
+    return update
+
+def migrate(db, batch_size, dry_run=False):
+    """Convert legacy documents batch by batch; return (converted, skipped)"""
+    converted = 0
+    skipped = 0
+    last_id = None
+    projection = {field: 1 for field in DATE_FIELDS + ('amount', 'category', 'notes', 'search_terms')}
+    
+    while True:
+        query = dict(LEGACY_FILTER)
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(db.transactions.find(query, projection).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+        
+        operations = []
+        for doc in batch:
+            try:
+                update = convert_document(doc)
+            except ValueError as e:
+                print(f"Skipping {doc['_id']}: {e}")
+                skipped += 1
+                continue
+            # Match on the original values so a concurrent write is never overwritten
+            match = {'_id': doc['_id']}
+            match.update({field: doc[field] for field in update if field != 'search_terms'})
+            if 'search_terms' in update:
+                match.update({
+                    'search_terms': {'$exists': False},
+                    'category': doc.get('category'),
+                    'notes': doc.get('notes')
+                })
+            operations.append(UpdateOne(match, {'$set': update}))
+        
+        if operations and not dry_run:
+            result = db.transactions.bulk_write(operations, ordered=False)
+            converted += result.modified_count
+        else:
+            converted += len(operations)
+        print(f"Processed batch ending at {last_id}: {converted} converted so far")
+    
+    return converted, skipped
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert legacy transactions to BSON dates and Decimal128 amounts')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+    args = parser.parse_args()
+    
+    db = init_db()
+    try:
+        converted, skipped = migrate(db, args.batch_size, args.dry_run)
+        print(f"Migration complete: {converted} converted, {skipped} skipped")
+        if not args.dry_run and not mark_if_migrated(db):
+            print("Legacy documents remain (see the skipped ones above); the service will not start until they are fixed")
+            raise SystemExit(1)
+    finally:
+        close_db()
@@ -1,22 +1,42 @@
-from datetime import datetime
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+import re
+import unicodedata
+from bson.decimal128 import Decimal128
 
 class Transaction:
     """Transaction model schema"""
     
+    # Fields clients may select with `fields=`; _id and date are always returned
+    # because pagination cursors are built from them
+    FIELDS = ('type', 'amount', 'currency', 'category', 'date', 'notes', 'created_at', 'updated_at')
+    
+    # Internal fields never returned to clients
+    HIDDEN_FIELDS = {'search_terms': 0}
+    
+    # Fields search_terms is derived from
+    SEARCH_SOURCE_FIELDS = ('category', 'notes', 'date')
+    SEARCH_MIN_PREFIX = 2
+    SEARCH_MAX_PREFIX = 20
+    SEARCH_MAX_WORDS = 100
+    
     @staticmethod
     def create_transaction(user_id, transaction_type, amount, currency, category, date, notes=None):
         """Create a transaction document"""
-        return {
+        now = datetime.utcnow()
+        transaction = {
             'user_id': user_id,
             'type': transaction_type,  # 'income' or 'expense'
-            'amount': float(amount),
+            'amount': Transaction.to_amount(amount),
             'currency': currency,
             'category': category,
-            'date': date,  # ISO format string
+            'date': Transaction.parse_date(date),  # BSON date (UTC)
             'notes': notes,
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
+            'created_at': now,
+            'updated_at': now
         }
+        transaction['search_terms'] = Transaction.search_terms(transaction)
+        return transaction
     
     @staticmethod
     def validate_transaction(data):
@@ -47,9 +67,111 @@ class Transaction:
         
         return True, None
     
+    @staticmethod
+    def parse_date(value):
+        """Parse an ISO 8601 string into a naive UTC datetime"""
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    
+    @staticmethod
+    def format_date(value):
+        """Format a stored datetime as an ISO 8601 UTC string; midnight UTC as a plain YYYY-MM-DD date"""
+        if not isinstance(value, datetime):
+            return value  # Legacy string value, not migrated yet
+        if value.time() == time():
+            # Date-only input (e.g. "2026-02-11") comes back as it was sent
+            return value.date().isoformat()
+        timespec = 'milliseconds' if value.microsecond else 'seconds'
+        return value.isoformat(timespec=timespec) + 'Z'
+    
+    @staticmethod
+    def date_range_filter(start_date=None, end_date=None):
+        """Build a range filter on `date`; a date-only end_date covers that whole day"""
+        date_filter = {}
+        if start_date:
+            date_filter['$gte'] = Transaction.parse_date(start_date)
+        if end_date:
+            end = Transaction.parse_date(end_date)
+            if 'T' in end_date:
+                date_filter['$lte'] = end
+            else:
+                date_filter['$lt'] = end + timedelta(days=1)
+        return date_filter
+    
+    @staticmethod
+    def to_amount(value):
+        """Convert an amount to Decimal128 so sums are exact"""
+        if isinstance(value, Decimal128):
+            return value
+        try:
+            # str() keeps floats like 0.1 from carrying binary noise into the decimal
+            return Decimal128(Decimal(str(value)))
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {value}")
+    
+    @staticmethod
+    def format_amount(value):
+        """Convert a stored amount back to a JSON number"""
+        if isinstance(value, Decimal128):
+            return float(value.to_decimal())
+        return value
+    
+    @staticmethod
+    def projection(fields):
+        """Translate a comma-separated `fields` parameter into a Mongo projection"""
+        if not fields:
+            return dict(Transaction.HIDDEN_FIELDS)
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in Transaction.FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(Transaction.FIELDS)}")
+        projection = {'_id': 1, 'date': 1}
+        projection.update({field: 1 for field in requested})
+        return projection
+    
+    @staticmethod
+    def search_words(text):
+        """Lowercase, accent-free words of a text, in order of first appearance"""
+        if not text:
+            return []
+        text = unicodedata.normalize('NFKD', str(text).lower())
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+        return list(dict.fromkeys(re.findall(r'[^\W_]+', text)))
+    
+    @staticmethod
+    def search_terms(transaction):
+        """Index terms for search: every word prefix, plus '=word' for whole words.
+        
+        Words come from the category, the notes and the year of the date, so
+        "rent 2024" finds 2024 rent payments.
+        """
+        words = Transaction.search_words(transaction.get('category'))
+        words += Transaction.search_words(transaction.get('notes'))
+        date = transaction.get('date')
+        if date:
+            words.append(str(Transaction.parse_date(date).year))
+        
+        terms = set()
+        for word in list(dict.fromkeys(words))[:Transaction.SEARCH_MAX_WORDS]:
+            word = word[:Transaction.SEARCH_MAX_PREFIX]
+            terms.add('=' + word)
+            for end in range(Transaction.SEARCH_MIN_PREFIX, len(word) + 1):
+                terms.add(word[:end])
+        return sorted(terms)
+    
     @staticmethod
     def to_json(transaction):
         """Convert MongoDB document to JSON"""
         if transaction:
             transaction['_id'] = str(transaction['_id'])
+            for field in ('date', 'created_at', 'updated_at'):
+                if field in transaction:
+                    transaction[field] = Transaction.format_date(transaction[field])
+            if 'amount' in transaction:
+                transaction['amount'] = Transaction.format_amount(transaction['amount'])
         return transaction
@@ -0,0 +1,238 @@
+"""MongoDB driver metrics in Prometheus text format.
+
+PyMongo monitoring listeners are registered on each client by `listeners()`
+and aggregate into module-level metrics:
+
+- command latency histograms per client, command, collection and query shape
+  (the filter's field and operator names, with values dropped)
+- connection pool gauges (open, in use, waiting) and a checkout wait histogram
+- server type and heartbeat latency per address
+
+They are exported by the /metrics endpoint (see metrics.py).
+"""
+import threading
+import time
+from pymongo import monitoring
+from metrics import Histogram, Metric
+
+# Distinct query shapes tracked before new ones are folded into "other"
+MAX_SHAPES = 200
+
+# Commands whose filter is recorded as the query shape
+FILTER_FIELDS = {
+    'find': 'filter',
+    'count': 'query',
+    'distinct': 'query',
+    'findAndModify': 'query',
+    'delete': 'deletes',
+    'update': 'updates'
+}
+
+COMMAND_SECONDS = Histogram(
+    'mongodb_command_duration_seconds', 'MongoDB command latency',
+    ('client', 'command', 'collection', 'shape'))
+COMMAND_FAILURES = Metric(
+    'mongodb_command_failures_total', 'MongoDB commands that returned an error',
+    ('client', 'command', 'collection'))
+POOL_CONNECTIONS = Metric(
+    'mongodb_pool_connections', 'Open connections in the pool',
+    ('client', 'address'), kind='gauge')
+POOL_IN_USE = Metric(
+    'mongodb_pool_connections_in_use', 'Connections checked out of the pool',
+    ('client', 'address'), kind='gauge')
+POOL_WAITING = Metric(
+    'mongodb_pool_waiting', 'Threads waiting to check out a connection',
+    ('client', 'address'), kind='gauge')
+POOL_CHECKOUT_SECONDS = Histogram(
+    'mongodb_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection',
+    ('client', 'address'))
+POOL_CHECKOUT_FAILURES = Metric(
+    'mongodb_pool_checkout_failures_total', 'Connection checkouts that failed (e.g. waitQueueTimeoutMS)',
+    ('client', 'address', 'reason'))
+POOL_CLEARED = Metric(
+    'mongodb_pool_cleared_total', 'Times the pool was cleared after a network error',
+    ('client', 'address'))
+SERVER_INFO = Metric(
+    'mongodb_server_info', '1 for the current type of each server, 0 for its previous types',
+    ('client', 'address', 'type'), kind='gauge')
+HEARTBEAT_SECONDS = Histogram(
+    'mongodb_server_heartbeat_seconds', 'Server heartbeat round trip',
+    ('client', 'address'))
+HEARTBEAT_FAILURES = Metric(
+    'mongodb_server_heartbeat_failures_total', 'Failed server heartbeats',
+    ('client', 'address'))
+
+_shapes = set()
+_shapes_lock = threading.Lock()
+
+def _shape_of(value, prefix=''):
+    """Field and operator paths of a filter, e.g. user_id,date.$gte,date.$lt"""
+    if isinstance(value, dict):
+        parts = []
+        for key, child in value.items():
+            path = f"{prefix}.{key}" if prefix else key
+            nested = _shape_of(child, path)
+            parts.extend(nested or [path])
+        return parts
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        parts = []
+        for item in value:
+            parts.extend(_shape_of(item, prefix))
+        return list(dict.fromkeys(parts))
+    return []
+
+def query_shape(command_name, command):
+    """Bounded-cardinality description of what a command filters on"""
+    if command_name == 'aggregate':
+        pipeline = command.get('pipeline') or [{}]
+        first = pipeline[0]
+        filter_doc = first.get('$match') if isinstance(first, dict) else None
+        shape = ','.join(_shape_of(filter_doc or {})) or next(iter(first), '')
+    elif command_name in FILTER_FIELDS:
+        filter_doc = command.get(FILTER_FIELDS[command_name]) or {}
+        if isinstance(filter_doc, list):
+            # delete/update batches: the shape of the first statement's filter
+            filter_doc = (filter_doc[0].get('q') if filter_doc else None) or {}
+        shape = ','.join(_shape_of(filter_doc))
+    else:
+        return ''
+    with _shapes_lock:
+        if shape not in _shapes:
+            if len(_shapes) >= MAX_SHAPES:
+                return 'other'
+            _shapes.add(shape)
+    return shape
+
+class CommandMetrics(monitoring.CommandListener):
+    """Records per-command latency and failures"""
+
+    def __init__(self, client_name):
+        self.client_name = client_name
+        self.pending = {}  # (connection, request_id) -> (collection, shape)
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        # getMore names the collection in a separate field
+        collection = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        collection = collection if isinstance(collection, str) else ''
+        shape = query_shape(event.command_name, event.command)
+        with self.lock:
+            self.pending[(event.connection_id, event.request_id)] = (collection, shape)
+
+    def _finish(self, event):
+        with self.lock:
+            return self.pending.pop((event.connection_id, event.request_id), ('', ''))
+
+    def succeeded(self, event):
+        collection, shape = self._finish(event)
+        COMMAND_SECONDS.observe(
+            (self.client_name, event.command_name, collection, shape),
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event):
+        collection, shape = self._finish(event)
+        COMMAND_SECONDS.observe(
+            (self.client_name, event.command_name, collection, shape),
+            event.duration_micros / 1e6
+        )
+        COMMAND_FAILURES.add((self.client_name, event.command_name, collection))
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks pool size, connections in use, waiters and checkout wait time"""
+
+    def __init__(self, client_name):
+        self.client_name = client_name
+        # Checkout start and finish are reported on the same thread
+        self.local = threading.local()
+
+    def _labels(self, event):
+        return (self.client_name, f"{event.address[0]}:{event.address[1]}")
+
+    def pool_created(self, event):
+        labels = self._labels(event)
+        for gauge in (POOL_CONNECTIONS, POOL_IN_USE, POOL_WAITING):
+            gauge.set(labels, 0)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        POOL_CLEARED.add(self._labels(event))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.add(self._labels(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.add(self._labels(event), -1)
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+        POOL_WAITING.add(self._labels(event))
+
+    def _checkout_done(self, event):
+        labels = self._labels(event)
+        POOL_WAITING.add(labels, -1)
+        started = getattr(self.local, 'started', None)
+        if started is not None:
+            POOL_CHECKOUT_SECONDS.observe(labels, time.perf_counter() - started)
+            self.local.started = None
+        return labels
+
+    def connection_check_out_failed(self, event):
+        labels = self._checkout_done(event)
+        POOL_CHECKOUT_FAILURES.add(labels + (event.reason,))
+
+    def connection_checked_out(self, event):
+        labels = self._checkout_done(event)
+        POOL_IN_USE.add(labels)
+
+    def connection_checked_in(self, event):
+        POOL_IN_USE.add(self._labels(event), -1)
+
+class ServerMetrics(monitoring.ServerListener, monitoring.ServerHeartbeatListener):
+    """Tracks server types and heartbeat latency"""
+
+    def __init__(self, client_name):
+        self.client_name = client_name
+        self.types = {}
+
+    def _address(self, address):
+        return f"{address[0]}:{address[1]}"
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        address = self._address(event.server_address)
+        previous = self.types.get(address)
+        current = event.new_description.server_type_name
+        if previous:
+            SERVER_INFO.set((self.client_name, address, previous), 0)
+        SERVER_INFO.set((self.client_name, address, current), 1)
+        self.types[address] = current
+
+    def closed(self, event):
+        address = self._address(event.server_address)
+        previous = self.types.pop(address, None)
+        if previous:
+            SERVER_INFO.set((self.client_name, address, previous), 0)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        HEARTBEAT_SECONDS.observe((self.client_name, self._address(event.connection_id)), event.duration)
+
+    def failed(self, event):
+        HEARTBEAT_FAILURES.add((self.client_name, self._address(event.connection_id)))
+
+def listeners(client_name):
+    """Monitoring listeners for one MongoClient (pass as event_listeners)"""
+    return [CommandMetrics(client_name), PoolMetrics(client_name), ServerMetrics(client_name)]
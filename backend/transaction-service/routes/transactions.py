@@ -1,12 +1,246 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime
+from functools import cached_property
+import csv
+import io
+import time
+from config import Config
 from database import get_db
+from json_provider import dumps
 from middleware.auth import authenticate_jwt
+from middleware.idempotency import idempotent
 from models.transaction import Transaction
+from services.aggregation import (
+    parse_aggregate_request, aggregate_pipeline, rollup_match_stage, rollup_aggregate_pipeline,
+    merge_aggregates, format_buckets
+)
+from services.archive import (
+    has_archive, find_archived, find_archived_relevant, find_archived_by_id, archived_ids, count_archived,
+    summarize_archived, aggregate_archived, merge_pages, merge_summaries, with_archived, date_key, relevance_key
+)
+from services.importer import iter_rows
+from services.ingest import IngestUnavailable, ingest_queue
+from services.legacy import legacy_filter, migrated
+from services.pagination import encode_cursor, decode_cursor, after_cursor
+from services.changes import record_changes
+from services.rollups import ROLLUP_PROJECTION, month_period_range, rollups_ready, summary_by_category
+from services.search import (
+    SORT_OPTIONS, SEARCH_SOURCE_PROJECTION, query_words, search_filter, relevance_pipeline,
+    needs_stored_sources, update_search_terms
+)
+from services.versions import get_version, make_etag, etag_matches, cache_headers
 
 transactions_bp = Blueprint('transactions', __name__)
 
+EXPORT_FIELDS = ['_id', 'type', 'amount', 'currency', 'category', 'date', 'notes', 'created_at', 'updated_at']
+
+# Writes to transactions moved to cold storage (services/archive.py)
+ARCHIVED_ERROR = 'Transaction is archived and read-only'
+
+# An update whose search terms need the stored document retries this often
+# when another write changes the document between the read and the update
+UPDATE_ATTEMPTS = 3
+CONFLICT_ERROR = 'Transaction was modified concurrently, retry the update'
+
+class UpdateConflict(Exception):
+    """The document kept changing between reading and updating it"""
+
+def build_transaction(user_id, data):
+    """Build a transaction document from validated request data"""
+    return Transaction.create_transaction(
+        user_id=user_id,
+        transaction_type=data['type'],
+        amount=data['amount'],
+        currency=data['currency'],
+        category=data['category'],
+        date=data['date'],
+        notes=data.get('notes')
+    )
+
+def new_transaction(user_id, data):
+    """Validate a create request and build its document (raises ValueError)"""
+    is_valid, error = Transaction.validate_transaction(data)
+    if not is_valid:
+        raise ValueError(error)
+    return build_transaction(user_id, data)
+
+def created_response(transaction, inserted_id):
+    """(body, status) answering a create once the document is inserted"""
+    transaction['_id'] = inserted_id
+    transaction.pop('search_terms')
+    return {
+        'message': 'Transaction created successfully',
+        'transaction': transaction
+    }, 201
+
+def missing_response(user_id, object_id):
+    """(body, status) for an update or delete matching no live transaction (reads the archive)"""
+    if archived_ids(user_id, [object_id]):
+        return {'error': ARCHIVED_ERROR}, 409
+    return {'error': 'Transaction not found'}, 404
+
+def wants_async(req):
+    """Whether a create request opted into write-behind ingestion"""
+    return req.args.get('async') in ('1', 'true') or 'respond-async' in req.headers.get('Prefer', '')
+
+def enqueue_transaction(transaction, path):
+    """Queue a built transaction for write-behind insertion; return (body, status)"""
+    # The _id is assigned now so it can serve as the tracking id
+    transaction['_id'] = ObjectId()
+    try:
+        ingest_queue.enqueue([transaction])
+    except IngestUnavailable as e:
+        return {'error': str(e)}, 503
+    tracking_id = str(transaction['_id'])
+    return {
+        'message': 'Transaction queued',
+        'tracking_id': tracking_id,
+        'status_url': f"{path.rstrip('/')}/ingest/{tracking_id}"
+    }, 202
+
+def build_transaction_query(user_id, args):
+    """Build the Mongo filter shared by the list endpoints (raises ValueError on bad filters)"""
+    query = {'user_id': user_id}
+    
+    transaction_type = args.get('type')  # 'income' or 'expense'
+    category = args.get('category')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    q = (args.get('q') or '').strip()
+    
+    if transaction_type:
+        query['type'] = transaction_type
+    
+    if category:
+        query['category'] = category
+    
+    if start_date or end_date:
+        try:
+            query['date'] = Transaction.date_range_filter(start_date, end_date)
+        except ValueError:
+            raise ValueError('Invalid date filter. Use ISO format')
+    
+    if q:
+        query.update(search_filter(query_words(q)))
+    
+    return query
+
+# Order of the list endpoints with sort=date (the default)
+LIST_SORT = [('date', -1), ('_id', -1)]
+
+class ListRequest:
+    """Parameters and filters of GET /transactions/, shared by the Flask and async views.
+    
+    Only the MongoDB calls differ between the two: the views read `live_skip`
+    rows from `live_find_query` (with `relevance()` or LIST_SORT), merge the
+    archive with `merge_archived()` when `archived`, count `live_query`, and
+    answer with `body()`.
+    """
+    
+    def __init__(self, user_id, args, legacy=False):
+        """Parse the query string (raises ValueError on bad parameters).
+        
+        `legacy` widens the MongoDB filters to documents migrate.py has not
+        converted yet; the archive always gets the plain ones.
+        """
+        self.user_id = user_id
+        try:
+            self.limit = max(int(args.get('limit', 100)), 1)
+            self.skip = int(args.get('skip', 0))
+        except ValueError:
+            raise ValueError('limit and skip must be integers')
+        self.include_total = args.get('include_total', 'true').lower() != 'false'
+        self.sort = args.get('sort', 'date')
+        cursor = args.get('cursor')
+        
+        if self.sort not in SORT_OPTIONS:
+            raise ValueError(f"Sort must be one of: {', '.join(SORT_OPTIONS)}")
+        if self.sort == 'relevance' and (cursor or not (args.get('q') or '').strip()):
+            raise ValueError('sort=relevance needs q and pages with skip, not cursor')
+        
+        self.query = build_transaction_query(user_id, args)
+        self.projection = Transaction.projection(args.get('fields'))
+        self.words = query_words(args['q']) if self.sort == 'relevance' else None
+        
+        # Filters sent to MongoDB also match documents migrate.py has not converted yet
+        self.live_query = legacy_filter(self.query) if legacy else self.query
+        self.find_query, self.live_find_query = self.query, self.live_query
+        self.legacy_cursor = False
+        if cursor:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            self.legacy_cursor = isinstance(cursor_date, str)
+            self.find_query = {**self.query, **after_cursor(cursor_date, cursor_id)}
+            self.live_find_query = {**self.live_query, **after_cursor(cursor_date, cursor_id, legacy)}
+            self.skip = 0
+    
+    @cached_property
+    def archived(self):
+        """Whether archived months may hold matching rows (legacy string-dated rows come after all of them)"""
+        return not self.legacy_cursor and has_archive(self.user_id, self.find_query)
+    
+    @property
+    def live_skip(self):
+        # Archived rows are merged in, so live rows are then read from the top
+        return 0 if self.archived else self.skip
+    
+    @property
+    def live_limit(self):
+        # One extra row tells us whether another page exists
+        return self.skip + self.limit + 1 if self.archived else self.limit + 1
+    
+    def relevance(self):
+        """Pipeline reading the live rows of sort=relevance"""
+        return relevance_pipeline(
+            self.live_find_query, self.words, self.projection, self.live_skip, self.live_limit, keep_score=self.archived
+        )
+    
+    def merge_archived(self, transactions):
+        """The live rows with the archived ones merged in (reads the archive files)"""
+        if self.sort == 'relevance':
+            archived = find_archived_relevant(self.user_id, self.find_query, self.words, self.projection, self.live_limit)
+            return merge_pages(transactions, archived, relevance_key, self.skip, self.limit + 1)
+        archived = find_archived(self.user_id, self.find_query, self.projection, self.live_limit)
+        return merge_pages(transactions, archived, date_key, self.skip, self.limit + 1)
+    
+    def body(self, transactions, total):
+        """Response body for the rows read (up to limit + 1)"""
+        has_more = len(transactions) > self.limit
+        transactions = transactions[:self.limit]
+        return {
+            'transactions': transactions,
+            'total': total,
+            'limit': self.limit,
+            'skip': self.skip,
+            'next_cursor': encode_cursor(transactions[-1]) if has_more and self.sort == 'date' else None,
+            'has_more': has_more
+        }
+
+def parse_summary_request(user_id, args):
+    """(match_stage, period_range, type) of a category summary request (raises ValueError on bad dates).
+    
+    period_range is the whole months the rollups can answer for, or None.
+    """
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    transaction_type = args.get('type')  # Optional: 'income' or 'expense'
+    
+    match_stage = {'user_id': user_id}
+    if start_date or end_date:
+        try:
+            match_stage['date'] = Transaction.date_range_filter(start_date, end_date)
+            period_range = month_period_range(start_date, end_date)
+        except ValueError:
+            raise ValueError('Invalid date filter. Use ISO format')
+    else:
+        period_range = (None, None)
+    if transaction_type:
+        match_stage['type'] = transaction_type
+    return match_stage, period_range, transaction_type
+
 # Get all transactions
 @transactions_bp.route('/', methods=['GET'])
 @authenticate_jwt
@@ -15,55 +249,107 @@ def get_transactions():
         db = get_db()
         user_id = request.user['id']
         
-        # Query parameters for filtering
-        transaction_type = request.args.get('type')  # 'income' or 'expense'
-        category = request.args.get('category')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        limit = int(request.args.get('limit', 100))
-        skip = int(request.args.get('skip', 0))
-        
-        # Build query
-        query = {'user_id': user_id}
-        
-        if transaction_type:
-            query['type'] = transaction_type
-        
-        if category:
-            query['category'] = category
-        
-        if start_date or end_date:
-            query['date'] = {}
-            if start_date:
-                query['date']['$gte'] = start_date
-            if end_date:
-                query['date']['$lte'] = end_date
-        
-        # Execute query
-        transactions = list(
-            db.transactions.find(query)
-            .sort('date', -1)
-            .skip(skip)
-            .limit(limit)
-        )
-        
-        # Convert to JSON
-        for trans in transactions:
-            trans['_id'] = str(trans['_id'])
-        
-        total = db.transactions.count_documents(query)
-        
-        return jsonify({
-            'transactions': transactions,
-            'total': total,
-            'limit': limit,
-            'skip': skip
-        }), 200
+        # Pagination: opaque keyset cursor, or legacy skip
+        try:
+            page = ListRequest(user_id, request.args, legacy=not migrated(db))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Answer polls for unchanged data before touching the transactions
+        etag = make_etag(user_id, get_version(db, user_id), request.path, request.args)
+        if etag_matches(request.if_none_match, etag):
+            return '', 304, cache_headers(etag)
+        
+        if page.sort == 'relevance':
+            transactions = list(db.transactions.aggregate(page.relevance()))
+        else:
+            transactions = list(
+                db.transactions.find(page.live_find_query, page.projection)
+                .sort(LIST_SORT)
+                .skip(page.live_skip)
+                .limit(page.live_limit)
+            )
+        if page.archived:
+            transactions = page.merge_archived(transactions)
+        
+        total = None
+        if page.include_total:
+            total = db.transactions.count_documents(page.live_query) + count_archived(user_id, page.query)
+        
+        return jsonify(page.body(transactions, total)), 200, cache_headers(etag)
     
     except Exception as e:
         print(f"Get transactions error: {e}")
         return jsonify({'error': 'Failed to fetch transactions'}), 500
 
+# Export transactions (streamed NDJSON or CSV)
+@transactions_bp.route('/export', methods=['GET'])
+@authenticate_jwt
+def export_transactions():
+    try:
+        db = get_db()
+        user_id = request.user['id']
+        
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': "Format must be either 'ndjson' or 'csv'"}), 400
+        
+        try:
+            query = build_transaction_query(user_id, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            projection = Transaction.projection(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not any(projection.values()):
+            projection['user_id'] = 0
+        fieldnames = [field for field in EXPORT_FIELDS if 'user_id' in projection or field in projection]
+        live_query = query if migrated(db) else legacy_filter(query)
+        cursor = (
+            db.transactions.find(live_query, projection)
+            .sort(LIST_SORT)
+            .batch_size(Config.EXPORT_BATCH_SIZE)
+        )
+        
+        def generate():
+            # Rows are flushed to the client once per Mongo batch, so only
+            # one batch is ever held in memory
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+            if export_format == 'csv':
+                writer.writeheader()
+            rows = 0
+            try:
+                for trans in with_archived(user_id, query, projection, cursor):
+                    if export_format == 'csv':
+                        writer.writerow(Transaction.to_json(trans))
+                    else:
+                        buffer.write(dumps(trans))
+                        buffer.write('\n')
+                    rows += 1
+                    if rows % Config.EXPORT_BATCH_SIZE == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+            except Exception as e:
+                print(f"Export transactions stream error: {e}")
+            finally:
+                cursor.close()
+        
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        filename = f"transactions.{'csv' if export_format == 'csv' else 'ndjson'}"
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    
+    except Exception as e:
+        print(f"Export transactions error: {e}")
+        return jsonify({'error': 'Failed to export transactions'}), 500
+
 # Get transaction by ID
 @transactions_bp.route('/<transaction_id>', methods=['GET'])
 @authenticate_jwt
@@ -75,12 +361,14 @@ def get_transaction(transaction_id):
         transaction = db.transactions.find_one({
             '_id': ObjectId(transaction_id),
             'user_id': user_id
-        })
+        }, Transaction.HIDDEN_FIELDS)
+        
+        if not transaction:
+            transaction = find_archived_by_id(user_id, ObjectId(transaction_id), Transaction.HIDDEN_FIELDS)
         
         if not transaction:
             return jsonify({'error': 'Transaction not found'}), 404
         
-        transaction['_id'] = str(transaction['_id'])
         return jsonify({'transaction': transaction}), 200
     
     except Exception as e:
@@ -90,42 +378,213 @@ def get_transaction(transaction_id):
 # Create transaction
 @transactions_bp.route('/', methods=['POST'])
 @authenticate_jwt
+@idempotent
 def create_transaction():
     try:
         data = request.get_json()
         user_id = request.user['id']
         
-        # Validate
-        is_valid, error = Transaction.validate_transaction(data)
-        if not is_valid:
-            return jsonify({'error': error}), 400
-        
-        # Create transaction
-        transaction = Transaction.create_transaction(
-            user_id=user_id,
-            transaction_type=data['type'],
-            amount=data['amount'],
-            currency=data['currency'],
-            category=data['category'],
-            date=data['date'],
-            notes=data.get('notes')
-        )
+        # Validate and build the document
+        try:
+            transaction = new_transaction(user_id, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Async mode: journal it and let the ingest worker insert it in a batch
+        if wants_async(request):
+            body, status = enqueue_transaction(transaction, request.path)
+            return jsonify(body), status
         
         # Insert to database
         db = get_db()
         result = db.transactions.insert_one(transaction)
+        record_changes(db, added=[transaction])
         
-        transaction['_id'] = str(result.inserted_id)
-        
-        return jsonify({
-            'message': 'Transaction created successfully',
-            'transaction': transaction
-        }), 201
+        body, status = created_response(transaction, result.inserted_id)
+        return jsonify(body), status
     
     except Exception as e:
         print(f"Create transaction error: {e}")
         return jsonify({'error': 'Failed to create transaction'}), 500
 
+# Status of a transaction created with ?async=1
+@transactions_bp.route('/ingest/<tracking_id>', methods=['GET'])
+@authenticate_jwt
+def get_ingest_status(tracking_id):
+    try:
+        user_id = request.user['id']
+        try:
+            object_id = parse_object_id(tracking_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid tracking id'}), 400
+        
+        known = ingest_queue.status(object_id, user_id)
+        if known:
+            status, reason = known
+        elif get_db().transactions.find_one({'_id': object_id, 'user_id': user_id}, {'_id': 1}):
+            # Queued by another process, or before a restart
+            status, reason = 'inserted', None
+        else:
+            return jsonify({'error': 'Tracking id not found'}), 404
+        
+        body = {'tracking_id': tracking_id, 'status': status}
+        if reason:
+            body['reason'] = reason
+        return jsonify(body), 200
+    
+    except Exception as e:
+        print(f"Get ingest status error: {e}")
+        return jsonify({'error': 'Failed to fetch ingest status'}), 500
+
+def insert_batch(db, documents, line_numbers):
+    """Insert a batch unordered; return the inserted documents and failed rows"""
+    try:
+        db.transactions.insert_many(documents, ordered=False)
+        inserted, failures = documents, []
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        failed_indexes = {write_error['index'] for write_error in write_errors}
+        inserted = [doc for i, doc in enumerate(documents) if i not in failed_indexes]
+        failures = [
+            {
+                'row': line_numbers[write_error['index']],
+                'error': write_error.get('errmsg', 'Write failed')
+            }
+            for write_error in write_errors
+        ]
+    record_changes(db, added=inserted)
+    return len(inserted), failures
+
+# Bulk import transactions (streamed CSV or NDJSON body)
+@transactions_bp.route('/bulk', methods=['POST'])
+@authenticate_jwt
+@idempotent
+def bulk_import_transactions():
+    try:
+        user_id = request.user['id']
+        db = get_db()
+        
+        try:
+            rows = iter_rows(request.stream, request.mimetype)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 415
+        
+        started = time.perf_counter()
+        received = 0
+        inserted = 0
+        failed = 0
+        errors = []
+        batch = []
+        line_numbers = []
+        
+        def record_failures(failures):
+            nonlocal failed
+            failed += len(failures)
+            # Only the first BULK_MAX_ERRORS are kept so memory stays bounded
+            errors.extend(failures[:max(Config.BULK_MAX_ERRORS - len(errors), 0)])
+        
+        def flush():
+            nonlocal inserted
+            count, failures = insert_batch(db, batch, line_numbers)
+            inserted += count
+            record_failures(failures)
+            batch.clear()
+            line_numbers.clear()
+        
+        for line_number, data, error in rows:
+            received += 1
+            
+            if error is None:
+                try:
+                    is_valid, error = Transaction.validate_transaction(data)
+                except (TypeError, AttributeError):
+                    error = 'Invalid field types'
+            
+            if error:
+                record_failures([{'row': line_number, 'error': error}])
+                continue
+            
+            batch.append(build_transaction(user_id, data))
+            line_numbers.append(line_number)
+            
+            if len(batch) >= Config.BULK_BATCH_SIZE:
+                flush()
+        
+        if batch:
+            flush()
+        
+        elapsed = time.perf_counter() - started
+        errors.sort(key=lambda failure: failure['row'])
+        
+        return jsonify({
+            'message': 'Bulk import completed',
+            'received': received,
+            'inserted': inserted,
+            'failed': failed,
+            'errors': errors,
+            'errors_truncated': failed > len(errors),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(received / elapsed, 1) if elapsed > 0 else received
+        }), 200
+    
+    except Exception as e:
+        print(f"Bulk import error: {e}")
+        return jsonify({'error': 'Failed to import transactions'}), 500
+
+def build_update(data):
+    """Build the $set payload for an update request (raises ValueError on bad values)"""
+    update_data = {}
+    if 'amount' in data:
+        try:
+            update_data['amount'] = Transaction.to_amount(data['amount'])
+        except ValueError:
+            raise ValueError('Invalid amount format')
+    if 'currency' in data:
+        update_data['currency'] = data['currency']
+    if 'category' in data:
+        update_data['category'] = data['category']
+    if 'date' in data:
+        try:
+            update_data['date'] = Transaction.parse_date(data['date'])
+        except (TypeError, AttributeError, ValueError):
+            raise ValueError('Invalid date format. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)')
+    if 'notes' in data:
+        update_data['notes'] = data['notes']
+    if 'type' in data:
+        update_data['type'] = data['type']
+    
+    # Truncated to what a BSON date stores, so it compares equal to the value read back
+    now = datetime.utcnow()
+    update_data['updated_at'] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    return update_data
+
+def update_with_search_terms(db, query, update_data):
+    """Apply an update together with its search terms; return the document before it, or None.
+    
+    Terms depending on fields the update leaves unchanged are computed from a
+    read of those fields, and the update only applies if `updated_at` has not
+    moved since, so the terms always match the fields written.
+    """
+    for _ in range(UPDATE_ATTEMPTS):
+        guard = {}
+        current = {}
+        if needs_stored_sources(update_data):
+            current = db.transactions.find_one(query, SEARCH_SOURCE_PROJECTION)
+            if current is None:
+                return None
+            guard = {'updated_at': current.get('updated_at')}
+        search_terms = update_search_terms(current, update_data)
+        changes = update_data if search_terms is None else {**update_data, 'search_terms': search_terms}
+        transaction = db.transactions.find_one_and_update(
+            {**query, **guard},
+            {'$set': changes},
+            projection=Transaction.HIDDEN_FIELDS,
+            return_document=ReturnDocument.BEFORE
+        )
+        if transaction is not None or not guard:
+            return transaction
+    raise UpdateConflict()
+
 # Update transaction
 @transactions_bp.route('/<transaction_id>', methods=['PUT'])
 @authenticate_jwt
@@ -135,41 +594,26 @@ def update_transaction(transaction_id):
         user_id = request.user['id']
         db = get_db()
         
-        # Check ownership
-        transaction = db.transactions.find_one({
-            '_id': ObjectId(transaction_id),
-            'user_id': user_id
-        })
+        # Build update data
+        try:
+            update_data = build_update(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Ownership check and update in one atomic write
+        try:
+            transaction = update_with_search_terms(
+                db, {'_id': ObjectId(transaction_id), 'user_id': user_id}, update_data
+            )
+        except UpdateConflict:
+            return jsonify({'error': CONFLICT_ERROR}), 409
         
         if not transaction:
-            return jsonify({'error': 'Transaction not found'}), 404
+            body, status = missing_response(user_id, ObjectId(transaction_id))
+            return jsonify(body), status
         
-        # Build update data
-        update_data = {}
-        if 'amount' in data:
-            update_data['amount'] = float(data['amount'])
-        if 'currency' in data:
-            update_data['currency'] = data['currency']
-        if 'category' in data:
-            update_data['category'] = data['category']
-        if 'date' in data:
-            update_data['date'] = data['date']
-        if 'notes' in data:
-            update_data['notes'] = data['notes']
-        if 'type' in data:
-            update_data['type'] = data['type']
-        
-        update_data['updated_at'] = datetime.utcnow().isoformat()
-        
-        # Update
-        db.transactions.update_one(
-            {'_id': ObjectId(transaction_id)},
-            {'$set': update_data}
-        )
-        
-        # Get updated transaction
-        updated = db.transactions.find_one({'_id': ObjectId(transaction_id)})
-        updated['_id'] = str(updated['_id'])
+        updated = {**transaction, **update_data}
+        record_changes(db, added=[updated], removed=[transaction])
         
         return jsonify({
             'message': 'Transaction updated successfully',
@@ -188,13 +632,16 @@ def delete_transaction(transaction_id):
         user_id = request.user['id']
         db = get_db()
         
-        result = db.transactions.delete_one({
+        deleted = db.transactions.find_one_and_delete({
             '_id': ObjectId(transaction_id),
             'user_id': user_id
-        })
+        }, projection=ROLLUP_PROJECTION)
         
-        if result.deleted_count == 0:
-            return jsonify({'error': 'Transaction not found'}), 404
+        if not deleted:
+            body, status = missing_response(user_id, ObjectId(transaction_id))
+            return jsonify(body), status
+        
+        record_changes(db, removed=[deleted])
         
         return jsonify({'message': 'Transaction deleted successfully'}), 200
     
@@ -202,58 +649,315 @@ def delete_transaction(transaction_id):
         print(f"Delete transaction error: {e}")
         return jsonify({'error': 'Failed to delete transaction'}), 500
 
-# Get summary by category
-@transactions_bp.route('/summary/by-category', methods=['GET'])
+def parse_object_id(value):
+    """Parse a transaction id from a request body (raises ValueError)"""
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError('Invalid id')
+
+def item_error(value, error):
+    """Per-item error entry of a bulk response"""
+    return {'id': value, 'status': 'error', 'error': error}
+
+def parse_bulk_updates(data):
+    """Normalize a bulk update body; return ({ObjectId: (id, $set payload)}, item errors)"""
+    if isinstance(data.get('updates'), list):
+        items = data['updates']
+    elif isinstance(data.get('ids'), list) and isinstance(data.get('changes'), dict):
+        # Shorthand: the same changes applied to every id
+        items = [{'id': value, 'changes': data['changes']} for value in data['ids']]
+    else:
+        raise ValueError("Body must contain 'updates', or 'ids' and 'changes'")
+    
+    if len(items) > Config.BULK_MUTATION_MAX_ITEMS:
+        raise ValueError(f"At most {Config.BULK_MUTATION_MAX_ITEMS} items per request")
+    
+    updates = {}
+    errors = []
+    for item in items:
+        value = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(item, dict) or not isinstance(item.get('changes'), dict):
+            errors.append(item_error(value, "Each update needs an 'id' and a 'changes' object"))
+            continue
+        try:
+            object_id = parse_object_id(value)
+            update_data = build_update(item['changes'])
+        except ValueError as e:
+            errors.append(item_error(value, str(e)))
+            continue
+        if object_id in updates:
+            errors.append(item_error(value, 'Duplicate id'))
+            continue
+        updates[object_id] = (value, update_data)
+    return updates, errors
+
+def parse_bulk_ids(data):
+    """Parse the ids of a bulk delete body; return ({ObjectId: id}, item errors)"""
+    if not isinstance(data.get('ids'), list):
+        raise ValueError("Body must contain 'ids'")
+    if len(data['ids']) > Config.BULK_MUTATION_MAX_ITEMS:
+        raise ValueError(f"At most {Config.BULK_MUTATION_MAX_ITEMS} items per request")
+    
+    ids = {}
+    errors = []
+    for value in data['ids']:
+        try:
+            object_id = parse_object_id(value)
+        except ValueError as e:
+            errors.append(item_error(value, str(e)))
+            continue
+        if object_id in ids:
+            errors.append(item_error(value, 'Duplicate id'))
+            continue
+        ids[object_id] = value
+    return ids, errors
+
+def fetch_owned(db, user_id, object_ids):
+    """Rollup and search source fields (and updated_at) of the user's transactions among object_ids, by _id"""
+    return {
+        trans['_id']: trans
+        for trans in db.transactions.find(
+            {'_id': {'$in': list(object_ids)}, 'user_id': user_id},
+            {**ROLLUP_PROJECTION, 'notes': 1, 'updated_at': 1}
+        )
+    }
+
+def fetch_updated_at(db, object_ids):
+    """updated_at of the transactions among object_ids that still exist, by _id"""
+    return {
+        trans['_id']: trans.get('updated_at')
+        for trans in db.transactions.find({'_id': {'$in': list(object_ids)}}, {'updated_at': 1})
+    }
+
+def missing_result(value, object_id, archived):
+    """Per-item result of an id that is not live: archived (read-only) or not found"""
+    if object_id in archived:
+        return {'id': value, 'status': 'archived', 'error': ARCHIVED_ERROR}
+    return {'id': value, 'status': 'not_found'}
+
+def bulk_response(message, results):
+    """Summarize per-item results of a bulk mutation"""
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return jsonify({'message': message, 'counts': counts, 'results': results}), 200
+
+# Update many transactions in one bulk write
+@transactions_bp.route('/bulk', methods=['PATCH'])
 @authenticate_jwt
-def get_summary_by_category():
+@idempotent
+def bulk_update_transactions():
     try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        user_id = request.user['id']
         db = get_db()
+        
+        try:
+            updates, results = parse_bulk_updates(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # One read for ownership and the rollup buckets the updates move out of
+        before = fetch_owned(db, user_id, updates.keys())
+        archived = archived_ids(user_id, [object_id for object_id in updates if object_id not in before])
+        operations = []
+        targets = []
+        for object_id, (value, update_data) in updates.items():
+            if object_id not in before:
+                results.append(missing_result(value, object_id, archived))
+                continue
+            search_terms = update_search_terms(before[object_id], update_data)
+            if search_terms is not None:
+                update_data = {**update_data, 'search_terms': search_terms}
+            # Only applies if the document is still the one read above, so the
+            # rollup deltas and search terms computed from it are right
+            operations.append(UpdateOne(
+                {'_id': object_id, 'user_id': user_id, 'updated_at': before[object_id].get('updated_at')},
+                {'$set': update_data}
+            ))
+            targets.append(object_id)
+        
+        failed = {}
+        matched = 0
+        if operations:
+            try:
+                matched = db.transactions.bulk_write(operations, ordered=False).matched_count
+            except BulkWriteError as e:
+                matched = e.details.get('nMatched', 0)
+                failed = {
+                    write_error['index']: write_error.get('errmsg', 'Write failed')
+                    for write_error in e.details.get('writeErrors', [])
+                }
+        
+        # Documents deleted or changed since they were read were not updated;
+        # which ones is only looked up when some operation did not match
+        current = None
+        if matched < len(targets) - len(failed):
+            current = fetch_updated_at(db, targets)
+        
+        added = []
+        removed = []
+        for index, object_id in enumerate(targets):
+            value, update_data = updates[object_id]
+            if index in failed:
+                results.append(item_error(value, failed[index]))
+                continue
+            if current is not None and object_id not in current:
+                results.append({'id': value, 'status': 'not_found'})
+                continue
+            if current is not None and current[object_id] != update_data['updated_at']:
+                results.append(item_error(value, CONFLICT_ERROR))
+                continue
+            removed.append(before[object_id])
+            added.append({**before[object_id], **update_data})
+            results.append({'id': value, 'status': 'updated'})
+        record_changes(db, added=added, removed=removed)
+        
+        return bulk_response('Bulk update completed', results)
+    
+    except Exception as e:
+        print(f"Bulk update error: {e}")
+        return jsonify({'error': 'Failed to update transactions'}), 500
+
+# Delete many transactions in one bulk write
+@transactions_bp.route('/bulk', methods=['DELETE'])
+@authenticate_jwt
+@idempotent
+def bulk_delete_transactions():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         user_id = request.user['id']
+        db = get_db()
         
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        transaction_type = request.args.get('type')  # Optional: 'income' or 'expense'
+        try:
+            ids, results = parse_bulk_ids(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        before = fetch_owned(db, user_id, ids.keys())
+        targets = [object_id for object_id in ids if object_id in before]
+        missing = [object_id for object_id in ids if object_id not in before]
+        archived = archived_ids(user_id, missing)
+        results.extend(missing_result(ids[object_id], object_id, archived) for object_id in missing)
+        
+        failed = {}
+        if targets:
+            try:
+                db.transactions.bulk_write(
+                    [DeleteOne({'_id': object_id, 'user_id': user_id}) for object_id in targets],
+                    ordered=False
+                )
+            except BulkWriteError as e:
+                failed = {
+                    write_error['index']: write_error.get('errmsg', 'Write failed')
+                    for write_error in e.details.get('writeErrors', [])
+                }
         
-        # Build match stage
-        match_stage = {'user_id': user_id}
+        removed = []
+        for index, object_id in enumerate(targets):
+            if index in failed:
+                results.append(item_error(ids[object_id], failed[index]))
+                continue
+            removed.append(before[object_id])
+            results.append({'id': ids[object_id], 'status': 'deleted'})
+        record_changes(db, removed=removed)
         
-        if start_date or end_date:
-            match_stage['date'] = {}
-            if start_date:
-                match_stage['date']['$gte'] = start_date
-            if end_date:
-                match_stage['date']['$lte'] = end_date
+        return bulk_response('Bulk delete completed', results)
+    
+    except Exception as e:
+        print(f"Bulk delete error: {e}")
+        return jsonify({'error': 'Failed to delete transactions'}), 500
+
+def category_summary_pipeline(match_stage, legacy=False):
+    """Pipeline computing category totals over raw transactions (`legacy`: also unmigrated ones)"""
+    return [
+        {'$match': legacy_filter(match_stage) if legacy else match_stage},
+        {
+            '$group': {
+                '_id': '$category',
+                'total': {'$sum': '$amount'},
+                'count': {'$sum': 1},
+                'currency': {'$first': '$currency'}
+            }
+        },
+        {'$sort': {'total': -1}}
+    ]
+
+def format_summary(results):
+    """Shape category aggregation results for the summary response"""
+    summary = []
+    for result in results:
+        summary.append({
+            'category': result['_id'],
+            'total': Transaction.format_amount(result['total']),
+            'count': result['count'],
+            'currency': result['currency']
+        })
+    return summary
+
+# Get summary by category
+@transactions_bp.route('/summary/by-category', methods=['GET'])
+@authenticate_jwt
+def get_summary_by_category():
+    try:
+        db = get_db()
+        user_id = request.user['id']
         
-        if transaction_type:
-            match_stage['type'] = transaction_type
+        try:
+            match_stage, period_range, transaction_type = parse_summary_request(user_id, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Aggregate
-        pipeline = [
-            {'$match': match_stage},
-            {
-                '$group': {
-                    '_id': '$category',
-                    'total': {'$sum': '$amount'},
-                    'count': {'$sum': 1},
-                    'currency': {'$first': '$currency'}
-                }
-            },
-            {'$sort': {'total': -1}}
-        ]
+        etag = make_etag(user_id, get_version(db, user_id), request.path, request.args)
+        if etag_matches(request.if_none_match, etag):
+            return '', 304, cache_headers(etag)
         
-        results = list(db.transactions.aggregate(pipeline))
+        # Whole-month ranges (or no range) are answered from the monthly rollups once they are built
+        if period_range is not None and rollups_ready(db):
+            results = summary_by_category(db, user_id, *period_range, transaction_type=transaction_type)
+            return jsonify({'summary': format_summary(results)}), 200, cache_headers(etag)
         
-        summary = []
-        for result in results:
-            summary.append({
-                'category': result['_id'],
-                'total': result['total'],
-                'count': result['count'],
-                'currency': result['currency']
-            })
+        # Aggregate, adding archived months the range reaches into
+        results = list(db.transactions.aggregate(category_summary_pipeline(match_stage, legacy=not migrated(db))))
+        results = merge_summaries(results, summarize_archived(user_id, match_stage))
         
-        return jsonify({'summary': summary}), 200
+        return jsonify({'summary': format_summary(results)}), 200, cache_headers(etag)
     
     except Exception as e:
         print(f"Get summary error: {e}")
         return jsonify({'error': 'Failed to generate summary'}), 500
+
+# Group-by totals (for callers that do not need individual transactions)
+@transactions_bp.route('/aggregate', methods=['POST'])
+@authenticate_jwt
+def aggregate_transactions():
+    try:
+        db = get_db()
+        user_id = request.user['id']
+        data = request.get_json(silent=True)
+        
+        try:
+            group_by, metrics = parse_aggregate_request(data)
+            query = build_transaction_query(user_id, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Whole months without a search are answered from the monthly rollups once they are built
+        rollup_match = rollup_match_stage(user_id, data, group_by, metrics) if rollups_ready(db) else None
+        if rollup_match is not None:
+            results = list(db.transaction_rollups.aggregate(rollup_aggregate_pipeline(rollup_match, group_by)))
+        else:
+            pipeline = aggregate_pipeline(query, group_by, metrics, legacy=not migrated(db))
+            results = list(db.transactions.aggregate(pipeline))
+            results = merge_aggregates(results, aggregate_archived(user_id, query, group_by, metrics))
+        
+        return jsonify({'buckets': format_buckets(results, group_by, metrics)}), 200
+    
+    except Exception as e:
+        print(f"Aggregate error: {e}")
+        return jsonify({'error': 'Failed to aggregate transactions'}), 500
@@ -0,0 +1,284 @@
+"""Async versions of the hot transaction routes, served by asgi.py.
+
+Each view shares its name with the Flask view in routes/transactions.py, which
+is how asgi.py decides whether a request is handled here or by the WSGI app.
+Request parsing and response building are the helpers of the Flask routes
+(ListRequest, parse_summary_request, new_transaction, ...); only the MongoDB
+calls are written again here. Bulk writes, export and import are served by the
+WSGI app.
+"""
+import asyncio
+from quart import Blueprint, request, jsonify
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from database_async import get_async_db
+from middleware.auth_async import authenticate_jwt_async
+from middleware.idempotency_async import idempotent_async
+from models.transaction import Transaction
+from services.aggregation import (
+    parse_aggregate_request, aggregate_pipeline, rollup_match_stage, rollup_aggregate_pipeline,
+    merge_aggregates, format_buckets
+)
+from services.archive import has_archive, find_archived_by_id, count_archived, summarize_archived, aggregate_archived, merge_summaries
+from routes.transactions import (
+    CONFLICT_ERROR, LIST_SORT, UPDATE_ATTEMPTS, ListRequest, UpdateConflict, build_transaction_query, build_update,
+    category_summary_pipeline, created_response, enqueue_transaction, format_summary, missing_response,
+    new_transaction, parse_summary_request, wants_async
+)
+from services.changes import record_changes_async
+from services.legacy import migrated_async
+from services.rollups import ROLLUP_PROJECTION, rollup_summary_pipeline, rollups_ready_async
+from services.search import SEARCH_SOURCE_PROJECTION, needs_stored_sources, update_search_terms
+from services.versions import get_version_async, make_etag, etag_matches, cache_headers
+
+transactions_async_bp = Blueprint('transactions', __name__)
+
+# Get all transactions
+@transactions_async_bp.route('/', methods=['GET'])
+@authenticate_jwt_async
+async def get_transactions():
+    try:
+        db = get_async_db()
+        user_id = request.user['id']
+        
+        try:
+            page = ListRequest(user_id, request.args, legacy=not await migrated_async(db))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Answer polls for unchanged data before touching the transactions
+        etag = make_etag(user_id, await get_version_async(db, user_id), request.path, request.args)
+        if etag_matches(request.if_none_match, etag):
+            return '', 304, cache_headers(etag)
+        
+        if page.sort == 'relevance':
+            transactions = await db.transactions.aggregate(page.relevance()).to_list(length=page.live_limit)
+        else:
+            transactions = await (
+                db.transactions.find(page.live_find_query, page.projection)
+                .sort(LIST_SORT)
+                .skip(page.live_skip)
+                .limit(page.live_limit)
+                .to_list(length=page.live_limit)
+            )
+        # Archived months are read from disk in a thread and merged in
+        if page.archived:
+            transactions = await asyncio.to_thread(page.merge_archived, transactions)
+        
+        total = None
+        if page.include_total:
+            total = await db.transactions.count_documents(page.live_query)
+            if has_archive(user_id, page.query):
+                total += await asyncio.to_thread(count_archived, user_id, page.query)
+        
+        return jsonify(page.body(transactions, total)), 200, cache_headers(etag)
+    
+    except Exception as e:
+        print(f"Get transactions error: {e}")
+        return jsonify({'error': 'Failed to fetch transactions'}), 500
+
+# Get transaction by ID
+@transactions_async_bp.route('/<transaction_id>', methods=['GET'])
+@authenticate_jwt_async
+async def get_transaction(transaction_id):
+    try:
+        db = get_async_db()
+        user_id = request.user['id']
+        
+        transaction = await db.transactions.find_one({
+            '_id': ObjectId(transaction_id),
+            'user_id': user_id
+        }, Transaction.HIDDEN_FIELDS)
+        
+        if not transaction:
+            transaction = await asyncio.to_thread(
+                find_archived_by_id, user_id, ObjectId(transaction_id), Transaction.HIDDEN_FIELDS
+            )
+        
+        if not transaction:
+            return jsonify({'error': 'Transaction not found'}), 404
+        
+        return jsonify({'transaction': transaction}), 200
+    
+    except Exception as e:
+        print(f"Get transaction error: {e}")
+        return jsonify({'error': 'Failed to fetch transaction'}), 500
+
+# Create transaction
+@transactions_async_bp.route('/', methods=['POST'])
+@authenticate_jwt_async
+@idempotent_async
+async def create_transaction():
+    try:
+        data = await request.get_json()
+        user_id = request.user['id']
+        
+        try:
+            transaction = new_transaction(user_id, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if wants_async(request):
+            body, status = enqueue_transaction(transaction, request.path)
+            return jsonify(body), status
+        
+        db = get_async_db()
+        result = await db.transactions.insert_one(transaction)
+        await record_changes_async(db, added=[transaction])
+        
+        body, status = created_response(transaction, result.inserted_id)
+        return jsonify(body), status
+    
+    except Exception as e:
+        print(f"Create transaction error: {e}")
+        return jsonify({'error': 'Failed to create transaction'}), 500
+
+async def update_with_search_terms(db, query, update_data):
+    """Async counterpart of routes.transactions.update_with_search_terms"""
+    for _ in range(UPDATE_ATTEMPTS):
+        guard = {}
+        current = {}
+        if needs_stored_sources(update_data):
+            current = await db.transactions.find_one(query, SEARCH_SOURCE_PROJECTION)
+            if current is None:
+                return None
+            guard = {'updated_at': current.get('updated_at')}
+        search_terms = update_search_terms(current, update_data)
+        changes = update_data if search_terms is None else {**update_data, 'search_terms': search_terms}
+        transaction = await db.transactions.find_one_and_update(
+            {**query, **guard},
+            {'$set': changes},
+            projection=Transaction.HIDDEN_FIELDS,
+            return_document=ReturnDocument.BEFORE
+        )
+        if transaction is not None or not guard:
+            return transaction
+    raise UpdateConflict()
+
+# Update transaction
+@transactions_async_bp.route('/<transaction_id>', methods=['PUT'])
+@authenticate_jwt_async
+async def update_transaction(transaction_id):
+    try:
+        data = await request.get_json()
+        user_id = request.user['id']
+        db = get_async_db()
+        
+        try:
+            update_data = build_update(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            transaction = await update_with_search_terms(
+                db, {'_id': ObjectId(transaction_id), 'user_id': user_id}, update_data
+            )
+        except UpdateConflict:
+            return jsonify({'error': CONFLICT_ERROR}), 409
+        
+        if not transaction:
+            body, status = await asyncio.to_thread(missing_response, user_id, ObjectId(transaction_id))
+            return jsonify(body), status
+        
+        updated = {**transaction, **update_data}
+        await record_changes_async(db, added=[updated], removed=[transaction])
+        
+        return jsonify({
+            'message': 'Transaction updated successfully',
+            'transaction': updated
+        }), 200
+    
+    except Exception as e:
+        print(f"Update transaction error: {e}")
+        return jsonify({'error': 'Failed to update transaction'}), 500
+
+# Delete transaction
+@transactions_async_bp.route('/<transaction_id>', methods=['DELETE'])
+@authenticate_jwt_async
+async def delete_transaction(transaction_id):
+    try:
+        user_id = request.user['id']
+        db = get_async_db()
+        
+        deleted = await db.transactions.find_one_and_delete({
+            '_id': ObjectId(transaction_id),
+            'user_id': user_id
+        }, projection=ROLLUP_PROJECTION)
+        
+        if not deleted:
+            body, status = await asyncio.to_thread(missing_response, user_id, ObjectId(transaction_id))
+            return jsonify(body), status
+        
+        await record_changes_async(db, removed=[deleted])
+        
+        return jsonify({'message': 'Transaction deleted successfully'}), 200
+    
+    except Exception as e:
+        print(f"Delete transaction error: {e}")
+        return jsonify({'error': 'Failed to delete transaction'}), 500
+
+# Get summary by category
+@transactions_async_bp.route('/summary/by-category', methods=['GET'])
+@authenticate_jwt_async
+async def get_summary_by_category():
+    try:
+        db = get_async_db()
+        user_id = request.user['id']
+        
+        try:
+            match_stage, period_range, transaction_type = parse_summary_request(user_id, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        etag = make_etag(user_id, await get_version_async(db, user_id), request.path, request.args)
+        if etag_matches(request.if_none_match, etag):
+            return '', 304, cache_headers(etag)
+        
+        if period_range is not None and await rollups_ready_async(db):
+            pipeline = rollup_summary_pipeline(user_id, *period_range, transaction_type=transaction_type)
+            results = await db.transaction_rollups.aggregate(pipeline).to_list(length=None)
+        else:
+            pipeline = category_summary_pipeline(match_stage, legacy=not await migrated_async(db))
+            results = await db.transactions.aggregate(pipeline).to_list(length=None)
+            if has_archive(user_id, match_stage):
+                results = merge_summaries(results, await asyncio.to_thread(summarize_archived, user_id, match_stage))
+        
+        return jsonify({'summary': format_summary(results)}), 200, cache_headers(etag)
+    
+    except Exception as e:
+        print(f"Get summary error: {e}")
+        return jsonify({'error': 'Failed to generate summary'}), 500
+
+# Group-by totals
+@transactions_async_bp.route('/aggregate', methods=['POST'])
+@authenticate_jwt_async
+async def aggregate_transactions():
+    try:
+        db = get_async_db()
+        user_id = request.user['id']
+        data = await request.get_json(silent=True)
+        
+        try:
+            group_by, metrics = parse_aggregate_request(data)
+            query = build_transaction_query(user_id, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        rollup_match = None
+        if await rollups_ready_async(db):
+            rollup_match = rollup_match_stage(user_id, data, group_by, metrics)
+        if rollup_match is not None:
+            pipeline = rollup_aggregate_pipeline(rollup_match, group_by)
+            results = await db.transaction_rollups.aggregate(pipeline).to_list(length=None)
+        else:
+            pipeline = aggregate_pipeline(query, group_by, metrics, legacy=not await migrated_async(db))
+            results = await db.transactions.aggregate(pipeline).to_list(length=None)
+            if has_archive(user_id, query):
+                archived = await asyncio.to_thread(aggregate_archived, user_id, query, group_by, metrics)
+                results = merge_aggregates(results, archived)
+        
+        return jsonify({'buckets': format_buckets(results, group_by, metrics)}), 200
+    
+    except Exception as e:
+        print(f"Aggregate error: {e}")
+        return jsonify({'error': 'Failed to aggregate transactions'}), 500
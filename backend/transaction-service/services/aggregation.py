@@ -0,0 +1,155 @@
+"""Group-by aggregation over a user's transactions (POST /transactions/aggregate).
+
+Callers that only need totals (e.g. the analytics service) send the
+dimensions to group by and the metrics to compute, and get one bucket per
+group back instead of every transaction. The whole computation is one
+`$group` pipeline. Requests that only use dimensions and metrics the monthly
+rollups keep, over whole months, read `transaction_rollups` instead once a
+full rebuild has filled it (see services/rollups.py).
+Archived months are merged in like in the other read routes.
+"""
+from decimal import Decimal
+from bson.decimal128 import Decimal128
+from models.transaction import Transaction
+from services.legacy import legacy_filter
+from services.rollups import month_period_range
+
+# Group key expression of each dimension
+DIMENSIONS = {
+    'type': '$type',
+    'category': '$category',
+    'currency': '$currency',
+    'year': {'$year': '$date'},
+    'month': {'$month': '$date'},
+    'day': {'$dayOfMonth': '$date'}
+}
+METRICS = ('sum', 'count', 'min', 'max', 'avg')
+FILTERS = ('type', 'category', 'start_date', 'end_date', 'q')
+
+# What transaction_rollups can answer (it keeps a sum and count per month)
+ROLLUP_DIMENSIONS = ('type', 'category', 'currency', 'year', 'month')
+ROLLUP_METRICS = ('sum', 'count', 'avg')
+
+def _names(data, field, allowed, default):
+    names = data.get(field, default)
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise ValueError(f"'{field}' must be a list of names")
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {field}: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return list(dict.fromkeys(names))
+
+def parse_aggregate_request(data):
+    """Validated (group_by, metrics) of a request body; filters are read by build_transaction_query"""
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    group_by = _names(data, 'group_by', tuple(DIMENSIONS), [])
+    metrics = _names(data, 'metrics', METRICS, ['sum', 'count'])
+    if not metrics:
+        raise ValueError("'metrics' must not be empty")
+    for field in FILTERS:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"'{field}' must be a string")
+    return group_by, metrics
+
+def _dimension(dimension, legacy):
+    expression = DIMENSIONS[dimension]
+    if legacy and isinstance(expression, dict):
+        # Legacy ISO string dates (services/legacy.py) are converted first
+        (operator,) = expression
+        return {operator: {'$toDate': '$date'}}
+    return expression
+
+def aggregate_pipeline(match_stage, group_by, metrics, legacy=False):
+    """Single $group pipeline over raw transactions.
+
+    sum and count are always computed so results can be merged with archived
+    buckets and averaged afterwards. `legacy` also matches and groups
+    documents migrate.py has not converted yet.
+    """
+    group = {
+        '_id': {dimension: _dimension(dimension, legacy) for dimension in group_by} or None,
+        'sum': {'$sum': '$amount'},
+        'count': {'$sum': 1}
+    }
+    for metric in ('min', 'max'):
+        if metric in metrics:
+            group[metric] = {f'${metric}': '$amount'}
+    if legacy:
+        match_stage = legacy_filter(match_stage)
+    return [{'$match': match_stage}, {'$group': group}]
+
+def rollup_match_stage(user_id, data, group_by, metrics):
+    """$match over transaction_rollups answering the request, or None if it needs raw transactions"""
+    if data.get('q') or not set(group_by) <= set(ROLLUP_DIMENSIONS) or not set(metrics) <= set(ROLLUP_METRICS):
+        return None
+    period_range = month_period_range(data.get('start_date'), data.get('end_date'))
+    if period_range is None:
+        return None
+    start_period, end_period = period_range
+    match_stage = {'user_id': user_id, 'count': {'$gt': 0}}
+    if start_period or end_period:
+        match_stage['period'] = {}
+        if start_period:
+            match_stage['period']['$gte'] = start_period
+        if end_period:
+            match_stage['period']['$lte'] = end_period
+    for field in ('type', 'category'):
+        if data.get(field):
+            match_stage[field] = data[field]
+    return match_stage
+
+def rollup_aggregate_pipeline(match_stage, group_by):
+    """Pipeline re-grouping rollup buckets, shaped like aggregate_pipeline results"""
+    return [
+        {'$match': match_stage},
+        {
+            '$group': {
+                '_id': {dimension: f'${dimension}' for dimension in group_by} or None,
+                'sum': {'$sum': '$sum'},
+                'count': {'$sum': '$count'}
+            }
+        }
+    ]
+
+def _decimal(value):
+    return Transaction.to_amount(value).to_decimal()
+
+def merge_aggregates(live, archived):
+    """Combine live and archived aggregation results that share a group"""
+    if not archived:
+        return live
+    merged = {}
+    for result in list(live) + list(archived):
+        key = tuple(sorted((result['_id'] or {}).items()))
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(result)
+            continue
+        current['sum'] = Decimal128(_decimal(current['sum']) + _decimal(result['sum']))
+        current['count'] += result['count']
+        if 'min' in result:
+            current['min'] = min(current['min'], result['min'], key=_decimal)
+        if 'max' in result:
+            current['max'] = max(current['max'], result['max'], key=_decimal)
+    return list(merged.values())
+
+def format_buckets(results, group_by, metrics):
+    """Response buckets: the group's dimension values and the requested metrics, ordered by group"""
+    buckets = []
+    for result in results:
+        if not result['count']:
+            continue
+        bucket = {dimension: (result['_id'] or {}).get(dimension) for dimension in group_by}
+        for metric in metrics:
+            if metric == 'count':
+                bucket['count'] = result['count']
+            elif metric == 'avg':
+                bucket['avg'] = float(_decimal(result['sum']) / Decimal(result['count']))
+            else:
+                bucket[metric] = Transaction.format_amount(Transaction.to_amount(result[metric]))
+        buckets.append(bucket)
+    buckets.sort(key=lambda bucket: tuple(
+        (bucket[dimension] is not None, bucket[dimension]) for dimension in group_by
+    ))
+    return buckets
@@ -0,0 +1,642 @@
+"""Cold-storage archive of closed months.
+
+Old transactions are moved out of MongoDB into one Arrow IPC file per user
+and month (ARCHIVE_DIR/<user>/<YYYY-MM>.arrow), so `transactions` and
+its indexes only hold recent data. A file is written under a temporary name
+and renamed into place; rows are stored newest first.
+
+Reads are transparent. The list, export and summary routes hand their Mongo
+filter to `find_archived`, `count_archived` or `summarize_archived`, which turn
+it into an Arrow filter over the month files overlapping the filter's date
+range, and merge the result with the live rows. For a user without an archive
+this costs one stat() call. Files are uncompressed by default so they are
+memory-mapped and read in place; compressed ones (ARCHIVE_COMPRESSION) are
+decoded whole into memory, and `table_cache` keeps at most ARCHIVE_CACHE_MB
+of tables per process.
+
+Archived transactions are read-only: `find_archived_by_id` serves them by id,
+and the write routes answer 409 for ids `archived_ids` finds. They keep
+counting in the rollups, which archiving does not touch. While a month is
+being moved, its rows briefly exist in both places; list pages drop the
+archived copy of a row that is still live, and the file is rewritten without
+the rows the job could not delete because they changed or were deleted.
+
+Run the job from the command line (ARCHIVE_DIR must be shared by every
+instance of the service):
+    python -m services.archive run [--months 12] [--user USER_ID] [--dry-run]
+    python -m services.archive restore --user USER_ID
+    python -m services.archive status [--user USER_ID]
+"""
+import argparse
+import functools
+import heapq
+import itertools
+import operator
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from urllib.parse import quote, unquote
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+from config import Config
+from models.transaction import Transaction
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Only needed once something has been archived
+    pa = pc = None
+
+FILE_SUFFIX = '.arrow'
+AMOUNT_SCALE = 9  # Decimal places kept for amounts; months with finer amounts stay in MongoDB
+DUPLICATE_KEY = 11000
+COLUMNS = ('_id', 'type', 'amount', 'currency', 'category', 'date', 'notes', 'created_at', 'updated_at', 'search_terms')
+
+COMPARISONS = {'$gte': operator.ge, '$gt': operator.gt, '$lte': operator.le, '$lt': operator.lt}
+
+def date_key(transaction):
+    """Sort key of the (date desc, _id desc) order shared by live and archived rows.
+
+    Legacy string dates (services/legacy.py) come after every BSON date, as MongoDB sorts them.
+    """
+    date = transaction['date']
+    if isinstance(date, str):
+        return False, date, transaction['_id']
+    return True, Transaction.parse_date(date), transaction['_id']
+
+def relevance_key(transaction):
+    """Sort key of sort=relevance (score, then newest first)"""
+    return (transaction['_score'],) + date_key(transaction)
+
+def schema():
+    return pa.schema([
+        ('_id', pa.string()),  # ObjectId hex, which sorts like the ObjectId
+        ('type', pa.string()),
+        ('amount', pa.decimal128(38, AMOUNT_SCALE)),
+        ('currency', pa.string()),
+        ('category', pa.string()),
+        ('date', pa.timestamp('ms')),
+        ('notes', pa.string()),
+        ('created_at', pa.timestamp('ms')),
+        ('updated_at', pa.timestamp('ms')),
+        ('search_terms', pa.list_(pa.string()))
+    ])
+
+# Files
+
+def user_dir(user_id):
+    return os.path.join(Config.ARCHIVE_DIR, quote(str(user_id), safe=''))
+
+def month_path(user_id, period):
+    return os.path.join(user_dir(user_id), f"{period // 100:04d}-{period % 100:02d}{FILE_SUFFIX}")
+
+def period_of(date):
+    return date.year * 100 + date.month
+
+def archived_users():
+    """Ids of the users with an archive directory"""
+    if not os.path.isdir(Config.ARCHIVE_DIR):
+        return []
+    return sorted(unquote(name) for name in os.listdir(Config.ARCHIVE_DIR))
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError('pyarrow is required to read or write the transaction archive')
+
+class ArchiveIndex:
+    """Archived periods per user, listed again only when the directory changes"""
+
+    def __init__(self, max_users=10000):
+        self.max_users = max_users
+        self.entries = OrderedDict()  # user_id -> (directory mtime, periods)
+        self.lock = threading.Lock()
+
+    def periods(self, user_id):
+        path = user_dir(user_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return ()
+        with self.lock:
+            cached = self.entries.get(user_id)
+            if cached and cached[0] == mtime:
+                self.entries.move_to_end(user_id)
+                return cached[1]
+        periods = tuple(sorted(
+            int(name[:4]) * 100 + int(name[5:7])
+            for name in os.listdir(path) if name.endswith(FILE_SUFFIX)
+        ))
+        with self.lock:
+            self.entries[user_id] = (mtime, periods)
+            while len(self.entries) > self.max_users:
+                self.entries.popitem(last=False)
+        return periods
+
+class TableCache:
+    """Recently read month files, revalidated by mtime and size on every use.
+
+    Bounded by the in-memory size of the tables (max_bytes), since a compressed
+    file is decoded whole when it is read.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.tables = OrderedDict()  # path -> ((mtime, size), table)
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """The table stored at path, or None if the file is gone"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self.lock:
+                self._drop(path)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.tables.get(path)
+            if cached and cached[0] == version:
+                self.tables.move_to_end(path)
+                return cached[1]
+        _require_pyarrow()
+        # Uncompressed files are used in place; compressed buffers are decoded here
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        with self.lock:
+            self._drop(path)
+            if table.nbytes <= self.max_bytes:
+                self.tables[path] = (version, table)
+                self.bytes += table.nbytes
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.tables)))
+        return table
+
+    def _drop(self, path):
+        cached = self.tables.pop(path, None)
+        if cached:
+            self.bytes -= cached[1].nbytes
+
+archive_index = ArchiveIndex()
+table_cache = TableCache(Config.ARCHIVE_CACHE_MB * 1024 * 1024)
+
+# Filters
+
+def _arrow_value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return pa.scalar(value, type=pa.timestamp('ms'))
+    return value
+
+def arrow_filter(query):
+    """Arrow expression for the Mongo filters the routes build, or None for no filter.
+
+    `user_id` is implied by the file and `search_terms` is applied by
+    match_search, since Arrow expressions cannot test list membership.
+    """
+    parts = []
+    for field, condition in query.items():
+        if field in ('user_id', 'search_terms'):
+            continue
+        if field in ('$and', '$or'):
+            members = [arrow_filter(member) for member in condition]
+            if field == '$or' and any(member is None for member in members):
+                continue  # One branch matches everything
+            members = [member for member in members if member is not None]
+            if members:
+                parts.append(functools.reduce(operator.and_ if field == '$and' else operator.or_, members))
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                if op not in COMPARISONS:
+                    raise ValueError(f"Unsupported archive filter: {field} {op}")
+                parts.append(COMPARISONS[op](pc.field(field), _arrow_value(value)))
+        else:
+            parts.append(pc.field(field) == _arrow_value(condition))
+    return functools.reduce(operator.and_, parts) if parts else None
+
+def date_bounds(query):
+    """(low, high) limits on `date` set by a filter's top level and its $and members"""
+    low = high = None
+    conditions = [query.get('date')] + [member.get('date') for member in query.get('$and', [])]
+    for condition in conditions:
+        if isinstance(condition, datetime):
+            condition = {'$gte': condition, '$lte': condition}
+        if not isinstance(condition, dict):
+            continue
+        for op, value in condition.items():
+            if op in ('$gte', '$gt'):
+                low = value if low is None else max(low, value)
+            elif op in ('$lte', '$lt'):
+                high = value if high is None else min(high, value)
+    return low, high
+
+def overlapping_periods(user_id, query):
+    """Archived periods of a user that the filter's date range can reach, oldest first"""
+    periods = archive_index.periods(user_id)
+    if not periods:
+        return ()
+    low, high = date_bounds(query)
+    low = period_of(low) if low else None
+    high = period_of(high) if high else None
+    return tuple(
+        period for period in periods
+        if (low is None or period >= low) and (high is None or period <= high)
+    )
+
+def has_archive(user_id, query):
+    """Whether archived months may hold transactions matching the filter"""
+    return bool(overlapping_periods(user_id, query))
+
+def _term_rows(table):
+    terms = table.column('search_terms').combine_chunks()
+    return pc.list_flatten(terms), pc.list_parent_indices(terms)
+
+def match_search(table, words):
+    """Rows whose search_terms contain every word (as in search_filter)"""
+    if table.num_rows == 0:
+        return table
+    flat, rows = _term_rows(table)
+    keep = None
+    for word in words:
+        matched = pc.unique(pc.filter(rows, pc.equal(flat, word)))
+        keep = matched if keep is None else pc.filter(keep, pc.is_in(keep, value_set=matched))
+    return table.take(keep)
+
+def search_scores(table, words):
+    """Number of query words each row contains as a whole word (as in relevance_pipeline)"""
+    scores = [0] * table.num_rows
+    if table.num_rows == 0:
+        return scores
+    flat, rows = _term_rows(table)
+    for word in words:
+        for row in pc.unique(pc.filter(rows, pc.equal(flat, '=' + word))).to_pylist():
+            scores[row] += 1
+    return scores
+
+def _month_table(user_id, period, query, expression):
+    table = table_cache.get(month_path(user_id, period))
+    if table is None:
+        return None
+    if expression is not None:
+        table = table.filter(expression)
+    if 'search_terms' in query:
+        table = match_search(table, query['search_terms']['$all'])
+    return table
+
+def _matching_tables(user_id, query, newest_first=True):
+    """Filtered month tables overlapping the query"""
+    periods = overlapping_periods(user_id, query)
+    if not periods:
+        return
+    _require_pyarrow()
+    expression = arrow_filter(query)
+    for period in (reversed(periods) if newest_first else periods):
+        table = _month_table(user_id, period, query, expression)
+        if table is not None and table.num_rows:
+            yield table
+
+# Rows
+
+def _columns(projection):
+    if any(projection.values()):
+        # Inclusion projection; _id is included unless excluded, as in MongoDB
+        return [column for column in COLUMNS if projection.get(column, 1 if column == '_id' else 0)]
+    return [column for column in COLUMNS if projection.get(column, 1)]
+
+def to_documents(table, user_id, projection=None):
+    """Transaction documents of an archived table, shaped like MongoDB returns them"""
+    projection = projection or {}
+    columns = _columns(projection)
+    with_user = not any(projection.values()) and projection.get('user_id', 1)
+    documents = table.select(columns).to_pylist()
+    for document in documents:
+        if '_id' in document:
+            document['_id'] = ObjectId(document['_id'])
+        if document.get('amount') is not None:
+            document['amount'] = Decimal128(document['amount'])
+        if with_user:
+            document['user_id'] = user_id
+    return documents
+
+def find_archived(user_id, query, projection, limit):
+    """Up to `limit` archived transactions matching a filter, newest first"""
+    documents = []
+    for table in _matching_tables(user_id, query):
+        documents.extend(to_documents(table.slice(0, limit - len(documents)), user_id, projection))
+        if len(documents) >= limit:
+            break
+    return documents
+
+def find_archived_relevant(user_id, query, words, projection, limit):
+    """Up to `limit` archived matches of a search, best first, with their `_score`"""
+    candidates = []
+    for table in _matching_tables(user_id, query):
+        scores = search_scores(table, words)
+        for document, score in zip(to_documents(table, user_id, projection), scores):
+            document['_score'] = score
+            candidates.append(document)
+    return heapq.nlargest(limit, candidates, key=relevance_key)
+
+def iter_archived(user_id, query, projection):
+    """All archived transactions matching a filter, newest first, one month at a time"""
+    for table in _matching_tables(user_id, query):
+        yield from to_documents(table, user_id, projection)
+
+def archived_ids(user_id, object_ids):
+    """The ids among object_ids that are archived for the user.
+
+    An id tells when a transaction was created, not which month it is dated
+    in, so every archived month is searched.
+    """
+    periods = archive_index.periods(user_id)
+    if not periods or not object_ids:
+        return set()
+    _require_pyarrow()
+    wanted = pa.array([str(object_id) for object_id in object_ids], type=pa.string())
+    found = set()
+    for period in periods:
+        table = table_cache.get(month_path(user_id, period))
+        if table is not None:
+            ids = table.column('_id')
+            found.update(pc.filter(ids, pc.is_in(ids, value_set=wanted)).to_pylist())
+    return {ObjectId(value) for value in found}
+
+def find_archived_by_id(user_id, object_id, projection=None):
+    """An archived transaction by id, or None"""
+    periods = archive_index.periods(user_id)
+    if not periods:
+        return None
+    _require_pyarrow()
+    expression = pc.field('_id') == str(object_id)
+    for period in reversed(periods):
+        table = table_cache.get(month_path(user_id, period))
+        if table is None:
+            continue
+        table = table.filter(expression)
+        if table.num_rows:
+            return to_documents(table, user_id, projection)[0]
+    return None
+
+def count_archived(user_id, query):
+    """Number of archived transactions matching a filter"""
+    return sum(table.num_rows for table in _matching_tables(user_id, query))
+
+def summarize_archived(user_id, match_stage):
+    """Category totals of archived transactions, shaped like category_summary_pipeline results"""
+    totals = {}
+    for table in _matching_tables(user_id, match_stage, newest_first=False):
+        grouped = table.group_by('category', use_threads=False).aggregate(
+            [('amount', 'sum'), ('amount', 'count'), ('currency', 'first')]
+        )
+        for row in grouped.to_pylist():
+            total = totals.setdefault(row['category'], [Decimal(0), 0, row['currency_first']])
+            total[0] += row['amount_sum']
+            total[1] += row['amount_count']
+    return [
+        {'_id': category, 'total': Decimal128(total), 'count': count, 'currency': currency}
+        for category, (total, count, currency) in totals.items()
+    ]
+
+# Group dimensions computed from `date` (Arrow has a function of the same name for each)
+DATE_PARTS = ('year', 'month', 'day')
+
+def aggregate_archived(user_id, query, group_by, metrics):
+    """Group totals of archived transactions, shaped like aggregate_pipeline results"""
+    extremes = [metric for metric in ('min', 'max') if metric in metrics]
+    totals = {}
+    for table in _matching_tables(user_id, query, newest_first=False):
+        for dimension in group_by:
+            if dimension in DATE_PARTS:
+                table = table.append_column(dimension, getattr(pc, dimension)(table['date']))
+        if group_by:
+            rows = table.group_by(group_by, use_threads=False).aggregate(
+                [('amount', 'sum'), ('amount', 'count')] + [('amount', metric) for metric in extremes]
+            ).to_pylist()
+        else:
+            amounts = table['amount']
+            rows = [{
+                'amount_sum': pc.sum(amounts).as_py(),
+                'amount_count': len(amounts),
+                **{f'amount_{metric}': getattr(pc, metric)(amounts).as_py() for metric in extremes}
+            }]
+        for row in rows:
+            key = tuple(row[dimension] for dimension in group_by)
+            total = totals.get(key)
+            if total is None:
+                totals[key] = {metric: row[f'amount_{metric}'] for metric in ['sum', 'count'] + extremes}
+                continue
+            total['sum'] += row['amount_sum']
+            total['count'] += row['amount_count']
+            if 'min' in total:
+                total['min'] = min(total['min'], row['amount_min'])
+            if 'max' in total:
+                total['max'] = max(total['max'], row['amount_max'])
+    return [
+        {
+            '_id': dict(zip(group_by, key)) or None,
+            **{metric: Decimal128(value) if metric != 'count' else value for metric, value in total.items()}
+        }
+        for key, total in totals.items()
+    ]
+
+def merge_pages(live, archived, key, skip, count):
+    """One page of live and archived rows in descending key order.
+
+    A row present in both (while its month is being archived) keeps its live copy.
+    """
+    live_ids = {document['_id'] for document in live}
+    archived = [document for document in archived if document['_id'] not in live_ids]
+    page = list(itertools.islice(heapq.merge(live, archived, key=key, reverse=True), skip, skip + count))
+    for document in page:
+        document.pop('_score', None)
+    return page
+
+def merge_summaries(live, archived):
+    """Category totals of live and archived transactions, largest first"""
+    if not archived:
+        return live
+    totals = {result['_id']: dict(result) for result in live}
+    for result in archived:
+        current = totals.get(result['_id'])
+        if current is None:
+            totals[result['_id']] = result
+            continue
+        current['total'] = Decimal128(Transaction.to_amount(current['total']).to_decimal() + result['total'].to_decimal())
+        current['count'] += result['count']
+    return sorted(totals.values(), key=lambda result: result['total'].to_decimal(), reverse=True)
+
+def with_archived(user_id, query, projection, live):
+    """Stream live rows (newest first) with the matching archived ones merged in"""
+    if not has_archive(user_id, query):
+        return live
+    return heapq.merge(live, iter_archived(user_id, query, projection), key=date_key, reverse=True)
+
+def iter_user_documents(user_id=None):
+    """Every archived transaction (of one user, or everyone), for rebuilding the rollups"""
+    for archived_user in ([user_id] if user_id else archived_users()):
+        for period in archive_index.periods(archived_user):
+            table = table_cache.get(month_path(archived_user, period))
+            if table is not None:
+                yield from to_documents(table, archived_user)
+
+# Archiving
+
+def to_table(documents):
+    """Arrow table of transaction documents, newest first"""
+    columns = {column: [] for column in COLUMNS}
+    for document in sorted(documents, key=date_key, reverse=True):
+        amount = Transaction.to_amount(document['amount']).to_decimal()
+        if amount.as_tuple().exponent < -AMOUNT_SCALE:
+            raise ValueError(f"Amount {amount} has more than {AMOUNT_SCALE} decimal places")
+        columns['_id'].append(str(document['_id']))
+        columns['amount'].append(amount)
+        columns['search_terms'].append(document.get('search_terms') or Transaction.search_terms(document))
+        for column in ('type', 'currency', 'category', 'date', 'notes', 'created_at', 'updated_at'):
+            columns[column].append(document.get(column))
+    return pa.Table.from_pydict(columns, schema=schema())
+
+def write_month(user_id, period, documents):
+    """Write (or replace) one month file atomically"""
+    _require_pyarrow()
+    table = to_table(documents).replace_schema_metadata({'user_id': str(user_id), 'period': str(period)})
+    compression = None if Config.ARCHIVE_COMPRESSION == 'none' else Config.ARCHIVE_COMPRESSION
+    os.makedirs(user_dir(user_id), exist_ok=True)
+    path = month_path(user_id, period)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+            writer.write_table(table)
+        sink.flush()
+        os.fsync(sink.fileno())
+    os.replace(temp_path, path)
+    return table.num_rows
+
+def archive_user(db, user_id, cutoff, dry_run=False):
+    """Move a user's transactions dated before cutoff into the archive; return how many moved"""
+    by_period = {}
+    # Dates still stored as strings (not migrated) never match the range and stay live
+    for document in db.transactions.find({'user_id': user_id, 'date': {'$lt': cutoff}}):
+        by_period.setdefault(period_of(document['date']), []).append(document)
+    if dry_run:
+        return sum(len(documents) for documents in by_period.values())
+
+    moved = 0
+    for period, documents in sorted(by_period.items()):
+        existing = table_cache.get(month_path(user_id, period))
+        merged = {document['_id']: document for document in (to_documents(existing, user_id) if existing else [])}
+        merged.update((document['_id'], document) for document in documents)
+        # Written before anything is deleted, so a crash below loses no row
+        try:
+            write_month(user_id, period, merged.values())
+        except ValueError as e:  # Includes pyarrow.ArrowInvalid
+            print(f"Skipped {user_id} {period}: {e}")
+            continue
+        # One delete per row tells exactly which rows this run moved. A row
+        # updated since it was read stays live and is moved by the next run;
+        # a row deleted meanwhile is gone. Neither may stay in the file.
+        skipped = [
+            document['_id'] for document in documents
+            if db.transactions.find_one_and_delete(
+                {'_id': document['_id'], 'updated_at': document.get('updated_at')}, projection={'_id': 1}
+            ) is None
+        ]
+        if skipped:
+            for object_id in skipped:
+                del merged[object_id]
+            write_month(user_id, period, merged.values())
+        moved += len(documents) - len(skipped)
+    return moved
+
+def archive_cutoff(months, now=None):
+    """Start of the oldest month that stays live"""
+    now = now or datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def run_archive(db, months, user_id=None, dry_run=False):
+    """Archive every user's months older than `months`; return (users, transactions)"""
+    cutoff = archive_cutoff(months)
+    if user_id:
+        users = [user_id]
+    else:
+        users = [result['_id'] for result in db.transactions.aggregate([
+            {'$match': {'date': {'$lt': cutoff}}},
+            {'$group': {'_id': '$user_id'}}
+        ], allowDiskUse=True)]
+    moved = 0
+    for user in users:
+        count = archive_user(db, user, cutoff, dry_run)
+        if count:
+            print(f"{'Would archive' if dry_run else 'Archived'} {count} transactions of {user}")
+        moved += count
+    return len(users), moved
+
+def restore_user(db, user_id):
+    """Move a user's archived transactions back into MongoDB; return how many"""
+    restored = 0
+    for period in archive_index.periods(user_id):
+        path = month_path(user_id, period)
+        table = table_cache.get(path)
+        if table is None:
+            continue
+        documents = to_documents(table, user_id)
+        try:
+            db.transactions.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Rows still (or again) live are left as they are
+            if any(error.get('code') != DUPLICATE_KEY for error in e.details.get('writeErrors', [])):
+                raise
+        os.remove(path)
+        restored += len(documents)
+    try:
+        os.rmdir(user_dir(user_id))
+    except OSError:
+        pass
+    return restored
+
+def archive_status(user_id=None):
+    """(user_id, months, transactions, bytes) for each archived user"""
+    status = []
+    for archived_user in ([user_id] if user_id else archived_users()):
+        periods = archive_index.periods(archived_user)
+        rows = size = 0
+        for period in periods:
+            path = month_path(archived_user, period)
+            table = table_cache.get(path)
+            if table is not None:
+                rows += table.num_rows
+                size += os.path.getsize(path)
+        status.append((archived_user, len(periods), rows, size))
+    return status
+
+if __name__ == '__main__':
+    from database import init_db, close_db
+
+    parser = argparse.ArgumentParser(description='Move closed months of transactions to cold storage')
+    parser.add_argument('command', choices=['run', 'restore', 'status'])
+    parser.add_argument('--user', help='Limit to one user id')
+    parser.add_argument('--months', type=int, default=Config.ARCHIVE_AFTER_MONTHS,
+                        help='Months (besides the current one) that stay in MongoDB')
+    parser.add_argument('--dry-run', action='store_true', help='Count what would be archived')
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        for user, months, rows, size in archive_status(args.user):
+            print(f"{user}: {months} months, {rows} transactions, {size / 1024:.0f} KiB")
+        raise SystemExit(0)
+
+    db = init_db()
+    try:
+        if args.command == 'run':
+            users, moved = run_archive(db, args.months, args.user, args.dry_run)
+            print(f"{'Would archive' if args.dry_run else 'Archived'} {moved} transactions of {users} users "
+                  f"dated before {archive_cutoff(args.months):%Y-%m-%d}")
+        else:
+            if not args.user:
+                parser.error('restore needs --user')
+            print(f"Restored {restore_user(db, args.user)} transactions of {args.user}")
+    finally:
+        close_db()
@@ -0,0 +1,40 @@
+import asyncio
+from services.events import outbox_events, publish, record_change
+from services.rollups import apply_rollups, rollup_operations
+from services.versions import bump_versions, bump_versions_async
+
+def changed_users(added, removed):
+    """Ids of the users owning the changed transactions"""
+    return {trans['user_id'] for trans in list(added) + list(removed)}
+
+def record_changes(db, added=(), removed=()):
+    """Propagate committed transaction writes to the rollups, data versions and change events"""
+    apply_rollups(db, added=added, removed=removed)
+    bump_versions(db, changed_users(added, removed))
+    record_change(db, added=added, removed=removed)
+
+async def record_changes_async(db, added=(), removed=()):
+    """Async counterpart of record_changes for the ASGI app (db is a Motor database)"""
+    try:
+        operations = rollup_operations(added, removed)
+        if operations:
+            await db.transaction_rollups.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Rollup update error: {e}")
+    
+    await bump_versions_async(db, changed_users(added, removed))
+    
+    try:
+        events = outbox_events(added, removed)
+        if not events:
+            return
+        await db.transaction_outbox.insert_many(events)
+        # The Redis client is synchronous; keep it off the event loop
+        published = [event['_id'] for event in events if await asyncio.to_thread(publish, event)]
+        if published:
+            await db.transaction_outbox.update_many(
+                {'_id': {'$in': published}},
+                {'$set': {'published': True}}
+            )
+    except Exception as e:
+        print(f"Change event error: {e}")
@@ -0,0 +1,128 @@
+"""Transaction change events for downstream caches.
+
+Every committed write records a compact event per user (`user_id` plus the
+affected `YYYY-MM` periods) in the `transaction_outbox` collection, then
+publishes it to a Redis stream. Events that could not be published right away
+are retried by a background relay, so a Redis outage delays cache invalidation
+instead of losing it.
+"""
+import json
+import threading
+from datetime import datetime, timedelta
+import redis
+from config import Config
+from models.transaction import Transaction
+
+redis_client = None
+_relay_stop = threading.Event()
+_relay_thread = None
+
+def init_events():
+    """Connect to Redis for publishing; without it events stay in the outbox"""
+    global redis_client
+    if not Config.REDIS_URL:
+        print("REDIS_URL not set, change events will not be published")
+        return None
+    try:
+        redis_client = redis.Redis.from_url(Config.REDIS_URL, decode_responses=True)
+        redis_client.ping()
+        print("Connected to Redis for change events")
+    except Exception as e:
+        print(f"Failed to connect to Redis for change events: {e}")
+        redis_client = None
+    return redis_client
+
+def change_events(added=(), removed=()):
+    """Group changed transactions into one event per user with the affected periods"""
+    periods_by_user = {}
+    for trans in list(added) + list(removed):
+        date = Transaction.parse_date(trans['date'])
+        periods_by_user.setdefault(trans['user_id'], set()).add(f"{date.year}-{date.month:02d}")
+    return [
+        {'user_id': user_id, 'periods': sorted(periods)}
+        for user_id, periods in periods_by_user.items()
+    ]
+
+def outbox_events(added=(), removed=()):
+    """Change events ready to be inserted into the outbox"""
+    events = change_events(added, removed)
+    now = datetime.utcnow()
+    for event in events:
+        event.update({'published': False, 'created_at': now})
+    return events
+
+def publish(event):
+    """Publish one event to the stream; return False if Redis is unavailable"""
+    if not redis_client:
+        return False
+    try:
+        redis_client.xadd(
+            Config.EVENTS_STREAM,
+            {'event': json.dumps({'user_id': event['user_id'], 'periods': event['periods']})},
+            maxlen=Config.EVENTS_STREAM_MAXLEN,
+            approximate=True
+        )
+        return True
+    except Exception as e:
+        print(f"Event publish error: {e}")
+        return False
+
+def record_change(db, added=(), removed=()):
+    """Write outbox events for committed changes and try to publish them immediately"""
+    try:
+        events = outbox_events(added, removed)
+        if not events:
+            return
+        db.transaction_outbox.insert_many(events)
+        
+        published = [event['_id'] for event in events if publish(event)]
+        if published:
+            db.transaction_outbox.update_many(
+                {'_id': {'$in': published}},
+                {'$set': {'published': True}}
+            )
+    except Exception as e:
+        # The write itself succeeded; caches fall back to their TTL
+        print(f"Change event error: {e}")
+
+def relay_outbox(db, limit=500):
+    """Publish outbox events that are still pending; return how many were sent"""
+    if not redis_client:
+        return 0
+    # Skip very recent events, their request may still be publishing them
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.OUTBOX_RELAY_INTERVAL)
+    pending = db.transaction_outbox.find(
+        {'published': False, 'created_at': {'$lt': cutoff}}
+    ).sort('created_at', 1).limit(limit)
+    
+    sent = []
+    for event in pending:
+        if not publish(event):
+            break
+        sent.append(event['_id'])
+    if sent:
+        db.transaction_outbox.update_many({'_id': {'$in': sent}}, {'$set': {'published': True}})
+    return len(sent)
+
+def start_relay(get_db):
+    """Run relay_outbox periodically in a daemon thread"""
+    global _relay_thread
+    if not redis_client or _relay_thread:
+        return
+    
+    def run():
+        while not _relay_stop.wait(Config.OUTBOX_RELAY_INTERVAL):
+            try:
+                relay_outbox(get_db())
+            except Exception as e:
+                print(f"Outbox relay error: {e}")
+    
+    _relay_thread = threading.Thread(target=run, name='outbox-relay', daemon=True)
+    _relay_thread.start()
+
+def close_events():
+    """Stop the relay and close the Redis connection"""
+    _relay_stop.set()
+    if redis_client:
+        redis_client.close()
+        print("Change event publisher closed")
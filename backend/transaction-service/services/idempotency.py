@@ -0,0 +1,169 @@
+"""Idempotency keys for transaction creation.
+
+Clients send an `Idempotency-Key` header with POST /transactions/ and the bulk
+endpoints so that retrying after a timeout does not write twice. The first
+request reserves the key, runs, and stores its response under the key. A
+repeat with the same key gets the stored response back without touching the
+transactions.
+
+Keys are scoped per user. Records live in the `idempotency_keys` collection:
+the reservation is an insert on the unique _id, so checking a key costs one
+indexed lookup before the request runs (a repeat is detected by the duplicate
+key error itself). The response is stored with one update by _id after it
+has been sent, so it adds nothing to the client's wait, and a failure there
+is logged without touching the response. The reservation is what turns away a
+retry that arrives while the first request is still running. A TTL
+index on `expires_at` removes old keys. With IDEMPOTENCY_STORE=redis they are
+kept in Redis instead (SET NX EX, then SET).
+
+A reservation expires after IDEMPOTENCY_LOCK_TIMEOUT if its request never
+finished (e.g. the process died), so the key can be retried. A completed
+response is kept for IDEMPOTENCY_TTL.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from config import Config
+from services import events
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+def record_id(user_id, key):
+    """Id of a user's idempotency record"""
+    return f"{user_id}:{key}"
+
+def request_fingerprint(method, path, query_string, body):
+    """Hash of what a key was first used for; a reused key must match it"""
+    digest = hashlib.sha256(f"{method} {path}?".encode('utf-8'))
+    digest.update(query_string)
+    digest.update(b'\n')
+    digest.update(body)
+    return digest.hexdigest()
+
+def stored_response(existing, fingerprint):
+    """(body, status, mimetype, headers) answering a request whose key is already taken"""
+    if existing.get('fingerprint') != fingerprint:
+        body, status, headers = {'error': 'Idempotency-Key was already used for a different request'}, 422, {}
+    elif existing.get('status') != 'done':
+        body, status, headers = {'error': 'A request with this Idempotency-Key is still in progress'}, 409, {'Retry-After': '1'}
+    else:
+        response = existing['response']
+        return response['body'], response['status'], response['mimetype'], {'Idempotent-Replayed': 'true'}
+    return json.dumps(body), status, 'application/json', headers
+
+def _use_redis():
+    return Config.IDEMPOTENCY_STORE == 'redis' and events.redis_client is not None
+
+def _redis_key(record_key):
+    return f"{Config.IDEMPOTENCY_KEY_PREFIX}{record_key}"
+
+def _pending(fingerprint, now):
+    return {
+        'fingerprint': fingerprint,
+        'status': 'pending',
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=Config.IDEMPOTENCY_LOCK_TIMEOUT)
+    }
+
+def _done(fingerprint, status, body, mimetype):
+    return {
+        'fingerprint': fingerprint,
+        'status': 'done',
+        'response': {'status': status, 'body': body, 'mimetype': mimetype},
+        'expires_at': datetime.utcnow() + timedelta(seconds=Config.IDEMPOTENCY_TTL)
+    }
+
+# Redis store (synchronous client shared with change events)
+
+def _reserve_redis(record_key, fingerprint):
+    key = _redis_key(record_key)
+    value = json.dumps({'fingerprint': fingerprint, 'status': 'pending'})
+    for _ in range(2):
+        if events.redis_client.set(key, value, nx=True, ex=Config.IDEMPOTENCY_LOCK_TIMEOUT):
+            return None
+        existing = events.redis_client.get(key)
+        if existing is not None:
+            return json.loads(existing)
+        # Expired between SET and GET; try again
+    return {'fingerprint': fingerprint, 'status': 'pending'}
+
+def _complete_redis(record_key, record):
+    record = {key: value for key, value in record.items() if key != 'expires_at'}
+    events.redis_client.set(_redis_key(record_key), json.dumps(record), ex=Config.IDEMPOTENCY_TTL)
+
+def _release_redis(record_key):
+    events.redis_client.delete(_redis_key(record_key))
+
+# MongoDB store
+
+def reserve(db, record_key, fingerprint):
+    """Reserve a key; return None when reserved, otherwise the record holding it"""
+    if _use_redis():
+        return _reserve_redis(record_key, fingerprint)
+    now = datetime.utcnow()
+    record = _pending(fingerprint, now)
+    try:
+        db.idempotency_keys.insert_one({'_id': record_key, **record})
+        return None
+    except DuplicateKeyError:
+        existing = db.idempotency_keys.find_one({'_id': record_key})
+    if existing is not None and existing['expires_at'] > now:
+        return existing
+    # Expired but not yet removed by the TTL monitor: take it over
+    try:
+        db.idempotency_keys.replace_one({'_id': record_key, 'expires_at': {'$lte': now}}, record, upsert=True)
+        return None
+    except DuplicateKeyError:
+        return db.idempotency_keys.find_one({'_id': record_key}) or record
+
+def complete(db, record_key, fingerprint, status, body, mimetype):
+    """Store the response of a reserved key"""
+    record = _done(fingerprint, status, body, mimetype)
+    if _use_redis():
+        _complete_redis(record_key, record)
+    else:
+        db.idempotency_keys.update_one({'_id': record_key}, {'$set': record})
+
+def release(db, record_key):
+    """Drop a reservation whose request failed, so the client can retry it"""
+    if _use_redis():
+        _release_redis(record_key)
+    else:
+        db.idempotency_keys.delete_one({'_id': record_key, 'status': 'pending'})
+
+async def reserve_async(db, record_key, fingerprint):
+    """Async counterpart of reserve (db is a Motor database)"""
+    if _use_redis():
+        return await asyncio.to_thread(_reserve_redis, record_key, fingerprint)
+    now = datetime.utcnow()
+    record = _pending(fingerprint, now)
+    try:
+        await db.idempotency_keys.insert_one({'_id': record_key, **record})
+        return None
+    except DuplicateKeyError:
+        existing = await db.idempotency_keys.find_one({'_id': record_key})
+    if existing is not None and existing['expires_at'] > now:
+        return existing
+    try:
+        await db.idempotency_keys.replace_one({'_id': record_key, 'expires_at': {'$lte': now}}, record, upsert=True)
+        return None
+    except DuplicateKeyError:
+        return await db.idempotency_keys.find_one({'_id': record_key}) or record
+
+async def complete_async(db, record_key, fingerprint, status, body, mimetype):
+    """Async counterpart of complete"""
+    record = _done(fingerprint, status, body, mimetype)
+    if _use_redis():
+        await asyncio.to_thread(_complete_redis, record_key, record)
+    else:
+        await db.idempotency_keys.update_one({'_id': record_key}, {'$set': record})
+
+async def release_async(db, record_key):
+    """Async counterpart of release"""
+    if _use_redis():
+        await asyncio.to_thread(_release_redis, record_key)
+    else:
+        await db.idempotency_keys.delete_one({'_id': record_key, 'status': 'pending'})
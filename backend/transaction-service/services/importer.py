@@ -0,0 +1,61 @@
+import codecs
+import csv
+import json
+
+CSV_MIMETYPES = ('text/csv', 'application/csv')
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def _iter_lines(stream, chunk_size=64 * 1024):
+    """Yield decoded text lines (newline kept) from a binary stream without reading it all"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _iter_ndjson(stream):
+    for line_number, line in enumerate(_iter_lines(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Invalid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Row must be a JSON object'
+            continue
+        yield line_number, row, None
+
+
+def _iter_csv(stream):
+    reader = csv.DictReader(_iter_lines(stream))
+    for row in reader:
+        # Header is line 1, so data rows start at line 2
+        line_number = reader.line_num
+        if None in row:
+            yield line_number, None, 'Too many columns'
+            continue
+        # Empty cells become missing fields so validation reports them
+        yield line_number, {k: v for k, v in row.items() if v not in (None, '')}, None
+
+
+def iter_rows(stream, mimetype):
+    """Yield (line_number, row, error) tuples from a CSV or NDJSON stream"""
+    if mimetype in CSV_MIMETYPES:
+        return _iter_csv(stream)
+    if mimetype in NDJSON_MIMETYPES:
+        return _iter_ndjson(stream)
+    raise ValueError('Content-Type must be text/csv or application/x-ndjson')
@@ -0,0 +1,298 @@
+"""Write-behind ingestion queue for high-rate transaction creation.
+
+`POST /transactions/?async=1` validates a transaction, appends it to an
+on-disk journal and answers 202 with a tracking id. The tracking id is the
+ObjectId the document will be inserted under. A worker thread flushes the
+queue with one unordered insert_many once INGEST_BATCH_SIZE documents are
+waiting or the oldest one has waited INGEST_FLUSH_INTERVAL_MS, then records
+the changes (rollups, data versions, change events) like the other writes.
+
+Journal: each process appends to its own segment file in INGEST_JOURNAL_DIR
+and holds an exclusive lock on it. Every flush rotates the segment, and the
+old one is deleted once its documents are written. At startup, segments that
+no running process holds are replayed. A document that was already written
+before the crash fails on its pre-assigned _id with a duplicate key error and
+is counted as inserted, so it is never stored twice. Its changes are recorded
+again, since the crash may have come between the insert and recording them;
+only a crash after recording but before the segment is deleted counts it
+twice in the rollups, which `python -m services.rollups check` reports.
+"""
+from collections import OrderedDict
+import glob
+import itertools
+import os
+import threading
+import time
+from bson import json_util
+from pymongo.errors import BulkWriteError
+from config import Config
+from metrics import Metric
+from services.changes import record_changes
+
+try:
+    import fcntl
+except ImportError:  # Windows: segments are not locked, run a single process
+    fcntl = None
+
+DUPLICATE_KEY = 11000
+RETRY_SECONDS = 5  # Pause before retrying a flush that could not reach MongoDB
+
+INGEST_ENQUEUED = Metric('ingest_enqueued_total', 'Transactions accepted by the ingestion queue', ())
+INGEST_INSERTED = Metric('ingest_inserted_total', 'Queued transactions written to MongoDB', ())
+INGEST_FAILED = Metric('ingest_failed_total', 'Queued transactions rejected by MongoDB', ())
+INGEST_DEPTH = Metric('ingest_queue_depth', 'Transactions waiting for the next flush', (), kind='gauge')
+INGEST_FLUSH_SECONDS = Metric('ingest_flush_seconds_total', 'Time spent writing queued batches', ())
+
+class IngestUnavailable(Exception):
+    """The queue cannot accept transactions (disabled, full or shutting down)"""
+
+class IngestQueue:
+    """Journaled in-memory queue drained by a background insert_many worker"""
+
+    def __init__(self, journal_dir, batch_size, flush_interval, max_pending, retention):
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # seconds
+        self.max_pending = max_pending
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.pending = []   # Documents waiting for the next flush
+        self.oldest = None  # When the oldest pending document was queued (monotonic)
+        self.statuses = OrderedDict()  # tracking id -> (user_id, status, error)
+        self.segment = None
+        self.sequence = itertools.count()
+        self.thread = None
+        self.stopping = False
+        self.unwritten = 0  # Documents left journaled when the worker stopped
+
+    # Journal segments
+
+    def _open_segment(self):
+        name = f"{time.time_ns()}-{os.getpid()}-{next(self.sequence)}.journal"
+        segment = open(os.path.join(self.journal_dir, name), 'a', encoding='utf-8')
+        if fcntl:
+            fcntl.flock(segment, fcntl.LOCK_EX)
+        return segment
+
+    def _rotate(self):
+        """Start a new segment; return the previous one, still open and locked"""
+        previous = self.segment
+        self.segment = self._open_segment()
+        return previous
+
+    @staticmethod
+    def _discard(segment):
+        try:
+            os.remove(segment.name)
+        except FileNotFoundError:
+            pass
+        segment.close()
+
+    def _recover(self):
+        """Documents and segments left behind by stopped processes"""
+        documents, segments = [], []
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, '*.journal'))):
+            segment = open(path, 'r', encoding='utf-8')
+            if fcntl:
+                try:
+                    fcntl.flock(segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    segment.close()  # Owned by a running process
+                    continue
+            for line in segment:
+                try:
+                    documents.append(json_util.loads(line))
+                except ValueError:
+                    pass  # Last line cut short by a crash; it was never acknowledged
+            segments.append(segment)
+        return documents, segments
+
+    # Status of tracking ids
+
+    def _set_status(self, document, status, error=None):
+        tracking_id = document['_id']
+        self.statuses[tracking_id] = (document['user_id'], status, error)
+        self.statuses.move_to_end(tracking_id)
+        while len(self.statuses) > self.retention:
+            self.statuses.popitem(last=False)
+
+    def status(self, tracking_id, user_id):
+        """(status, error) of a tracking id known to this process, or None"""
+        with self.lock:
+            entry = self.statuses.get(tracking_id)
+        if entry is None or entry[0] != user_id:
+            return None
+        return entry[1], entry[2]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'running': self.thread is not None and not self.stopping,
+                'pending': len(self.pending),
+                'tracked': len(self.statuses)
+            }
+
+    # Producer side
+
+    def enqueue(self, documents):
+        """Journal documents (with their _id already set) and queue them for insertion"""
+        lines = ''.join(json_util.dumps(document) + '\n' for document in documents)
+        with self.lock:
+            if self.thread is None or self.stopping:
+                raise IngestUnavailable('Async ingestion is not available')
+            if len(self.pending) + len(documents) > self.max_pending:
+                raise IngestUnavailable('Ingestion queue is full, retry later')
+            self.segment.write(lines)
+            self.segment.flush()
+            if Config.INGEST_FSYNC:
+                os.fsync(self.segment.fileno())
+
+            if not self.pending:
+                self.oldest = time.monotonic()
+            self.pending.extend(documents)
+            for document in documents:
+                self._set_status(document, 'queued')
+
+            # Wake the worker to arm its timer, or to flush a full batch
+            if len(self.pending) == len(documents) or len(self.pending) >= self.batch_size:
+                self.wakeup.notify()
+        INGEST_ENQUEUED.add((), len(documents))
+        INGEST_DEPTH.add((), len(documents))
+
+    # Worker side
+
+    def _due(self):
+        return bool(self.pending) and (
+            len(self.pending) >= self.batch_size
+            or time.monotonic() - self.oldest >= self.flush_interval
+        )
+
+    def _write(self, db, documents):
+        """Insert documents unordered and record the outcome of each one"""
+        started = time.perf_counter()
+        try:
+            db.transactions.insert_many(documents, ordered=False)
+            write_errors = {}
+        except BulkWriteError as e:
+            write_errors = {error['index']: error for error in e.details.get('writeErrors', [])}
+
+        # Duplicate _ids were written by an earlier attempt (a failed flush or
+        # a replayed journal) that may not have recorded their changes
+        inserted = [
+            doc for i, doc in enumerate(documents)
+            if i not in write_errors or write_errors[i].get('code') == DUPLICATE_KEY
+        ]
+        record_changes(db, added=inserted)
+
+        failed = 0
+        with self.lock:
+            for document in inserted:
+                self._set_status(document, 'inserted')
+            for index, error in write_errors.items():
+                if error.get('code') != DUPLICATE_KEY:
+                    self._set_status(documents[index], 'failed', error.get('errmsg', 'Write failed'))
+                    failed += 1
+        INGEST_INSERTED.add((), len(documents) - failed)
+        INGEST_FAILED.add((), failed)
+        INGEST_FLUSH_SECONDS.add((), time.perf_counter() - started)
+
+    def _run(self, get_db, documents, segments):
+        # documents/segments: the batch being written and the journal segments holding it
+        retrying = False
+        while True:
+            with self.lock:
+                if retrying:
+                    if not self.stopping:
+                        self.wakeup.wait(RETRY_SECONDS)
+                elif not documents:
+                    while not self.stopping and not self._due():
+                        timeout = None
+                        if self.pending:
+                            timeout = self.flush_interval - (time.monotonic() - self.oldest)
+                        self.wakeup.wait(timeout)
+                if self.pending:
+                    INGEST_DEPTH.add((), -len(self.pending))
+                    documents.extend(self.pending)
+                    self.pending = []
+                    self.oldest = None
+                    segments.append(self._rotate())
+                stopping = self.stopping
+
+            if documents:
+                try:
+                    self._write(get_db(), documents)
+                except Exception as e:
+                    # Keep the batch and its journal segments for the next attempt
+                    print(f"Ingest flush error: {e}")
+                    retrying = True
+                    if stopping:
+                        # Left for replay at the next start
+                        self.unwritten = len(documents)
+                        return
+                    continue
+                for segment in segments:
+                    self._discard(segment)
+                documents, segments = [], []
+                retrying = False
+
+            if stopping:
+                return
+
+    def start(self, get_db):
+        """Replay leftover journal segments and start the flush worker"""
+        if self.thread:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        documents, segments = self._recover()
+        if documents:
+            print(f"Replaying {len(documents)} queued transactions from {len(segments)} journal segments")
+            for document in documents:
+                self._set_status(document, 'queued')
+        else:
+            for segment in segments:
+                self._discard(segment)
+            segments = []
+
+        self.segment = self._open_segment()
+        self.thread = threading.Thread(
+            target=self._run, args=(get_db, documents, segments), name='ingest-worker', daemon=True
+        )
+        self.thread.start()
+
+    def close(self, timeout=None):
+        """Stop accepting transactions and wait for the worker to drain the queue"""
+        with self.lock:
+            if not self.thread or self.stopping:
+                return
+            self.stopping = True
+            self.wakeup.notify()
+        self.thread.join(timeout)
+        with self.lock:
+            left = len(self.pending) + self.unwritten
+        if self.thread.is_alive() or left:
+            # Whatever is left stays in the journal and is replayed at the next start
+            print(f"Ingest queue closed before draining; {left} transactions stay journaled")
+        else:
+            print("Ingest queue drained")
+        if self.segment.tell() == 0:
+            self._discard(self.segment)
+        else:
+            self.segment.close()
+
+ingest_queue = IngestQueue(
+    journal_dir=Config.INGEST_JOURNAL_DIR,
+    batch_size=Config.INGEST_BATCH_SIZE,
+    flush_interval=Config.INGEST_FLUSH_INTERVAL_MS / 1000,
+    max_pending=Config.INGEST_MAX_PENDING,
+    retention=Config.INGEST_STATUS_RETENTION
+)
+
+def start_ingest(get_db):
+    """Start the write-behind worker when async ingestion is enabled"""
+    if Config.INGEST_ENABLED:
+        ingest_queue.start(get_db)
+
+def close_ingest():
+    """Drain the queue before the database connection is closed"""
+    ingest_queue.close(Config.INGEST_DRAIN_TIMEOUT)
@@ -0,0 +1,84 @@
+"""Reads while migrate.py is still converting legacy documents.
+
+Documents written before the switch to native types keep an ISO string date
+and a float amount until migrate.py converts them, which it does in batches
+while the service keeps serving. Until no such document is left (recorded by
+the `legacy_migration` marker), the filters sent to MongoDB also match string
+dates in the requested range (compared as text, which orders ISO dates
+correctly), and keyset pages go on through the string-dated rows, which
+MongoDB sorts after every BSON date. The archive only ever holds converted
+rows and keeps getting the plain filters.
+"""
+from datetime import datetime, time
+from time import monotonic
+
+MIGRATION_MARKER = {'_id': 'legacy_migration'}
+
+LEGACY_FILTER = {
+    '$or': [
+        {'date': {'$type': 'string'}},
+        {'created_at': {'$type': 'string'}},
+        {'updated_at': {'$type': 'string'}},
+        {'amount': {'$type': 'double'}},
+        {'amount': {'$type': 'int'}},
+        {'amount': {'$type': 'long'}},
+        {'search_terms': {'$exists': False}}
+    ]
+}
+
+# How long a "not migrated" answer is trusted before it is checked again
+RECHECK_SECONDS = 30
+
+_migrated = False
+_recheck_at = 0.0
+
+def _remember(is_migrated):
+    global _migrated, _recheck_at
+    _migrated = is_migrated
+    _recheck_at = monotonic() + RECHECK_SECONDS
+    return is_migrated
+
+def mark_if_migrated(db):
+    """Record the marker if no legacy document is left; return whether the database is migrated"""
+    if db.schema_meta.find_one(MIGRATION_MARKER, {'_id': 1}):
+        return True
+    if db.transactions.find_one(LEGACY_FILTER, {'_id': 1}):
+        return False
+    db.schema_meta.update_one(MIGRATION_MARKER, {'$set': {'completed_at': datetime.utcnow()}}, upsert=True)
+    return True
+
+async def mark_if_migrated_async(db):
+    """Async counterpart of mark_if_migrated"""
+    if await db.schema_meta.find_one(MIGRATION_MARKER, {'_id': 1}):
+        return True
+    if await db.transactions.find_one(LEGACY_FILTER, {'_id': 1}):
+        return False
+    await db.schema_meta.update_one(MIGRATION_MARKER, {'$set': {'completed_at': datetime.utcnow()}}, upsert=True)
+    return True
+
+def migrated(db):
+    """Cached mark_if_migrated (the marker is never removed, so True is kept)"""
+    if _migrated or monotonic() < _recheck_at:
+        return _migrated
+    return _remember(mark_if_migrated(db))
+
+async def migrated_async(db):
+    """Async counterpart of migrated"""
+    if _migrated or monotonic() < _recheck_at:
+        return _migrated
+    return _remember(await mark_if_migrated_async(db))
+
+def _text(value):
+    return value.date().isoformat() if value.time() == time() else value.isoformat()
+
+def legacy_filter(query):
+    """`query` with its date range also matching legacy ISO string dates"""
+    date_filter = query.get('date')
+    if not isinstance(date_filter, dict):
+        return query
+    widened = {key: value for key, value in query.items() if key != 'date'}
+    widened['$or'] = [
+        {'date': date_filter},
+        {'date': {op: _text(value) for op, value in date_filter.items()}}
+    ]
+    return widened
@@ -0,0 +1,49 @@
+import base64
+import json
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from models.transaction import Transaction
+
+
+def encode_cursor(transaction):
+    """Encode the (date, _id) sort key of the last returned transaction"""
+    date = Transaction.format_date(transaction['date'])
+    key = [date, str(transaction['_id'])]
+    if isinstance(transaction['date'], str):
+        key.append('legacy')  # Not migrated yet: the date is compared as stored
+    payload = json.dumps(key, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token back into its (date, ObjectId) sort key; legacy dates stay strings"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date, transaction_id, *legacy = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not legacy:
+            date = Transaction.parse_date(date)
+        elif not isinstance(date, str):
+            raise ValueError('Invalid cursor')
+        return date, ObjectId(transaction_id)
+    except (ValueError, TypeError, AttributeError, InvalidId):
+        raise ValueError('Invalid cursor')
+
+
+def after_cursor(date, transaction_id, legacy=False):
+    """Query condition for documents after the cursor in (date desc, _id desc) order.
+
+    With `legacy`, string dates (services/legacy.py), which sort after every
+    BSON date, follow the BSON-dated rows.
+    """
+    # The top-level date bound gives the planner a single index range; the $or
+    # only filters the ties on the cursor's date
+    after = [
+        {'date': {'$lte': date}},
+        {'$or': [
+            {'date': {'$lt': date}},
+            {'_id': {'$lt': transaction_id}}
+        ]}
+    ]
+    if legacy and not isinstance(date, str):
+        after = [{'$or': [{'$and': after}, {'date': {'$type': 'string'}}]}]
+    return {'$and': after}
@@ -0,0 +1,296 @@
+"""Monthly rollups of transaction totals.
+
+`transaction_rollups` holds one document per (user_id, year, month, type,
+category, currency) with the `sum` and `count` of matching transactions. Every
+write path adjusts the affected buckets with `$inc`, so summaries over whole
+months read a few rollup documents instead of scanning transactions.
+
+Existing transactions only get buckets from a full rebuild, which records a
+`rollups` marker in `schema_meta` when it completes. Until then `rollups_ready`
+is false and summaries aggregate the transactions themselves. A rebuild can
+run while the service is serving: it removes the marker while it works,
+replaces buckets in place rather than emptying the collection, and finally
+re-applies the difference left by writes that raced it.
+
+Rebuild or verify the collection from the command line:
+    python -m services.rollups rebuild [--user USER_ID]
+    python -m services.rollups check [--user USER_ID]
+"""
+import argparse
+import calendar
+from datetime import datetime, time
+from time import monotonic
+from decimal import Decimal
+from bson.decimal128 import Decimal128
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from models.transaction import Transaction
+from services.archive import iter_user_documents
+
+KEY_FIELDS = ('user_id', 'period', 'type', 'category', 'currency')
+
+# Fields a transaction needs for its rollup bucket
+ROLLUP_PROJECTION = {'user_id': 1, 'type': 1, 'category': 1, 'currency': 1, 'date': 1, 'amount': 1}
+
+READY_MARKER = {'_id': 'rollups'}
+READY_RECHECK_SECONDS = 30  # How long an answer about the marker is trusted
+
+_ready = False
+_not_ready_until = 0  # Named for the first state it cached; applies to both answers
+
+def _remember_ready(meta):
+    """Cache the marker lookup for READY_RECHECK_SECONDS, so a rebuild that removes it is noticed"""
+    global _ready, _not_ready_until
+    _ready = meta is not None
+    _not_ready_until = monotonic() + READY_RECHECK_SECONDS
+    return _ready
+
+def rollups_ready(db):
+    """Whether a full rebuild has filled the rollups, so summaries may read them"""
+    if monotonic() < _not_ready_until:
+        return _ready
+    return _remember_ready(db.schema_meta.find_one(READY_MARKER, {'_id': 1}))
+
+async def rollups_ready_async(db):
+    """rollups_ready for the async (Motor) database"""
+    if monotonic() < _not_ready_until:
+        return _ready
+    return _remember_ready(await db.schema_meta.find_one(READY_MARKER, {'_id': 1}))
+
+def bucket_key(transaction):
+    """Rollup bucket of a transaction as a tuple of KEY_FIELDS values"""
+    date = Transaction.parse_date(transaction['date'])
+    return (
+        transaction['user_id'],
+        date.year * 100 + date.month,
+        transaction['type'],
+        transaction['category'],
+        transaction['currency']
+    )
+
+def rollup_operations(added=(), removed=()):
+    """Build the $inc upserts for the buckets touched by added and removed transactions"""
+    deltas = {}
+    for transactions, sign in ((added, 1), (removed, -1)):
+        for trans in transactions:
+            key = bucket_key(trans)
+            amount = Transaction.to_amount(trans['amount']).to_decimal()
+            delta = deltas.setdefault(key, [Decimal(0), 0])
+            delta[0] += sign * amount
+            delta[1] += sign
+    
+    operations = []
+    for key, (amount, count) in deltas.items():
+        if amount == 0 and count == 0:
+            continue
+        period = key[1]
+        operations.append(UpdateOne(
+            dict(zip(KEY_FIELDS, key)),
+            {
+                '$inc': {'sum': Decimal128(amount), 'count': count},
+                '$setOnInsert': {'year': period // 100, 'month': period % 100}
+            },
+            upsert=True
+        ))
+    return operations
+
+def apply_rollups(db, added=(), removed=()):
+    """Apply transaction changes to the rollups; failures are logged, not raised"""
+    try:
+        operations = rollup_operations(added, removed)
+        if operations:
+            db.transaction_rollups.bulk_write(operations, ordered=False)
+    except Exception as e:
+        # The request already succeeded; `check` / `rebuild` repair drift
+        print(f"Rollup update error: {e}")
+
+def month_period_range(start_date=None, end_date=None):
+    """Convert a date filter to a (start, end) period range, or None if it is not whole months"""
+    start_period = end_period = None
+    if start_date:
+        start = Transaction.parse_date(start_date)
+        if start.day != 1 or start.time() != time():
+            return None
+        start_period = start.year * 100 + start.month
+    if end_date:
+        # Only a date-only end_date on the last day of a month covers whole months
+        if 'T' in end_date:
+            return None
+        end = Transaction.parse_date(end_date)
+        if end.day != calendar.monthrange(end.year, end.month)[1]:
+            return None
+        end_period = end.year * 100 + end.month
+    return start_period, end_period
+
+def rollup_summary_pipeline(user_id, start_period=None, end_period=None, transaction_type=None):
+    """Pipeline computing category totals from the rollups, shaped like the raw aggregation"""
+    match_stage = {'user_id': user_id, 'count': {'$gt': 0}}
+    if start_period or end_period:
+        match_stage['period'] = {}
+        if start_period:
+            match_stage['period']['$gte'] = start_period
+        if end_period:
+            match_stage['period']['$lte'] = end_period
+    if transaction_type:
+        match_stage['type'] = transaction_type
+    
+    pipeline = [
+        {'$match': match_stage},
+        {
+            '$group': {
+                '_id': '$category',
+                'total': {'$sum': '$sum'},
+                'count': {'$sum': '$count'},
+                'currency': {'$first': '$currency'}
+            }
+        },
+        {'$sort': {'total': -1}}
+    ]
+    return pipeline
+
+def summary_by_category(db, user_id, start_period=None, end_period=None, transaction_type=None):
+    """Category totals from the rollups"""
+    pipeline = rollup_summary_pipeline(user_id, start_period, end_period, transaction_type)
+    return list(db.transaction_rollups.aggregate(pipeline))
+
+def expected_rollups(db, user_id=None):
+    """Recompute every bucket from the transactions collection and the archive"""
+    match_stage = {'user_id': user_id} if user_id else {}
+    pipeline = [
+        {'$match': match_stage},
+        {
+            '$group': {
+                '_id': {
+                    'user_id': '$user_id',
+                    'year': {'$year': '$date'},
+                    'month': {'$month': '$date'},
+                    'type': '$type',
+                    'category': '$category',
+                    'currency': '$currency'
+                },
+                'sum': {'$sum': '$amount'},
+                'count': {'$sum': 1}
+            }
+        }
+    ]
+    buckets = {}
+    for result in db.transactions.aggregate(pipeline, allowDiskUse=True):
+        key = result['_id']
+        bucket = (key['user_id'], key['year'] * 100 + key['month'], key['type'], key['category'], key['currency'])
+        buckets[bucket] = [Transaction.to_amount(result['sum']).to_decimal(), result['count']]
+    # Archived months no longer have live rows but still count in the rollups
+    for trans in iter_user_documents(user_id):
+        total = buckets.setdefault(bucket_key(trans), [Decimal(0), 0])
+        total[0] += trans['amount'].to_decimal()
+        total[1] += 1
+    
+    for key, (amount, count) in buckets.items():
+        bucket = dict(zip(KEY_FIELDS, key))
+        bucket.update({
+            'year': key[1] // 100,
+            'month': key[1] % 100,
+            'sum': Decimal128(amount),
+            'count': count
+        })
+        yield bucket
+
+def _flush(db, operations):
+    if operations:
+        db.transaction_rollups.bulk_write(operations, ordered=False)
+    return []
+
+def _correction(mismatch):
+    """$inc upsert turning a mismatched bucket (see check_rollups) into its expected value"""
+    expected = mismatch['expected'] or (Decimal(0), 0)
+    found = mismatch['found'] or (Decimal(0), 0)
+    period = mismatch['key'][1]
+    return UpdateOne(
+        dict(zip(KEY_FIELDS, mismatch['key'])),
+        {
+            '$inc': {'sum': Decimal128(expected[0] - found[0]), 'count': expected[1] - found[1]},
+            '$setOnInsert': {'year': period // 100, 'month': period % 100}
+        },
+        upsert=True
+    )
+
+def rebuild_rollups(db, user_id=None, batch_size=1000):
+    """Recompute the rollups (for one user, or everyone) in place; return the bucket count.
+
+    Every bucket is replaced by an upsert on its key and buckets with no
+    transactions left are deleted, so the collection is never partly empty
+    and the unique index is never violated. Writes landing while a bucket is
+    recomputed can be overwritten; the catch-up pass at the end applies what
+    they added as $inc. Summaries aggregate the transactions meanwhile, since
+    the ready marker is removed until a rebuild for everyone completes.
+    """
+    was_ready = db.schema_meta.find_one_and_delete(READY_MARKER) is not None
+    _remember_ready(None)
+    
+    stored = {
+        tuple(bucket[f] for f in KEY_FIELDS): bucket['_id']
+        for bucket in db.transaction_rollups.find({'user_id': user_id} if user_id else {}, dict.fromkeys(KEY_FIELDS, 1))
+    }
+    written = 0
+    operations = []
+    for bucket in expected_rollups(db, user_id):
+        key = tuple(bucket[f] for f in KEY_FIELDS)
+        stored.pop(key, None)
+        operations.append(ReplaceOne(dict(zip(KEY_FIELDS, key)), bucket, upsert=True))
+        written += 1
+        if len(operations) >= batch_size:
+            operations = _flush(db, operations)
+    operations.extend(DeleteOne({'_id': bucket_id}) for bucket_id in stored.values())
+    _flush(db, operations)
+    
+    # Re-apply what racing writes added to buckets after they were recomputed
+    _flush(db, [_correction(mismatch) for mismatch in check_rollups(db, user_id)])
+    
+    if user_id is None or was_ready:
+        db.schema_meta.update_one(READY_MARKER, {'$set': {'built_at': datetime.utcnow()}}, upsert=True)
+        _remember_ready(READY_MARKER)
+    return written
+
+def check_rollups(db, user_id=None):
+    """Compare stored rollups with recomputed ones; return a list of mismatches"""
+    stored = {}
+    for bucket in db.transaction_rollups.find({'user_id': user_id} if user_id else {}):
+        if bucket['count'] != 0:
+            stored[tuple(bucket[f] for f in KEY_FIELDS)] = bucket
+    
+    mismatches = []
+    for bucket in expected_rollups(db, user_id):
+        key = tuple(bucket[f] for f in KEY_FIELDS)
+        actual = stored.pop(key, None)
+        expected = (bucket['sum'].to_decimal(), bucket['count'])
+        found = (actual['sum'].to_decimal(), actual['count']) if actual else None
+        if found != expected:
+            mismatches.append({'key': key, 'expected': expected, 'found': found})
+    for key, actual in stored.items():
+        mismatches.append({'key': key, 'expected': None, 'found': (actual['sum'].to_decimal(), actual['count'])})
+    return mismatches
+
+if __name__ == '__main__':
+    from database import init_db, close_db
+    from migrate import mark_if_migrated
+    
+    parser = argparse.ArgumentParser(description='Maintain the monthly transaction rollups')
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--user', help='Limit to one user id')
+    args = parser.parse_args()
+    
+    db = init_db()
+    try:
+        if not mark_if_migrated(db):
+            print("Legacy documents remain; run `python migrate.py` first")
+            raise SystemExit(1)
+        if args.command == 'rebuild':
+            count = rebuild_rollups(db, args.user)
+            print(f"Rebuilt {count} rollup buckets")
+        else:
+            mismatches = check_rollups(db, args.user)
+            for mismatch in mismatches:
+                print(f"Mismatch {mismatch['key']}: expected {mismatch['expected']}, found {mismatch['found']}")
+            print(f"{len(mismatches)} mismatched rollup buckets")
+            if mismatches:
+                raise SystemExit(1)
+    finally:
+        close_db()
@@ -0,0 +1,61 @@
+"""Search over transaction notes and categories.
+
+Each transaction stores `search_terms` (see Transaction.search_terms): every
+prefix of every word of its category and notes, plus the year of its date,
+and an '=word' marker per whole word. A query matches when every query word
+is one of the terms, so "ama" finds "Amazon"; the user_search_date index
+serves the lookup. Relevance ranks transactions by how many query words they
+contain as whole words, then newest first.
+"""
+from models.transaction import Transaction
+
+SORT_OPTIONS = ('date', 'relevance')
+
+# Read before an update when needs_stored_sources(); updated_at guards the write
+SEARCH_SOURCE_PROJECTION = {**{field: 1 for field in Transaction.SEARCH_SOURCE_FIELDS}, 'updated_at': 1}
+
+def query_words(q):
+    """Normalized words of a search query (raises ValueError when nothing is searchable)"""
+    words = [
+        word[:Transaction.SEARCH_MAX_PREFIX]
+        for word in Transaction.search_words(q)
+        if len(word) >= Transaction.SEARCH_MIN_PREFIX
+    ]
+    if not words:
+        raise ValueError(f"Search query needs a word of at least {Transaction.SEARCH_MIN_PREFIX} characters")
+    return list(dict.fromkeys(words))
+
+def search_filter(words):
+    """Filter matching transactions whose terms contain every query word"""
+    return {'search_terms': {'$all': words}}
+
+def needs_stored_sources(update_data):
+    """Whether an update's search_terms depend on stored fields it leaves unchanged"""
+    touched = [field in update_data for field in Transaction.SEARCH_SOURCE_FIELDS]
+    return any(touched) and not all(touched)
+
+def update_search_terms(before, update_data):
+    """search_terms for an update touching category, notes or date, else None"""
+    if not any(field in update_data for field in Transaction.SEARCH_SOURCE_FIELDS):
+        return None
+    return Transaction.search_terms({**before, **update_data})
+
+def relevance_pipeline(find_query, words, projection, skip, limit, keep_score=False):
+    """Aggregation returning one page of matches ordered by relevance, then date.
+    
+    keep_score leaves `_score` in the results, to merge them with archived matches.
+    """
+    exact = ['=' + word for word in words]
+    if keep_score:
+        if any(projection.values()):
+            projection = {**projection, '_score': 1}
+    elif not any(projection.values()):
+        projection = {**projection, '_score': 0}  # Inclusion projections drop it already
+    return [
+        {'$match': find_query},
+        {'$addFields': {'_score': {'$size': {'$setIntersection': ['$search_terms', exact]}}}},
+        {'$sort': {'_score': -1, 'date': -1, '_id': -1}},
+        {'$skip': skip},
+        {'$limit': limit},
+        {'$project': projection}
+    ]
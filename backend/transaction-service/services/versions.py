@@ -0,0 +1,67 @@
+"""Per-user data versions for conditional GETs.
+
+`user_versions` holds one document per user whose `version` is incremented
+after every committed write to that user's transactions. List and summary
+responses carry an ETag built from the version and the request, so a client
+polling with If-None-Match gets a 304 from a single _id lookup instead of a
+re-run query.
+
+The version is read before the transactions are, so a response is never
+tagged with a version newer than the data it contains.
+"""
+import hashlib
+from datetime import datetime
+from pymongo import UpdateOne
+from werkzeug.http import quote_etag, unquote_etag
+
+def version_operations(user_ids):
+    """$inc upserts bumping the version of each user"""
+    now = datetime.utcnow()
+    return [
+        UpdateOne({'_id': user_id}, {'$inc': {'version': 1}, '$set': {'updated_at': now}}, upsert=True)
+        for user_id in sorted(set(user_ids))
+    ]
+
+def bump_versions(db, user_ids):
+    """Invalidate the ETags of the given users"""
+    try:
+        operations = version_operations(user_ids)
+        if operations:
+            db.user_versions.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Data version update error: {e}")
+
+async def bump_versions_async(db, user_ids):
+    """Async counterpart of bump_versions (db is a Motor database)"""
+    try:
+        operations = version_operations(user_ids)
+        if operations:
+            await db.user_versions.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Data version update error: {e}")
+
+def version_of(document):
+    """Version stored in a user_versions document"""
+    return document['version'] if document else 0
+
+def get_version(db, user_id):
+    """Current data version of a user (0 before their first write)"""
+    return version_of(db.user_versions.find_one({'_id': user_id}, {'version': 1}))
+
+async def get_version_async(db, user_id):
+    """Async counterpart of get_version"""
+    return version_of(await db.user_versions.find_one({'_id': user_id}, {'version': 1}))
+
+def make_etag(user_id, version, path, args):
+    """Quoted weak ETag for a user's data version and the request path and query"""
+    request_key = '\n'.join([str(user_id), path] + [f"{key}={value}" for key, value in sorted(args.items(multi=True))])
+    digest = hashlib.sha256(request_key.encode('utf-8')).hexdigest()[:16]
+    return quote_etag(f"{version}-{digest}", weak=True)
+
+def etag_matches(if_none_match, etag):
+    """Whether a request's If-None-Match (werkzeug ETags) covers the ETag"""
+    return if_none_match.contains_weak(unquote_etag(etag)[0])
+
+def cache_headers(etag):
+    """Response headers making clients revalidate with If-None-Match"""
+    return {'ETag': etag, 'Cache-Control': 'private, no-cache'}
@@ -0,0 +1,77 @@
+from conftest import auth_headers
+from services import archive
+
+HEADERS = auth_headers('user-1')
+
+def create(client, date, amount='10'):
+    response = client.post('/transactions/', json={
+        'type': 'expense', 'amount': amount, 'currency': 'USD', 'category': 'Food', 'date': date
+    }, headers=HEADERS)
+    assert response.status_code == 201
+    return response.get_json()['transaction']['_id']
+
+def test_archived_transactions_are_read_only(client, db):
+    old_ids = [create(client, '2020-01-15'), create(client, '2020-02-10')]
+    live_id = create(client, '2099-01-01')
+    assert archive.run_archive(db, 12) == (1, 2)
+    
+    response = client.get(f'/transactions/{old_ids[0]}', headers=HEADERS)
+    assert response.status_code == 200
+    assert response.get_json()['transaction']['_id'] == old_ids[0]
+    assert 'search_terms' not in response.get_json()['transaction']
+    assert client.get(f'/transactions/{old_ids[0]}', headers=auth_headers('user-2')).status_code == 404
+    
+    assert client.put(f'/transactions/{old_ids[0]}', json={'amount': '5'}, headers=HEADERS).status_code == 409
+    assert client.delete(f'/transactions/{old_ids[1]}', headers=HEADERS).status_code == 409
+    
+    unknown = '507f1f77bcf86cd799439011'
+    response = client.patch('/transactions/bulk', json={
+        'ids': [old_ids[0], live_id, unknown], 'changes': {'notes': 'x'}
+    }, headers=HEADERS)
+    assert response.get_json()['counts'] == {'archived': 1, 'updated': 1, 'not_found': 1}
+    response = client.delete('/transactions/bulk', json={'ids': [old_ids[1], unknown]}, headers=HEADERS)
+    assert response.get_json()['counts'] == {'archived': 1, 'not_found': 1}
+    
+    # Still archived and unchanged
+    assert client.get('/transactions/?start_date=2020-01-01&end_date=2020-12-31', headers=HEADERS).get_json()['total'] == 2
+
+def test_table_cache_is_bounded_by_bytes(client, db):
+    for month in range(1, 5):
+        create(client, f'2020-{month:02d}-15')
+    archive.run_archive(db, 12)
+    paths = [archive.month_path('user-1', 202000 + month) for month in range(1, 5)]
+    size = archive.table_cache.get(paths[0]).nbytes
+    
+    cache = archive.TableCache(max_bytes=size * 2)
+    for path in paths:
+        assert cache.get(path).num_rows == 1
+    assert len(cache.tables) == 2 and cache.bytes <= size * 2
+    assert list(cache.tables) == paths[2:]
+
+def test_rows_changed_while_archiving_are_not_kept_in_the_file(client, db, monkeypatch):
+    ids = [create(client, '2020-01-15', amount) for amount in ('10', '20', '30')]
+    write_month = archive.write_month
+    calls = []
+    
+    def write_then_race(*args):
+        # After the file is written and before the rows are deleted, one row is
+        # updated and one is deleted by their owner
+        calls.append(write_month(*args))
+        if len(calls) == 1:
+            assert client.put(f'/transactions/{ids[1]}', json={'notes': 'edited'}, headers=HEADERS).status_code == 200
+            assert client.delete(f'/transactions/{ids[2]}', headers=HEADERS).status_code == 200
+        return calls[-1]
+    monkeypatch.setattr(archive, 'write_month', write_then_race)
+    
+    assert archive.run_archive(db, 12) == (1, 1)
+    assert calls == [3, 1]
+    assert archive.archived_ids('user-1', [archive.ObjectId(i) for i in ids]) == {archive.ObjectId(ids[0])}
+    
+    response = client.get('/transactions/?start_date=2020-01-01&end_date=2020-01-31', headers=HEADERS).get_json()
+    assert response['total'] == 2
+    assert sorted(t['_id'] for t in response['transactions']) == sorted(ids[:2])
+    summary = client.get('/transactions/summary/by-category?start_date=2020-01-01&end_date=2020-01-31',
+                         headers=HEADERS).get_json()['summary']
+    assert [(row['total'], row['count']) for row in summary] == [(30.0, 2)]
+    assert client.delete(f'/transactions/{ids[1]}', headers=HEADERS).status_code == 200
+    assert client.get(f'/transactions/{ids[1]}', headers=HEADERS).status_code == 404
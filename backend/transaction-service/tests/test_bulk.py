@@ -0,0 +1,33 @@
+from bson.objectid import ObjectId
+from conftest import auth_headers
+from services import rollups
+import routes.transactions as transactions
+
+HEADERS = auth_headers('user-1')
+
+def create(client, category):
+    response = client.post('/transactions/', json={
+        'type': 'expense', 'amount': '10', 'currency': 'USD', 'category': category, 'date': '2026-02-11'
+    }, headers=HEADERS)
+    return response.get_json()['transaction']['_id']
+
+def test_bulk_update_only_records_operations_that_matched(client, db, monkeypatch):
+    ids = [create(client, 'Food') for _ in range(3)]
+    fetch_owned = transactions.fetch_owned
+    
+    def fetch_then_race(*args):
+        # Between the read and the bulk write, one document is deleted and one is changed
+        before = fetch_owned(*args)
+        client.delete(f'/transactions/{ids[1]}', headers=HEADERS)
+        client.put(f'/transactions/{ids[2]}', json={'amount': '20'}, headers=HEADERS)
+        return before
+    monkeypatch.setattr(transactions, 'fetch_owned', fetch_then_race)
+    
+    response = client.patch('/transactions/bulk', json={'ids': ids, 'changes': {'category': 'Travel'}}, headers=HEADERS)
+    results = {result['id']: result for result in response.get_json()['results']}
+    assert results[ids[0]]['status'] == 'updated'
+    assert results[ids[1]]['status'] == 'not_found'
+    assert results[ids[2]] == {'id': ids[2], 'status': 'error', 'error': transactions.CONFLICT_ERROR}
+    
+    assert db.transactions.find_one({'_id': ObjectId(ids[2])})['category'] == 'Food'
+    assert rollups.check_rollups(db) == []
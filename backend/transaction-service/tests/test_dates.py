@@ -0,0 +1,64 @@
+import pytest
+from datetime import datetime
+from conftest import auth_headers
+from migrate import mark_if_migrated, migrate, require_migrated
+from models.transaction import Transaction
+from services import archive
+
+HEADERS = auth_headers('user-1')
+
+def test_format_date_keeps_date_only_values():
+    assert Transaction.format_date(datetime(2026, 2, 11)) == '2026-02-11'
+    assert Transaction.format_date(datetime(2026, 2, 11, 10, 30)) == '2026-02-11T10:30:00Z'
+    assert Transaction.format_date(datetime(2026, 2, 11, 0, 0, 0, 5000)) == '2026-02-11T00:00:00.005Z'
+
+def test_date_only_round_trip(client):
+    response = client.post('/transactions/', json={
+        'type': 'expense', 'amount': '4', 'currency': 'USD', 'category': 'Food', 'date': '2026-02-11'
+    }, headers=HEADERS)
+    transaction_id = response.get_json()['transaction']['_id']
+    assert response.get_json()['transaction']['date'] == '2026-02-11'
+    assert client.get(f'/transactions/{transaction_id}', headers=HEADERS).get_json()['transaction']['date'] == '2026-02-11'
+
+def test_startup_requires_migration(db):
+    db.transactions.insert_one({
+        'user_id': 'user-1', 'type': 'expense', 'amount': 4.5, 'currency': 'USD',
+        'category': 'Food', 'date': '2026-02-11', 'created_at': '2026-02-11T10:00:00', 'updated_at': '2026-02-11T10:00:00'
+    })
+    with pytest.raises(RuntimeError):
+        require_migrated(db)
+    
+    assert migrate(db, batch_size=10) == (1, 0)
+    assert mark_if_migrated(db)
+    require_migrated(db)
+    assert db.schema_meta.find_one({'_id': 'legacy_migration'})
+
+def test_legacy_documents_are_served_until_migrated(client, db):
+    db.transactions.insert_one({
+        'user_id': 'user-1', 'type': 'expense', 'amount': 4.5, 'currency': 'USD',
+        'category': 'Food', 'date': '2026-02-11', 'created_at': '2026-02-11T10:00:00', 'updated_at': '2026-02-11T10:00:00'
+    })
+    for day in ('2026-02-20', '2026-02-05', '2026-03-02', '2020-05-01'):
+        client.post('/transactions/', json={
+            'type': 'expense', 'amount': '2', 'currency': 'USD', 'category': 'Food', 'date': day
+        }, headers=HEADERS)
+    assert archive.run_archive(db, 12) == (1, 1)
+    
+    listed = client.get('/transactions/?start_date=2026-02-01&end_date=2026-02-28', headers=HEADERS).get_json()
+    assert [t['date'] for t in listed['transactions']] == ['2026-02-20', '2026-02-05', '2026-02-11']
+    assert listed['total'] == 3
+    
+    # Keyset pages go on through the string-dated row after the BSON-dated and archived ones
+    dates, url = [], '/transactions/?limit=1&include_total=false'
+    while url:
+        page = client.get(url, headers=HEADERS).get_json()
+        dates += [t['date'] for t in page['transactions']]
+        url = page['next_cursor'] and f"/transactions/?limit=1&include_total=false&cursor={page['next_cursor']}"
+    assert dates == ['2026-03-02', '2026-02-20', '2026-02-05', '2020-05-01', '2026-02-11']
+    
+    summary = client.get('/transactions/summary/by-category?start_date=2026-02-01&end_date=2026-02-28', headers=HEADERS)
+    assert [(s['total'], s['count']) for s in summary.get_json()['summary']] == [(8.5, 3)]
+    
+    assert migrate(db, batch_size=10) == (1, 0)
+    listed = client.get('/transactions/?start_date=2026-02-01&end_date=2026-02-28', headers=HEADERS).get_json()
+    assert [t['date'] for t in listed['transactions']] == ['2026-02-20', '2026-02-11', '2026-02-05']
@@ -0,0 +1,36 @@
+from conftest import auth_headers
+from middleware import idempotency
+
+HEADERS = {**auth_headers('user-1'), 'Idempotency-Key': 'retry-1'}
+BODY = {'type': 'expense', 'amount': '4', 'currency': 'USD', 'category': 'Food', 'date': '2026-02-11'}
+
+def test_retry_returns_the_stored_response(client, db):
+    first = client.post('/transactions/', json=BODY, headers=HEADERS)
+    assert first.status_code == 201
+    # Stored once the response is closed, after the client has it
+    assert db.idempotency_keys.find_one()['status'] == 'pending'
+    first.close()
+    
+    retry = client.post('/transactions/', json=BODY, headers=HEADERS)
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert db.transactions.count_documents({}) == 1
+    
+    reused = client.post('/transactions/', json={**BODY, 'amount': '5'}, headers=HEADERS)
+    assert reused.status_code == 422
+
+def test_failed_store_keeps_the_response(client, db, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('store unavailable')
+    monkeypatch.setattr(idempotency, 'complete', fail)
+    
+    first = client.post('/transactions/', json=BODY, headers=HEADERS)
+    first.close()
+    assert first.status_code == 201
+    assert first.get_json()['transaction']['category'] == 'Food'
+    
+    # The key stays reserved, so a retry is turned away instead of inserting again
+    retry = client.post('/transactions/', json=BODY, headers=HEADERS)
+    assert retry.status_code == 409
+    assert db.transactions.count_documents({}) == 1
@@ -0,0 +1,32 @@
+import indexes
+from config import Config
+
+def test_sync_updates_changed_index_options(db, monkeypatch):
+    assert indexes.sync_indexes(db)[0]
+    assert indexes.sync_indexes(db) == ([], [], [])
+    assert indexes.sync_in_background(db) is None
+    
+    commands = []
+    monkeypatch.setattr(type(db), 'command', lambda self, *args, **kwargs: commands.append((args, kwargs)))
+    outbox = indexes.INDEXES['transaction_outbox'][0]
+    rollups = indexes.INDEXES['transaction_rollups'][0]
+    monkeypatch.setitem(outbox, 'expireAfterSeconds', Config.OUTBOX_RETENTION * 2)
+    monkeypatch.delitem(rollups, 'unique')
+    
+    created, modified, dropped = indexes.sync_indexes(db)
+    # The TTL is changed in place, the unique flag needs a new index
+    assert modified == ['transaction_outbox.created_at_ttl']
+    assert commands == [(('collMod', 'transaction_outbox'),
+                         {'index': {'name': 'created_at_ttl', 'expireAfterSeconds': Config.OUTBOX_RETENTION * 2}})]
+    assert created == ['transaction_rollups.user_period_bucket']
+    assert not db.transaction_rollups.index_information()['user_period_bucket'].get('unique')
+    assert dropped == []
+
+def test_changed_declarations_trigger_a_background_sync(db, monkeypatch):
+    indexes.sync_indexes(db)
+    monkeypatch.setitem(indexes.INDEXES['transaction_outbox'][0], 'expireAfterSeconds', 60)
+    monkeypatch.setattr(type(db), 'command', lambda self, *args, **kwargs: None)
+    thread = indexes.sync_in_background(db)
+    assert thread is not None
+    thread.join(5)
+    assert db.schema_meta.find_one({'_id': 'indexes'})['fingerprint'] == indexes.declared_fingerprint()
@@ -0,0 +1,28 @@
+import os
+from bson import json_util
+from bson.objectid import ObjectId
+from database import get_db
+from models.transaction import Transaction
+from services import rollups
+from services.ingest import IngestQueue
+
+def test_replay_records_documents_written_before_the_crash(db, tmp_path):
+    documents = []
+    for amount in ('10', '15'):
+        document = Transaction.create_transaction('user-1', 'expense', amount, 'USD', 'Food', '2026-02-11')
+        document['_id'] = ObjectId()
+        documents.append(document)
+    # The first one was inserted, then the process died before recording its changes
+    db.transactions.insert_one(dict(documents[0]))
+    with open(os.path.join(tmp_path, '1-1-0.journal'), 'w', encoding='utf-8') as segment:
+        segment.writelines(json_util.dumps(document) + '\n' for document in documents)
+    
+    queue = IngestQueue(str(tmp_path), batch_size=100, flush_interval=0.01, max_pending=100, retention=100)
+    queue.start(get_db)
+    queue.close(timeout=5)
+    
+    assert db.transactions.count_documents({}) == 2
+    assert [queue.status(document['_id'], 'user-1') for document in documents] == [('inserted', None)] * 2
+    assert rollups.check_rollups(db) == []
+    assert db.user_versions.find_one({'_id': 'user-1'})['version'] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('1-1-0')]
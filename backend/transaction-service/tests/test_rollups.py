@@ -0,0 +1,109 @@
+import random
+from conftest import auth_headers
+from services import rollups
+
+HEADERS = auth_headers('user-1')
+QUERIES = [
+    '',
+    '?start_date=2025-01-01&end_date=2025-12-31',
+    '?start_date=2025-03-01&end_date=2025-03-31&type=expense',
+    '?start_date=2025-02-10&end_date=2025-05-20'
+]
+AGGREGATES = [
+    {'group_by': ['type', 'category', 'currency']},
+    {'group_by': ['year', 'month', 'type'], 'metrics': ['sum', 'count', 'avg'],
+     'start_date': '2025-01-01', 'end_date': '2025-06-30'},
+    {'group_by': ['category'], 'type': 'income', 'start_date': '2025-04-01', 'end_date': '2025-04-30'}
+]
+
+def write_transactions(client):
+    rng = random.Random(7)
+    ids = []
+    for _ in range(60):
+        response = client.post('/transactions/', json={
+            'type': rng.choice(['income', 'expense']),
+            'amount': str(round(rng.uniform(1, 300), 2)),
+            'currency': rng.choice(['USD', 'EUR']),
+            'category': rng.choice(['Rent', 'Food', 'Travel']),
+            'date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00"
+        }, headers=HEADERS)
+        assert response.status_code == 201
+        ids.append(response.get_json()['transaction']['_id'])
+    # Moves between buckets and months, and removals
+    for transaction_id in ids[:10]:
+        client.put(f'/transactions/{transaction_id}', json={'amount': '12.5', 'date': '2025-03-15'}, headers=HEADERS)
+    for transaction_id in ids[10:15]:
+        client.delete(f'/transactions/{transaction_id}', headers=HEADERS)
+    response = client.patch('/transactions/bulk', json={'ids': ids[15:20], 'changes': {'category': 'Food'}}, headers=HEADERS)
+    assert response.get_json()['counts'] == {'updated': 5}
+    response = client.delete('/transactions/bulk', json={'ids': ids[20:25]}, headers=HEADERS)
+    assert response.get_json()['counts'] == {'deleted': 5}
+
+def read_all(client):
+    summaries = [client.get(f'/transactions/summary/by-category{query}', headers=HEADERS).get_json()
+                 for query in QUERIES]
+    aggregates = [client.post('/transactions/aggregate', json=body, headers=HEADERS).get_json()
+                  for body in AGGREGATES]
+    return summaries, aggregates
+
+def normalized(responses):
+    summaries, aggregates = responses
+    rounded = lambda value: round(value, 6) if isinstance(value, float) else value
+    return (
+        [sorted((row['category'], rounded(row['total']), row['count']) for row in summary['summary'])
+         for summary in summaries],
+        [[{key: rounded(value) for key, value in bucket.items()} for bucket in aggregate['buckets']]
+         for aggregate in aggregates]
+    )
+
+def test_rollups_match_raw_aggregation(client, db):
+    write_transactions(client)
+    assert rollups.check_rollups(db) == []
+    
+    # Not built yet: everything is aggregated from the transactions
+    assert not rollups.rollups_ready(db)
+    raw = read_all(client)
+    
+    rollups.rebuild_rollups(db)
+    assert rollups.rollups_ready(db)
+    assert normalized(read_all(client)) == normalized(raw)
+
+def test_rollups_not_used_until_rebuilt(client, db):
+    write_transactions(client)
+    raw = read_all(client)
+    # Buckets written before the rollups existed are missing until a rebuild
+    db.transaction_rollups.delete_many({})
+    assert normalized(read_all(client)) == normalized(raw)
+    
+    rollups.rebuild_rollups(db, user_id='user-1')
+    assert not rollups.rollups_ready(db)
+    rollups.rebuild_rollups(db)
+    assert normalized(read_all(client)) == normalized(raw)
+
+def test_rebuild_while_writes_continue(client, db, monkeypatch):
+    write_transactions(client)
+    rollups.rebuild_rollups(db)
+    expected_rollups = rollups.expected_rollups
+    observed = []
+    
+    def expected_then_write(*args):
+        # Writes land while the buckets are being recomputed
+        observed.append(db.schema_meta.find_one({'_id': 'rollups'}))
+        for bucket in expected_rollups(*args):
+            yield bucket
+            if len(observed) == 1:
+                observed.append(client.post('/transactions/', json={
+                    'type': 'expense', 'amount': '7.5', 'currency': 'USD', 'category': 'Rent', 'date': '2025-03-02'
+                }, headers=HEADERS).status_code)
+    monkeypatch.setattr(rollups, 'expected_rollups', expected_then_write)
+    
+    assert rollups.rebuild_rollups(db) > 0
+    # The marker was removed while the rebuild ran, and is back afterwards
+    assert observed[0] is None and observed[1] == 201
+    assert rollups.rollups_ready(db)
+    monkeypatch.setattr(rollups, 'expected_rollups', expected_rollups)
+    assert rollups.check_rollups(db) == []
+    rollups._not_ready_until = 0
+    db.transaction_rollups.delete_many({})
+    rollups.rebuild_rollups(db)
+    assert rollups.check_rollups(db) == []
@@ -0,0 +1,39 @@
+import pytest
+from conftest import auth_headers
+import routes.transactions as transactions
+
+HEADERS = auth_headers('user-1')
+
+def create(client, **fields):
+    body = {'type': 'expense', 'amount': '4', 'currency': 'USD', 'category': 'Groceries', 'date': '2026-02-11', **fields}
+    return client.post('/transactions/', json=body, headers=HEADERS).get_json()['transaction']['_id']
+
+def search(client, q):
+    return [t['_id'] for t in client.get(f'/transactions/?q={q}', headers=HEADERS).get_json()['transactions']]
+
+def test_partial_update_rewrites_search_terms_in_one_write(client, db, monkeypatch):
+    transaction_id = create(client, notes='Weekly shopping')
+    update_one = db.transactions.update_one
+    monkeypatch.setattr(type(db.transactions), 'update_one', lambda *args, **kwargs: pytest.fail('second write'))
+    
+    response = client.put(f'/transactions/{transaction_id}', json={'notes': 'Farmers market'}, headers=HEADERS)
+    assert response.status_code == 200
+    monkeypatch.setattr(type(db.transactions), 'update_one', update_one)
+    assert search(client, 'farm') == [transaction_id]
+    assert search(client, 'groc') == [transaction_id]
+    assert search(client, 'weekly') == []
+
+def test_update_gives_up_when_the_document_keeps_changing(client, db, monkeypatch):
+    transaction_id = create(client)
+    find_one = type(db.transactions).find_one
+    
+    def find_one_then_touch(collection, *args, **kwargs):
+        # Another writer changes the document right after it was read
+        current = find_one(collection, *args, **kwargs)
+        collection.update_many({}, {'$currentDate': {'updated_at': True}})
+        return current
+    monkeypatch.setattr(type(db.transactions), 'find_one', find_one_then_touch)
+    
+    response = client.put(f'/transactions/{transaction_id}', json={'category': 'Dining'}, headers=HEADERS)
+    assert response.status_code == 409
+    assert response.get_json()['error'] == transactions.CONFLICT_ERROR